@@ -2,6 +2,7 @@ import os
 from ament_index_python.packages import get_package_share_directory
 from launch import LaunchDescription
 from launch.actions import DeclareLaunchArgument
+from launch.conditions import IfCondition, UnlessCondition
 from launch.substitutions import LaunchConfiguration
 from launch_ros.actions import Node
 
@@ -29,6 +30,17 @@ def generate_launch_description():
                 'config': LaunchConfiguration("config"),
                 'gui': LaunchConfiguration("gui")
             }],
+            condition=IfCondition(LaunchConfiguration("gui")),
+        ),
+
+        # Without the GUI, launch straight away without loading Qt
+        Node(
+            name='eufs_launcher',
+            package='eufs_launcher',
+            executable='eufs_launcher_headless',
+            output='both',
+            arguments=['--config', LaunchConfiguration("config")],
+            condition=UnlessCondition(LaunchConfiguration("gui")),
         ),
 
     ])
@@ -2,15 +2,46 @@ from ament_index_python.packages import get_package_share_directory
 from launch import LaunchDescription
 from launch.actions import DeclareLaunchArgument
 from launch.actions import IncludeLaunchDescription
+from launch.actions import RegisterEventHandler
+from launch.event_handlers import OnProcessExit
+from launch.event_handlers import OnProcessStart
 from launch.substitutions import LaunchConfiguration
 from launch.substitutions import PathJoinSubstitution
 from launch.substitutions import PythonExpression
 from launch.launch_description_sources import FrontendLaunchDescriptionSource
+from launch_ros.actions import Node
+
+from eufs_launcher import startup_profile
+
+
+def profiling_actions():
+    """
+    Records the lifetime of every process of the launch, and the first message on key topics,
+    in the startup profile (see eufs_launcher.startup_profile)
+    """
+    return [
+        RegisterEventHandler(OnProcessStart(
+            on_start=lambda event, context: startup_profile.record(
+                f"process {event.action.name}", "begin", process_pid=event.pid)
+        )),
+        RegisterEventHandler(OnProcessExit(
+            on_exit=lambda event, context: startup_profile.record(
+                f"process {event.action.name}", "end")
+        )),
+        Node(
+            name='eufs_startup_profile',
+            package='eufs_launcher',
+            executable='eufs_startup_profile',
+            output='screen',
+            arguments=['watch']
+        ),
+    ]
 
 
 def generate_launch_description():
+    startup_profile.record("simulation.launch.py")
 
-    return LaunchDescription([
+    actions = [
         DeclareLaunchArgument(
             name='track',
             default_value='small_track',
@@ -46,6 +77,11 @@ def generate_launch_description():
             default_value='true',
             description="Condition to launch the Rviz GUI"),
 
+        DeclareLaunchArgument(
+            name='show_rqt_gui',
+            default_value='true',
+            description="Condition to launch the rqt GUI (mission control and robot steering)"),
+
         DeclareLaunchArgument(
             name='publish_gt_tf',
             default_value='false',
@@ -77,9 +113,14 @@ def generate_launch_description():
                 ('robot_name', LaunchConfiguration('robot_name')),
                 ('gazebo_gui', LaunchConfiguration('gazebo_gui')),
                 ('rviz', LaunchConfiguration('rviz')),
+                ('show_rqt_gui', LaunchConfiguration('show_rqt_gui')),
                 ('publish_gt_tf', LaunchConfiguration('publish_gt_tf')),
                 ('pub_ground_truth', LaunchConfiguration('pub_ground_truth')),
                 ('launch_group', LaunchConfiguration('launch_group')),
             ]
         ),
-    ])
+    ]
+
+    if startup_profile.enabled():
+        actions.extend(profiling_actions())
+    return LaunchDescription(actions)
@@ -26,5 +26,11 @@ setup(
     description='Configures and launches eufs_sim.',
     license='MIT',
     tests_require=['pytest'],
-    scripts=['scripts/eufs_launcher'],
+    scripts=[
+        'scripts/eufs_launcher',
+        'scripts/eufs_launcher_headless',
+        'scripts/eufs_launcher_scheduler',
+        'scripts/eufs_startup_profile',
+        'scripts/eufs_track_swap'
+    ],
 )
@@ -1,13 +1,8 @@
-import yaml
-from collections import OrderedDict
-from os import listdir
+import threading
 from os import path
 from os.path import join
-from os.path import isfile
 from os.path import expandvars
 from os import walk, getenv
-from subprocess import Popen
-from glob import glob
 
 from ament_index_python.packages import get_package_share_directory
 from python_qt_binding import loadUi
@@ -18,8 +13,29 @@ from python_qt_binding.QtWidgets import QCheckBox
 from python_qt_binding.QtWidgets import QLabel
 from python_qt_binding.QtWidgets import QApplication
 from python_qt_binding.QtGui import QFont
+from python_qt_binding.QtCore import QTimer
 from qt_gui.plugin import Plugin
 
+from eufs_tracks.track_io import TrackIndex, ThumbnailCache
+from eufs_tracks.converter_tool import ThumbnailLoader
+
+from eufs_launcher.headless import launches, simulation_arguments
+from eufs_launcher.launcher_config import COMMAND_MODES, load_launcher_config
+from eufs_launcher.launch_files import LaunchFileScanner, parse_launch_directory
+from eufs_launcher.launch_file_loader import LaunchFileLoader
+from eufs_launcher.readiness import LaunchSequencer, ReadinessMonitor
+from eufs_launcher.supervisor import ProcessSupervisor
+from eufs_launcher import startup_profile
+
+# How often the resource usage of launched processes is sampled, in milliseconds
+USAGE_INTERVAL = 2000
+
+# How often launches waiting for the simulation check whether it is ready, in milliseconds
+READINESS_INTERVAL = 200
+
+# How often a track swap is checked on, in milliseconds
+SWAP_INTERVAL = 100
+
 
 class EUFSLauncher(Plugin):
     def __init__(self, context):
@@ -29,6 +45,7 @@ class EUFSLauncher(Plugin):
         """
 
         super(EUFSLauncher, self).__init__(context)
+        startup_profile.record("launcher setup", "begin")
 
         # Give QObjects reasonable names
         self.setObjectName("EUFSLauncher")
@@ -38,20 +55,29 @@ class EUFSLauncher(Plugin):
         self.logger = self.node.get_logger()
         self.LAUNCHER_SHARE = get_package_share_directory("eufs_launcher")
         self.TRACKS_SHARE = get_package_share_directory("eufs_tracks")
-        self.popens = []  # Create array of popen processes
+        self.track_index = TrackIndex(self.TRACKS_SHARE)
+        # Keeps track of launched processes and their nodes
+        self.supervisor = ProcessSupervisor(on_exit=self.process_exited)
+        # Holds back launches until what they depend on is up
+        self.sequencer = LaunchSequencer(
+            self.supervisor, ReadinessMonitor(self.node), log=self.logger.warn
+        )
 
         # Declare Launcher Parameters
         default_config_path = join(self.LAUNCHER_SHARE, "config", "eufs_launcher.yaml")
         yaml_path = self.node.declare_parameter("config", default_config_path).value
         use_gui = self.node.declare_parameter("gui", True).value
 
-        # Load in eufs_launcher parameters
-        with open(yaml_path, "r") as stream:
-            try:
-                self.default_config = yaml.safe_load(stream)
-            except yaml.YAMLError as exc:
-                print(exc)
-                return
+        # Load in eufs_launcher parameters, along with the vehicle models and robots, all
+        # checked up front and cached until one of them changes
+        try:
+            self.config = load_launcher_config(yaml_path)
+        except (OSError, ValueError) as exc:
+            # The plugin can't work without its config, so rqt is told that it failed to load
+            self.logger.error(str(exc))
+            raise
+        for warning in self.config.warnings:
+            self.logger.warn(warning)
 
         # Create QWidget
         self._widget = QWidget()
@@ -72,15 +98,32 @@ class EUFSLauncher(Plugin):
 
         # Give widget components permanent names
         self.TRACK_SELECTOR = self._widget.findChild(QComboBox, "WhichTrack")
+        self.thumbnail_loader = ThumbnailLoader(
+            self.TRACK_SELECTOR, ThumbnailCache(self.track_index)
+        )
         self.LAUNCH_BUTTON = self._widget.findChild(QPushButton, "LaunchButton")
         self.REFRESH_TRACK_BUTTON = self._widget.findChild(
             QPushButton, "RefreshTrackButton"
         )
+        self.SWAP_TRACK_BUTTON = self._widget.findChild(QPushButton, "SwapTrackButton")
+        self.track_swapper = None
+        self.swap_thread = None
+        self.swap_done = threading.Event()
+        self.swap_timer = QTimer(self._widget)
+        self.swap_timer.setInterval(SWAP_INTERVAL)
+        self.swap_timer.timeout.connect(self.check_track_swap)
         self.VEHICLE_MODEL_MENU = self._widget.findChild(QComboBox, "WhichVehicleModel")
         self.COMMAND_MODE_MENU = self._widget.findChild(QComboBox, "WhichCommandMode")
         self.MODEL_PRESET_MENU = self._widget.findChild(QComboBox, "WhichModelPreset")
         self.ROBOT_NAME_MENU = self._widget.findChild(QComboBox, "WhichRobotName")
         self.LAUNCH_FILE_SELECTOR = self._widget.findChild(QComboBox, "WhichLaunchFile")
+        self.PROCESS_USAGE = self._widget.findChild(QLabel, "ProcessUsage")
+        self.usage_timer = QTimer(self._widget)
+        self.usage_timer.setInterval(USAGE_INTERVAL)
+        self.usage_timer.timeout.connect(self.update_process_usage)
+        self.readiness_timer = QTimer(self._widget)
+        self.readiness_timer.setInterval(READINESS_INTERVAL)
+        self.readiness_timer.timeout.connect(self.start_ready_launches)
 
         # Check the file directory to update drop-down menu
         self.load_track_dropdowns()
@@ -88,123 +131,56 @@ class EUFSLauncher(Plugin):
         # Hook up buttons to onclick functions
         self.LAUNCH_BUTTON.clicked.connect(self.launch_button_pressed)
         self.REFRESH_TRACK_BUTTON.clicked.connect(self.load_track_dropdowns)
+        self.SWAP_TRACK_BUTTON.clicked.connect(self.swap_track_pressed)
 
         # Setup Vehicle Models menu
-        models_filepath = join(
-            get_package_share_directory("eufs_models"), "models/models.txt"
-        )
-        vehicle_models_ = open(models_filepath, "r")
-        vehicle_models = [model.strip() for model in vehicle_models_]  # remove \n
-        default_model = self.default_config["eufs_launcher"]["default_vehicle_model"]
         EUFSLauncher.setup_q_combo_box(
-            self.VEHICLE_MODEL_MENU, default_model, vehicle_models
+            self.VEHICLE_MODEL_MENU, self.config.vehicle_model, self.config.vehicle_models
         )
 
         # Setup Command Modes menu
-        default_mode = self.default_config["eufs_launcher"]["default_command_mode"]
-        modes = ["acceleration", "velocity"]
-        EUFSLauncher.setup_q_combo_box(self.COMMAND_MODE_MENU, default_mode, modes)
+        EUFSLauncher.setup_q_combo_box(
+            self.COMMAND_MODE_MENU, self.config.command_mode, COMMAND_MODES
+        )
 
         # Setup Conditions menu
-        default_mode = self.default_config["eufs_launcher"]["default_vehicle_preset"]
-        self.MODEL_CONFIGS = {
-            "DryTrack": "configDry.yaml",
-            "WetTrack": "configWet.yaml",
-        }
         EUFSLauncher.setup_q_combo_box(
-            self.MODEL_PRESET_MENU, default_mode, self.MODEL_CONFIGS.keys()
+            self.MODEL_PRESET_MENU, self.config.preset, self.config.presets.keys()
         )
 
         # Setup Robot Name menu
-        default_mode = self.default_config["eufs_launcher"]["default_robot_name"]
-        robots_filepath = join(get_package_share_directory("eufs_racecar"), "robots")
-        modes = listdir(robots_filepath)
-        EUFSLauncher.setup_q_combo_box(self.ROBOT_NAME_MENU, default_mode, modes)
-
-        # Setup launch file options
-        launch_directory_path = self.default_config["eufs_launcher"][
-            "default_launch_directory"
-        ]
-        launch_directory_path = join(expandvars(launch_directory_path),'*.launch.py')
-        all_files = glob(launch_directory_path, recursive=True)
+        EUFSLauncher.setup_q_combo_box(
+            self.ROBOT_NAME_MENU, self.config.robot_name, self.config.robots
+        )
 
-        # Filter launch files found within install or build directory
-        launch_files = [file for file in all_files if not ('install' in file or 'build' in file)]
+        # Setup launch file options, listing those found last time while the launch
+        # directory is searched again in the background
+        self.launch_file_scanner = LaunchFileScanner(
+            *parse_launch_directory(self.config.launch_directory)
+        )
 
-        default_launch_file = self.default_config["eufs_launcher"][
-            "default_launch_file"
-        ]
-        default_launch_file = expandvars(default_launch_file)
+        default_launch_file = expandvars(self.config.launch_file)
         EUFSLauncher.setup_q_combo_box(
-            self.LAUNCH_FILE_SELECTOR, default_launch_file, launch_files
+            self.LAUNCH_FILE_SELECTOR, default_launch_file, self.launch_file_scanner.cached()
         )
-
-        # Add buttons from yaml file
-        checkboxes = OrderedDict(
-            sorted(
-                self.default_config["eufs_launcher"]["checkboxes"].items(),
-                key=lambda x: x[1]["priority"],
-            )
+        self.launch_file_loader = LaunchFileLoader(
+            self.LAUNCH_FILE_SELECTOR, self.launch_file_scanner
         )
-        self.checkbox_effect_mapping = []
-        self.checkbox_parameter_mapping = []
+        self.launch_file_loader.load()
+
+        # Add checkboxes from yaml file, what they do is looked up in the config at launch
+        self.checkboxes = {}
         starting_xpos = 170
         starting_ypos = 257
-        counter = 0
-        for key, value in checkboxes.items():
+        for counter, checkbox in enumerate(self.config.checkboxes.values()):
             cur_xpos = starting_xpos + 100 * (counter % 2)
             cur_ypos = starting_ypos + 15 * (counter // 2)
-            cur_cbox = QCheckBox(checkboxes[key]["label"], self._widget)
-            cur_cbox.setChecked(checkboxes[key]["checked_on_default"])
+            cur_cbox = QCheckBox(checkbox.label, self._widget)
+            cur_cbox.setChecked(checkbox.checked)
             cur_cbox.setGeometry(cur_xpos, cur_ypos, 300, 30)
             cur_cbox.setFont(QFont("Sans Serif", 7))
-            if "package" in checkboxes[key] and "launch_file" in checkboxes[key]:
-                # This handles any launch files that the checkbox will launch
-                # if selected.
-                if "args" in checkboxes[key]:
-                    cur_cbox_args = checkboxes[key]["args"].keys()
-                else:
-                    cur_cbox_args = []
-                # The weird double-lambda thing is because python
-                # lambda-captures
-                # by reference, not value, and so consequently since the `key`
-                # variable is used every loop, at the end of the loops all of
-                # these lambda functions would actually be refering to the
-                # *last*
-                # loop's key, not each individual loop's key.
-                # To solve that, we force key into a local variable by wrapping
-                # our contents with a lambda taking it as a parameter, then
-                # immediately passing it in.
-                # We do the same for all other changing variables.
-                self.checkbox_effect_mapping.append(
-                    (
-                        cur_cbox,
-                        (
-                            lambda key, cur_cbox_args: (
-                                lambda: self.launch_with_args(
-                                    checkboxes[key]["package"],
-                                    checkboxes[key]["launch_file"],
-                                    cur_cbox_args,
-                                )
-                            )
-                        )(key, cur_cbox_args),
-                        (lambda key: lambda: None)(key),
-                    )
-                )
-            if "parameter_triggering" in checkboxes[key]:
-                # This handles parameter details that will be passed to the
-                # `simulation.launch.py` backbone file depending on whether the
-                # checkbox is on or off
-                self.checkbox_parameter_mapping.append(
-                    (
-                        cur_cbox,
-                        checkboxes[key]["parameter_triggering"]["if_on"].keys(),
-                        checkboxes[key]["parameter_triggering"]["if_off"].keys(),
-                    )
-                )
-
-            setattr(self, checkboxes[key]["name"].upper(), cur_cbox)
-            counter += 1
+            self.checkboxes[checkbox.key] = cur_cbox
+            setattr(self, checkbox.name.upper(), cur_cbox)
 
         # Looping over all widget to fix scaling issue via manual scaling
         # Scaling done via magically comparing the width to the 'default'
@@ -225,6 +201,8 @@ class EUFSLauncher(Plugin):
                     geom.height() * (scalar_multiplier),
                 )
 
+        startup_profile.record("launcher setup", "end")
+
         # If use_gui is false, we jump straight into launching the track
         if not use_gui:
             self.launch_button_pressed()
@@ -249,25 +227,17 @@ class EUFSLauncher(Plugin):
 
         # Clear the dropdowns
         self.TRACK_SELECTOR.clear()
-        # Get tracks from eufs_tracks package
-        launch_dir_path = join(self.TRACKS_SHARE, "launch")
-        launch_files = [
-            f for f in listdir(launch_dir_path) if isfile(join(launch_dir_path, f))
-        ]
-
-        # Remove "blacklisted" files (ones that don't define tracks)
-        blacklist_filepath = join(self.TRACKS_SHARE, "launch/blacklist.txt")
-        with open(blacklist_filepath, "r") as f:
-            blacklist = [f.strip() for f in f.readlines()]  # remove \n
-            launch_files = [f for f in launch_files if f not in blacklist]
-
-        # Add Tracks to Track Selector
-        base_track = self.default_config["eufs_launcher"]["base_track"]
-        if base_track in launch_files:
-            self.TRACK_SELECTOR.addItem(base_track.split(".")[0])
-        for f in launch_files:
-            if f != base_track:
-                self.TRACK_SELECTOR.addItem(f.split(".")[0])
+        # Get tracks from eufs_tracks package, the index only rereads what changed
+        # and leaves out "blacklisted" files (ones that don't define tracks)
+        tracks = self.track_index.refresh().tracks("launch")
+
+        # Add Tracks to Track Selector, base track first
+        base_track = self.config.base_track.split(".")[0]
+        tracks.sort(key=lambda track: track["name"] != base_track)
+        for track in tracks:
+            self.TRACK_SELECTOR.addItem(track["name"])
+        # Their previews are drawn (or read from the cache) in the background
+        self.thumbnail_loader.load(tracks)
 
     def launch_button_pressed(self):
         """
@@ -281,93 +251,139 @@ class EUFSLauncher(Plugin):
           4: Convert that to "LAST_LAUNCH.launch"
         """
         self.logger.info("Launching Nodes...")
-
-        # Calculate parameters to pass
-        track_layout = f"track:={self.TRACK_SELECTOR.currentText()}"
-        vehicle_model = f"vehicleModel:={self.VEHICLE_MODEL_MENU.currentText()}"
-        command_mode = f"commandMode:={self.COMMAND_MODE_MENU.currentText()}"
-        model_config = self.MODEL_CONFIGS[self.MODEL_PRESET_MENU.currentText()]
-        vehicle_model_config = f"vehicleModelConfig:={model_config}"
-        robot_name = f"robot_name:={self.ROBOT_NAME_MENU.currentText()}"
-        parameters_to_pass = [
-            track_layout,
-            vehicle_model,
-            command_mode,
-            vehicle_model_config,
-            robot_name,
-        ]
+        startup_profile.record("launch pressed")
 
         # Get vehicle model information
+        preset = self.MODEL_PRESET_MENU.currentText()
         self.logger.info(f"Vehicle model: {self.VEHICLE_MODEL_MENU.currentText()}")
         self.logger.info(f"Command mode: {self.COMMAND_MODE_MENU.currentText()}")
-        self.logger.info(f"Preset: {model_config}")
+        self.logger.info(f"Preset: {self.config.presets[preset]}")
         self.logger.info(
             f"Robot description file: {self.ROBOT_NAME_MENU.currentText()}"
         )
         self.logger.info(f"Launch file: {self.LAUNCH_FILE_SELECTOR.currentText()}")
 
         # Get checkbox parameter information
-        for (
-            checkbox,
-            param_if_on,
-            param_if_off,
-        ) in self.checkbox_parameter_mapping:
-            if checkbox.isChecked():
-                self.logger.info(f"Checkbox enabled: {param_if_on}")
-                parameters_to_pass.extend(param_if_on)
-            else:
-                self.logger.info(f"Checkbox disabled: {param_if_off}")
-                parameters_to_pass.extend(param_if_off)
-
-        # Here we launch `simulation.launch.py` and custom launch files
-        # if it is not None.
-        self.launch_with_args(
-            "eufs_launcher", "simulation.launch.py", parameters_to_pass
-        )
+        checked = {key: cur_cbox.isChecked() for key, cur_cbox in self.checkboxes.items()}
+        for key, on in checked.items():
+            checkbox = self.config.checkboxes[key]
+            if checkbox.if_on or checkbox.if_off:
+                state = "enabled" if on else "disabled"
+                self.logger.info(
+                    f"Checkbox {state}: {list(checkbox.if_on if on else checkbox.if_off)}"
+                )
 
-        self.roslaunch_launch_file(self.LAUNCH_FILE_SELECTOR.currentText())
+        # Calculate parameters to pass, the same way as headless launches
+        parameters_to_pass = simulation_arguments(
+            self.config,
+            self.TRACK_SELECTOR.currentText(),
+            self.VEHICLE_MODEL_MENU.currentText(),
+            self.COMMAND_MODE_MENU.currentText(),
+            preset,
+            self.ROBOT_NAME_MENU.currentText(),
+            checked,
+        )
 
-        # Trigger launch files hooked to checkboxes
-        for checkbox, effect_on, effect_off in self.checkbox_effect_mapping:
-            if checkbox.isChecked():
-                effect_on()
-            else:
-                effect_off()
+        # Here we launch `simulation.launch.py`, then the custom launch file if it is not None
+        # and the launch files hooked to checkboxes, once the simulation is ready
+        launch_file = self.LAUNCH_FILE_SELECTOR.currentText()
+        if "none" in launch_file.lower():
+            self.logger.info("No additional launch file will be launched.")
+        for launch in launches(self.config, parameters_to_pass, launch_file, checked):
+            self.logger.info(f"Command: {' '.join(launch.command)}")
+            self.sequencer.add(launch.name, launch.command, launch.conditions)
 
         self.LAUNCH_BUTTON.setEnabled(False)
-
-    def launch_with_args(self, package, launch_file, args):
-        """Launches ros node."""
-        command = [
-            "ros2",
-            "launch",
-            package,
-            launch_file,
-            "use_sim_time:=true",
-        ] + args
-        self.logger.info(f"Command: {' '.join(command)}")
-        process = Popen(command)
-        self.popens.append(process)
-
-    def roslaunch_launch_file(self, launch_file_description):
-        """
-        Launches custom launch file
-        """
-        # Process launch file description
- 
-        if "none" in launch_file_description.lower():
-            self.logger.info("No additional launch file will be launched.")
+        self.SWAP_TRACK_BUTTON.setEnabled(True)
+        self.update_process_usage()
+        self.usage_timer.start()
+        if self.sequencer.pending():
+            self.readiness_timer.start()
+
+    def swap_track_pressed(self):
+        """Swaps the selected track into the running simulation, in the background"""
+        track = self.TRACK_SELECTOR.currentText()
+        if self.track_swapper is None:
+            try:
+                # Only imported once a track is swapped, it renders tracks with numpy
+                from eufs_launcher.track_swap import GazeboEntities, TrackSwapper
+
+                # rqt spins the node, so the swap waits for responses from another thread. The
+                # swap refreshes its index in that thread, so it gets its own rather than
+                # self.track_index
+                self.track_swapper = TrackSwapper(
+                    GazeboEntities(self.node, spin=False), TrackIndex(self.TRACKS_SHARE)
+                )
+            except Exception as exc:
+                self.logger.error(f"Could not swap in {track}: {type(exc).__name__}: {exc}")
+                return
+        self.logger.info(f"Swapping in {track}...")
+        self.SWAP_TRACK_BUTTON.setEnabled(False)
+        self.swap_done.clear()
+        self.swap_thread = threading.Thread(
+            target=self._swap_track, args=(track,), daemon=True
+        )
+        self.swap_thread.start()
+        self.swap_timer.start()
+
+    def _swap_track(self, track):
+        try:
+            times = self.track_swapper.swap(track)
+            self.logger.info(f"Swapped in {track} in {sum(times.values()):.2f}s")
+        except (KeyError, RuntimeError) as exc:
+            self.logger.error(f"Could not swap in {track}: {exc.args[0]}")
+        except Exception as exc:
+            # e.g. an unreadable track or an rclpy error, which mustn't end the thread unlogged
+            self.logger.error(f"Could not swap in {track}: {type(exc).__name__}: {exc}")
+        finally:
+            # The button is enabled again from the GUI thread, by check_track_swap()
+            self.swap_done.set()
+
+    def check_track_swap(self):
+        """Lets another track be swapped in once the last swap is done"""
+        if self.swap_done.is_set():
+            self.swap_timer.stop()
+            self.SWAP_TRACK_BUTTON.setEnabled(True)
+
+    def start_ready_launches(self):
+        """Starts the launches whose conditions hold, until none are waiting"""
+        for name in self.sequencer.poll():
+            self.logger.info(f"Started {name}")
+        if not self.sequencer.pending():
+            self.readiness_timer.stop()
+
+    def process_exited(self, name, returncode):
+        """Reports launched processes which stopped by themselves"""
+        if returncode == 0:
+            self.logger.info(f"{name} finished")
         else:
-            command = ["ros2", "launch", launch_file_description]
-            self.logger.info(f"Command: {' '.join(command)}")
-            process = Popen(command)
-            self.popens.append(process)
+            self.logger.error(f"{name} exited with code {returncode}")
+
+    def update_process_usage(self):
+        """Shows the resource usage of each launched process and its nodes, busiest first"""
+        usage = self.supervisor.sample()
+        lines = [
+            f"{name[:22]:<22} {use.cpu:4.0f}% {use.rss / 2 ** 20:6.0f}MB "
+            f"{use.threads:4d} threads {use.processes:3d} procs"
+            for name, use in sorted(usage.items(), key=lambda item: -item[1].cpu)
+        ]
+        lines += [
+            f"{name[:22]:<22} exited ({code})"
+            for name, code in self.supervisor.crashed().items()
+        ]
+        self.PROCESS_USAGE.setText("\n".join(lines))
 
     def shutdown_plugin(self):
         """Kill all nodes."""
         self.logger.info("Shutdown Engaged...")
-
-        for process in self.popens:
-            process.terminate()
-
-        self.logger.info("All nodes killed")
+        self.usage_timer.stop()
+        self.readiness_timer.stop()
+        self.swap_timer.stop()
+        self.sequencer.cancel()
+        self.sequencer.monitor.close()
+
+        left = self.supervisor.shutdown()
+        if left:
+            self.logger.error(f"Could not stop {', '.join(left)}")
+        else:
+            self.logger.info("All nodes killed")
@@ -0,0 +1,228 @@
+"""
+Launches eufs_sim as the launcher would with its defaults, without Qt. The parameters are read
+from the same compiled launcher config (see `eufs_launcher.launcher_config`) and resolved into
+the arguments of `simulation.launch.py`, so that CI and batch runs don't pay for the GUI.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import OrderedDict, namedtuple
+from os.path import expandvars, basename
+
+from eufs_launcher import startup_profile
+from eufs_launcher.launcher_config import MODEL_CONFIGS, COMMAND_MODES, load_launcher_config
+from eufs_launcher.readiness import LaunchSequencer, ReadinessMonitor
+from eufs_launcher.supervisor import ProcessSupervisor
+
+
+# A process the launcher starts, once the `readiness.Condition`s in conditions hold
+Launch = namedtuple("Launch", ["name", "command", "conditions"])
+
+
+def launch_command(package, launch_file, args):
+    """The command launching launch_file of package with args, as the launcher runs it"""
+    return ["ros2", "launch", package, launch_file, "use_sim_time:=true"] + list(args)
+
+
+def resolve_checkboxes(config, enable=(), disable=()):
+    """
+    Which checkboxes are checked: those checked by default, plus enable, minus disable (keys
+    of the checkboxes of the config). Returns a dict of key to checked.
+    """
+    unknown = (set(enable) | set(disable)) - set(config.checkboxes)
+    if unknown:
+        raise KeyError(f"unknown checkboxes {', '.join(sorted(unknown))}, "
+                       f"expected some of {', '.join(config.checkboxes)}")
+    return OrderedDict(
+        (key, (checkbox.checked or key in enable) and key not in disable)
+        for key, checkbox in config.checkboxes.items()
+    )
+
+
+def simulation_arguments(config, track=None, vehicle_model=None, command_mode=None,
+                         preset=None, robot_name=None, checked=None):
+    """
+    The arguments the launcher passes to `simulation.launch.py`, taking the launcher's
+    defaults for anything not given.
+
+    Args:
+        config (LauncherConfig): the compiled launcher config
+        track (str): name of the track
+        vehicle_model (str): vehicle model class
+        command_mode (str): "acceleration" or "velocity"
+        preset (str): key of the config's presets
+        robot_name (str): robot of eufs_racecar
+        checked (dict): checkbox key to whether it is checked, as from `resolve_checkboxes()`
+
+    Returns:
+        A list of "name:=value" launch arguments
+    """
+    vehicle_model = vehicle_model or config.vehicle_model
+    preset = preset or config.preset
+    robot_name = robot_name or config.robot_name
+    for kind, value, choices in (("vehicle model", vehicle_model, config.vehicle_models),
+                                 ("preset", preset, config.presets),
+                                 ("robot", robot_name, config.robots)):
+        if value not in choices:
+            raise KeyError(f"unknown {kind} {value}, expected one of {', '.join(choices)}")
+    if checked is None:
+        checked = resolve_checkboxes(config)
+
+    parameters = [
+        f"track:={track or config.base_track.split('.')[0]}",
+        f"vehicleModel:={vehicle_model}",
+        f"commandMode:={command_mode or config.command_mode}",
+        f"vehicleModelConfig:={config.presets[preset]}",
+        f"robot_name:={robot_name}",
+    ]
+    for key, on in checked.items():
+        checkbox = config.checkboxes[key]
+        parameters.extend(checkbox.if_on if on else checkbox.if_off)
+    return parameters
+
+
+def launches(config, simulation_args, launch_file=None, checked=None):
+    """
+    Everything the launcher starts, as `Launch`es: `simulation.launch.py` with simulation_args,
+    then the custom launch file (default: that of the config, none if "None") and the launch
+    files of the checked checkboxes, which wait for what the config says.
+    """
+    found = [Launch(
+        "simulation", launch_command("eufs_launcher", "simulation.launch.py", simulation_args), ()
+    )]
+
+    launch_file = expandvars(launch_file or config.launch_file)
+    if "none" not in launch_file.lower():
+        found.append(Launch(
+            basename(launch_file), ["ros2", "launch", launch_file], config.wait_for
+        ))
+
+    if checked is None:
+        checked = resolve_checkboxes(config)
+    for key, on in checked.items():
+        checkbox = config.checkboxes[key]
+        if on and checkbox.launch_file is not None:
+            found.append(Launch(
+                checkbox.launch_file,
+                launch_command(checkbox.package, checkbox.launch_file, checkbox.args),
+                checkbox.conditions
+            ))
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Launches eufs_sim with the launcher's defaults, without the GUI")
+    parser.add_argument(
+        '--config',
+        help="launcher config (default: config/eufs_launcher.yaml of eufs_launcher)")
+    parser.add_argument('--track', help="track to launch (default: base_track)")
+    parser.add_argument(
+        '--vehicle-model', help="vehicle model class (default: default_vehicle_model)")
+    parser.add_argument(
+        '--command-mode',
+        choices=COMMAND_MODES,
+        help="vehicle control mode (default: default_command_mode)")
+    parser.add_argument(
+        '--preset',
+        choices=list(MODEL_CONFIGS),
+        help="vehicle model config preset (default: default_vehicle_preset)")
+    parser.add_argument('--robot-name', help="robot of eufs_racecar (default: default_robot_name)")
+    parser.add_argument(
+        '--launch-file',
+        help="custom launch file to launch too, 'None' for none (default: default_launch_file)")
+    parser.add_argument(
+        '--enable',
+        nargs="+",
+        default=[],
+        metavar="CHECKBOX",
+        help="checkboxes to check, by their key in the config (e.g. gazebo_gui)")
+    parser.add_argument(
+        '--disable',
+        nargs="+",
+        default=[],
+        metavar="CHECKBOX",
+        help="checkboxes to uncheck, by their key in the config (e.g. rviz)")
+    parser.add_argument(
+        '--dry-run',
+        action="store_true",
+        help="only print the commands that would be run")
+    parser.add_argument(
+        '--profile',
+        metavar="PATH",
+        help="write a startup profile here, see eufs_launcher.startup_profile")
+    # Arguments ROS adds when this is run as a node are not ours
+    args, _ = parser.parse_known_args(argv)
+
+    try:
+        config = load_launcher_config(args.config)
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}")
+        return 1
+    for warning in config.warnings:
+        print(f"Warning: {warning}")
+    try:
+        checked = resolve_checkboxes(config, args.enable, args.disable)
+        simulation_args = simulation_arguments(
+            config, args.track, args.vehicle_model, args.command_mode, args.preset,
+            args.robot_name, checked
+        )
+    except KeyError as exc:
+        print(f"Error: {exc.args[0]}")
+        return 1
+    found = launches(config, simulation_args, args.launch_file, checked)
+
+    for launch in found:
+        waits = ", ".join(f"{kind} {name}" for kind, name in launch.conditions)
+        print(f"Command: {' '.join(launch.command)}" + (f" (once {waits})" if waits else ""))
+    if args.dry_run:
+        return 0
+
+    if args.profile is not None:
+        # Replaces any earlier profile, the launched processes find it through the environment
+        if os.path.exists(args.profile):
+            os.remove(args.profile)
+        os.environ[startup_profile.ENV_VAR] = os.path.abspath(args.profile)
+        print(f"Writing a startup profile to {args.profile}, see it with: "
+              f"ros2 run eufs_launcher eufs_startup_profile report {args.profile}")
+
+    supervisor = ProcessSupervisor(
+        on_exit=lambda name, returncode: print(f"{name} exited with code {returncode}")
+    )
+    node = None
+    if any(launch.conditions for launch in found):
+        # Only needed to watch the ROS graph, so only loaded when something waits on it
+        import rclpy
+        rclpy.init()
+        node = rclpy.create_node("eufs_launcher_headless")
+    sequencer = LaunchSequencer(supervisor, ReadinessMonitor(node))
+    names = [sequencer.add(launch.name, launch.command, launch.conditions) for launch in found]
+    simulation = names[0]
+    try:
+        # The simulation decides how long the run lasts
+        while simulation in supervisor.running():
+            if sequencer.pending():
+                rclpy.spin_once(node, timeout_sec=0.2)
+                sequencer.poll()
+            else:
+                time.sleep(0.5)
+            supervisor.poll()
+        return supervisor.returncodes[simulation]
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        left = sequencer.cancel()
+        if left:
+            print(f"Never started {', '.join(left)}")
+        if node is not None:
+            sequencer.monitor.close()
+            node.destroy_node()
+            rclpy.shutdown()
+        left = supervisor.shutdown()
+        if left:
+            print(f"Could not stop {', '.join(left)}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
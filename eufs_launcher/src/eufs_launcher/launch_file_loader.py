@@ -0,0 +1,71 @@
+import threading
+from queue import Queue, Empty
+
+from python_qt_binding.QtCore import QObject, QTimer
+
+
+class LaunchFileLoader(QObject):
+    """
+    Fills a launch file drop-down menu from a LaunchFileScanner. The files found by the last
+    scan are listed straight away, then the directory is scanned again in a background thread
+    and the menu is brought up to date from the Qt event loop as files are found, so the
+    launcher never waits for the file system.
+    """
+
+    def __init__(self, combo_box, scanner, interval=50):
+        """
+        combo_box: The QComboBox listing the launch files, with its default item already added
+        scanner:   The LaunchFileScanner to get the launch files from
+        interval:  How often the menu is updated while scanning, in milliseconds
+        """
+        super(LaunchFileLoader, self).__init__(combo_box)
+        self.combo_box = combo_box
+        self.scanner = scanner
+        self.found = Queue()
+        self.thread = None
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.add_found)
+
+    def load(self):
+        """Lists the cached launch files and starts scanning for the current ones"""
+        cached = self.scanner.cached()
+        # Items which aren't launch files found by a scan (e.g. "None") always stay
+        self.fixed = {self.combo_box.itemText(i) for i in range(self.combo_box.count())}
+        self.fixed -= set(cached)
+        for path in cached:
+            self.add(path)
+
+        self.thread = threading.Thread(target=self._scan, daemon=True)
+        self.thread.start()
+        self.timer.start()
+
+    def _scan(self):
+        # Nothing but the queue is shared with the GUI thread, None marks the end of the scan
+        launch_files = self.scanner.scan(found=self.found.put)
+        self.found.put(None)
+        self.found.put(launch_files)
+
+    def add(self, path):
+        if self.combo_box.findText(path) < 0:
+            self.combo_box.addItem(path)
+
+    def add_found(self):
+        while True:
+            try:
+                path = self.found.get_nowait()
+            except Empty:
+                return
+            if path is not None:
+                self.add(path)
+                continue
+
+            # Remove the files that are gone since the last scan
+            launch_files = set(self.found.get())
+            for i in reversed(range(self.combo_box.count())):
+                text = self.combo_box.itemText(i)
+                if text not in launch_files and text not in self.fixed:
+                    self.combo_box.removeItem(i)
+            self.timer.stop()
+            return
@@ -0,0 +1,147 @@
+import os
+import json
+from os.path import join, expandvars
+
+from eufs_tracks.track_io.atomic import atomic_write
+
+
+# Directories never searched for launch files, as well as hidden ones (which glob skips too)
+PRUNED_DIRECTORIES = {"install", "build", ".git"}
+
+LAUNCH_FILE_SUFFIX = ".launch.py"
+
+# Bump this whenever the cache changes so that old caches are ignored
+CACHE_VERSION = 1
+
+
+def default_cache_path():
+    """Where scans are cached: $XDG_CACHE_HOME/eufs_launcher/launch_files.json (~/.cache)"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or join(os.path.expanduser("~"), ".cache")
+    return join(cache_home, "eufs_launcher", "launch_files.json")
+
+
+def parse_launch_directory(launch_directory):
+    """
+    Splits a default_launch_directory of the launcher config into the directory to search
+    and whether to search its subdirectories too (if it ends with "**")
+    """
+    directory = expandvars(launch_directory).rstrip("/")
+    recursive = directory.endswith("**")
+    if recursive:
+        directory = directory[:-2].rstrip("/")
+    return os.path.abspath(directory or "/"), recursive
+
+
+class LaunchFileScanner:
+    """
+    Finds the launch files in a directory (and its subdirectories if recursive), leaving out
+    `PRUNED_DIRECTORIES` without looking into them.
+
+    The files and subdirectories of each directory are cached along with its modification
+    time, which changes whenever an entry is added to or removed from it. A scan only lists
+    the directories which changed since the last one, and the last results are available
+    before scanning with `cached()`.
+
+        scanner = LaunchFileScanner(*parse_launch_directory("$EUFS_MASTER/launch/**"))
+        launch_files = scanner.scan()
+    """
+
+    def __init__(self, directory, recursive=True, cache_path=None):
+        """
+        directory:  Directory to search
+        recursive:  Whether to search its subdirectories too
+        cache_path: Where the results are kept (default: `default_cache_path()`)
+        """
+        self.directory = directory
+        self.recursive = recursive
+        self.cache_path = cache_path or default_cache_path()
+        self.key = f"{directory}{os.sep}**" if recursive else directory
+        self.directories = self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        return cache.get("scans", {}).get(self.key, {})
+
+    def _save(self):
+        # Other directories may be cached in the same file, keep them
+        cache = {}
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if cache.get("version") != CACHE_VERSION:
+            cache = {"version": CACHE_VERSION, "scans": {}}
+        cache["scans"][self.key] = self.directories
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        atomic_write(self.cache_path, json.dumps(cache, sort_keys=True))
+
+    def cached(self):
+        """The launch files found by the last scan, sorted, without checking the directory"""
+        return sorted(
+            path for entry in self.directories.values() for path in entry["files"]
+        )
+
+    @staticmethod
+    def _list(directory, mtime):
+        """The launch files and searched subdirectories of a directory"""
+        files, subdirectories = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in PRUNED_DIRECTORIES \
+                                and not entry.name.startswith("."):
+                            subdirectories.append(entry.path)
+                    elif entry.name.endswith(LAUNCH_FILE_SUFFIX) and entry.is_file():
+                        files.append(entry.path)
+        except OSError:
+            pass
+        return {"mtime": mtime, "files": sorted(files), "subdirectories": sorted(subdirectories)}
+
+    def scan(self, found=None):
+        """
+        Brings the results up to date with the directory, saving them if anything changed.
+
+        Args:
+            found (callable): called with the path of each launch file as it is found, from the
+                              thread scanning
+
+        Returns:
+            The sorted paths of the launch files
+        """
+        directories = {}
+        changed = False
+        pending = [self.directory]
+        while pending:
+            directory = pending.pop()
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            entry = self.directories.get(directory)
+            if entry is None or entry["mtime"] != mtime:
+                entry = LaunchFileScanner._list(directory, mtime)
+                changed = True
+            directories[directory] = entry
+
+            if found is not None:
+                for path in entry["files"]:
+                    found(path)
+            if self.recursive:
+                pending.extend(reversed(entry["subdirectories"]))
+
+        if changed or directories.keys() != self.directories.keys():
+            self.directories = directories
+            try:
+                self._save()
+            except OSError as exc:
+                print(f"Could not save the launch files found to '{self.cache_path}': {exc}")
+        return self.cached()
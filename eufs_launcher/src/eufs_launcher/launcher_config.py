@@ -0,0 +1,303 @@
+"""
+The launcher config compiled into a `LauncherConfig`: eufs_launcher.yaml, the vehicle models
+of eufs_models' models.txt and the robots of eufs_racecar, read and checked in full at once so
+that mistakes are reported when the launcher starts rather than when something is launched.
+Compiled configs are cached and only compiled again once one of their sources changes.
+"""
+import os
+import json
+from collections import OrderedDict, namedtuple
+from os.path import join
+
+from ament_index_python.packages import get_package_share_directory
+
+from eufs_tracks.track_io.atomic import atomic_write
+
+from eufs_launcher.readiness import Condition, SIMULATION_READY, parse_conditions
+
+
+# Vehicle model config of each preset of the launcher
+MODEL_CONFIGS = {
+    "DryTrack": "configDry.yaml",
+    "WetTrack": "configWet.yaml",
+}
+
+COMMAND_MODES = ("acceleration", "velocity")
+
+# Bump this whenever LauncherConfig or Checkbox change so that old caches are ignored
+CACHE_VERSION = 2
+
+# A checkbox of the launcher. if_on and if_off are the arguments it adds to
+# `simulation.launch.py`, package and launch_file (None if it has none) what it launches once
+# conditions (`readiness.Condition`s) hold, with args.
+Checkbox = namedtuple(
+    "Checkbox",
+    ["key", "name", "label", "priority", "checked", "if_on", "if_off", "package",
+     "launch_file", "args", "conditions"]
+)
+
+# The defaults of the launcher, what can be picked from and the checkboxes (by key, in order of
+# priority). launch_directory and launch_file may hold environment variables. warnings are the
+# problems which didn't stop the config from being used, e.g. robots left out.
+LauncherConfig = namedtuple(
+    "LauncherConfig",
+    ["base_track", "vehicle_model", "command_mode", "preset", "robot_name", "launch_directory",
+     "launch_file", "vehicle_models", "presets", "robots", "checkboxes", "wait_for", "warnings"]
+)
+
+
+def default_config_path():
+    return join(get_package_share_directory("eufs_launcher"), "config", "eufs_launcher.yaml")
+
+
+def default_models_path():
+    return join(get_package_share_directory("eufs_models"), "models", "models.txt")
+
+
+def default_robots_dir():
+    return join(get_package_share_directory("eufs_racecar"), "robots")
+
+
+def default_cache_path():
+    """Where compiled configs are kept: $XDG_CACHE_HOME/eufs_launcher/config.json (~/.cache)"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or join(os.path.expanduser("~"), ".cache")
+    return join(cache_home, "eufs_launcher", "config.json")
+
+
+def robot_sources(robots_dir, robot):
+    """The files a robot of the robots directory is launched with"""
+    return [join(robots_dir, robot, "robot.urdf.xacro")] + [
+        join(robots_dir, robot, config_file) for config_file in MODEL_CONFIGS.values()
+    ]
+
+
+def _arguments(value):
+    """Launch arguments given as a list or as the keys of a mapping, e.g. { "rviz:=true" }"""
+    return tuple(value or ())
+
+
+def _compile_checkbox(key, value, problems):
+    if not isinstance(value, dict):
+        problems.append(f"checkbox {key} must be a mapping")
+        return None
+    missing = [field for field in ("name", "label", "priority") if field not in value]
+    if missing:
+        problems.append(f"checkbox {key} is missing {', '.join(missing)}")
+        return None
+    if not isinstance(value["priority"], (int, float)):
+        problems.append(f"priority of checkbox {key} must be a number")
+        return None
+
+    if_on, if_off = (), ()
+    triggering = value.get("parameter_triggering")
+    if triggering is not None:
+        if not isinstance(triggering, dict) or not {"if_on", "if_off"} <= set(triggering):
+            problems.append(f"parameter_triggering of checkbox {key} needs if_on and if_off")
+        else:
+            if_on = _arguments(triggering["if_on"])
+            if_off = _arguments(triggering["if_off"])
+
+    if ("package" in value) != ("launch_file" in value):
+        problems.append(f"checkbox {key} needs both a package and a launch_file to launch one")
+    conditions = None
+    if "wait_for" in value:
+        try:
+            conditions = parse_conditions(value["wait_for"] or {})
+        except AttributeError:
+            problems.append(f"wait_for of checkbox {key} must be a mapping")
+
+    return Checkbox(
+        key, value["name"], value["label"], value["priority"],
+        bool(value.get("checked_on_default", False)), if_on, if_off,
+        value.get("package"), value.get("launch_file"), _arguments(value.get("args")),
+        conditions
+    )
+
+
+def compile_config(config_path=None, models_path=None, robots_dir=None):
+    """
+    Reads and checks a launcher config, along with the vehicle models and robots it picks from.
+
+    Args:
+        config_path (str): the launcher config (default: the installed eufs_launcher.yaml)
+        models_path (str): the list of vehicle models (default: models.txt of eufs_models)
+        robots_dir (str): the robots directory (default: that of eufs_racecar)
+
+    Returns:
+        A `LauncherConfig`
+
+    Raises:
+        ValueError listing everything wrong with the config
+    """
+    # Only imported when the config has to be compiled, cached configs are json
+    import yaml
+
+    config_path = config_path or default_config_path()
+    with open(config_path, "r") as stream:
+        try:
+            config = yaml.safe_load(stream)
+        except yaml.YAMLError as exc:
+            raise ValueError(f"'{config_path}' is not valid yaml: {exc}")
+    if not isinstance(config, dict) or not isinstance(config.get("eufs_launcher"), dict):
+        raise ValueError(f"'{config_path}' has no eufs_launcher section")
+    config = config["eufs_launcher"]
+
+    with open(models_path or default_models_path(), "r") as f:
+        vehicle_models = tuple(line.strip() for line in f if line.strip())
+    robots_dir = robots_dir or default_robots_dir()
+    # Robots are the directories with a robot.urdf.xacro, the rest can't be launched. A robot
+    # without the config of a preset is left out, rather than the whole config rejected.
+    robots = []
+    warnings = []
+    for robot in sorted(os.listdir(robots_dir)):
+        urdf, *configs = robot_sources(robots_dir, robot)
+        if not os.path.isfile(urdf):
+            continue
+        missing = [os.path.basename(path) for path in configs if not os.path.isfile(path)]
+        if missing:
+            warnings.append(f"robot {robot} is left out, it has no {', '.join(missing)} for "
+                            "the presets")
+        else:
+            robots.append(robot)
+    robots = tuple(robots)
+
+    problems = []
+
+    def setting(key, choices=None):
+        value = config.get(key)
+        if not isinstance(value, str):
+            problems.append(f"{key} must be a string")
+        elif choices is not None and value not in choices:
+            problems.append(f"{key} is {value}, expected one of {', '.join(choices)}")
+        return value
+
+    base_track = setting("base_track")
+    vehicle_model = setting("default_vehicle_model", vehicle_models)
+    command_mode = setting("default_command_mode", COMMAND_MODES)
+    preset = setting("default_vehicle_preset", MODEL_CONFIGS)
+    robot_name = setting("default_robot_name", robots)
+    launch_directory = setting("default_launch_directory")
+    launch_file = setting("default_launch_file")
+
+    checkboxes = []
+    if not isinstance(config.get("checkboxes", {}), dict):
+        problems.append("checkboxes must be a mapping")
+    else:
+        for key, value in (config.get("checkboxes") or {}).items():
+            checkbox = _compile_checkbox(key, value, problems)
+            if checkbox is not None:
+                checkboxes.append(checkbox)
+    names = [checkbox.name for checkbox in checkboxes]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        problems.append(f"checkbox names {', '.join(duplicates)} are used more than once")
+
+    wait_for = SIMULATION_READY
+    if "wait_for" in config:
+        try:
+            wait_for = parse_conditions(config["wait_for"] or {})
+        except AttributeError:
+            problems.append("wait_for must be a mapping")
+
+    if problems:
+        raise ValueError(f"invalid launcher config '{config_path}':\n  "
+                         + "\n  ".join(problems + warnings))
+
+    # Checkboxes without a wait_for of their own wait for what the rest do
+    checkboxes = OrderedDict(
+        (checkbox.key, checkbox._replace(
+            conditions=wait_for if checkbox.conditions is None else checkbox.conditions))
+        for checkbox in sorted(checkboxes, key=lambda checkbox: checkbox.priority)
+    )
+    return LauncherConfig(
+        base_track, vehicle_model, command_mode, preset, robot_name, launch_directory,
+        launch_file, vehicle_models, dict(MODEL_CONFIGS), robots, checkboxes, wait_for,
+        tuple(warnings)
+    )
+
+
+def _stat(path):
+    """What a cached config is validated against, None if the path doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _to_json(config):
+    return dict(
+        config._asdict(),
+        checkboxes=[checkbox._asdict() for checkbox in config.checkboxes.values()],
+    )
+
+
+def _from_json(data):
+    def conditions(entries):
+        return tuple(Condition(*entry) for entry in entries)
+
+    checkboxes = OrderedDict()
+    for entry in data["checkboxes"]:
+        entry.update(
+            if_on=tuple(entry["if_on"]), if_off=tuple(entry["if_off"]),
+            args=tuple(entry["args"]), conditions=conditions(entry["conditions"])
+        )
+        checkboxes[entry["key"]] = Checkbox(**entry)
+    data.update(
+        vehicle_models=tuple(data["vehicle_models"]), robots=tuple(data["robots"]),
+        checkboxes=checkboxes, wait_for=conditions(data["wait_for"]),
+        warnings=tuple(data["warnings"])
+    )
+    return LauncherConfig(**data)
+
+
+def load_launcher_config(config_path=None, models_path=None, robots_dir=None, cache_path=None):
+    """
+    `compile_config()`, cached. A compiled config is kept for each config, vehicle models and
+    robots directory it was compiled from, along with the modification time and size of their
+    files, and compiled again once any of them changes.
+
+    Args:
+        config_path, models_path, robots_dir: see `compile_config()`
+        cache_path (str): where compiled configs are kept (default: `default_cache_path()`)
+    """
+    config_path = os.path.abspath(config_path or default_config_path())
+    models_path = os.path.abspath(models_path or default_models_path())
+    robots_dir = os.path.abspath(robots_dir or default_robots_dir())
+    # The same config compiles differently with other vehicle models or robots
+    key = json.dumps([config_path, models_path, robots_dir])
+    cache_path = cache_path or default_cache_path()
+
+    cache = {}
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if cache.get("version") != CACHE_VERSION:
+        cache = {"version": CACHE_VERSION, "configs": {}}
+
+    entry = cache["configs"].get(key)
+    if entry is not None and all(_stat(path) == stats for path, stats in entry["sources"]):
+        try:
+            return _from_json(entry["config"])
+        except (KeyError, TypeError):
+            pass
+
+    config = compile_config(config_path, models_path, robots_dir)
+    # Robots are added to the robots directory, but their files only to their own directory,
+    # so those of every robot are watched, including robots left out
+    sources = [config_path, models_path, robots_dir]
+    sources += [path for robot in sorted(os.listdir(robots_dir))
+                if os.path.isdir(join(robots_dir, robot))
+                for path in robot_sources(robots_dir, robot)]
+    cache["configs"][key] = {
+        "sources": [[path, _stat(path)] for path in sources],
+        "config": _to_json(config),
+    }
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        atomic_write(cache_path, json.dumps(cache, sort_keys=True))
+    except OSError as exc:
+        print(f"Could not cache the launcher config in '{cache_path}': {exc}")
+    return config
@@ -0,0 +1,150 @@
+"""
+Starts launches once what they depend on is ready, instead of straight away or after a fixed
+delay. A launch waits on conditions: a service being available or the first message on a
+topic. Launches whose conditions hold are started together, so bring-up takes as long as its
+slowest chain of dependencies, however slow the machine.
+"""
+import time
+from collections import namedtuple
+
+
+# kind is "service" or "topic", the latter being met by the first message on it
+Condition = namedtuple("Condition", ["kind", "name"])
+
+# The car is in the simulation and its plugin is running. Used when the config doesn't say.
+SIMULATION_READY = (
+    Condition("service", "/ros_can/reset"),
+    Condition("topic", "/ros_can/state"),
+)
+
+# How long a launch waits before a warning says what it is waiting for, in seconds
+WARN_AFTER = 60.0
+
+
+def parse_conditions(wait_for):
+    """Conditions of a wait_for entry of the launcher config: {services: [...], topics: [...]}"""
+    return tuple(
+        [Condition("service", name) for name in wait_for.get("services", ())]
+        + [Condition("topic", name) for name in wait_for.get("topics", ())]
+    )
+
+
+class ReadinessMonitor:
+    """
+    Checks conditions against the ROS graph as seen by node. Topics are subscribed to (with
+    whatever type they are advertised with) once something waits on them, so node has to be
+    spun for their first message to be seen.
+    """
+
+    def __init__(self, node):
+        self.node = node
+        self.received = set()
+        self.subscriptions = {}
+
+    def met(self, conditions):
+        """Which of conditions hold now"""
+        conditions = set(conditions)
+        met = set()
+        if any(condition.kind == "service" for condition in conditions):
+            services = {name for name, _ in self.node.get_service_names_and_types()}
+            met.update(condition for condition in conditions
+                       if condition.kind == "service" and condition.name in services)
+
+        topics = {condition.name for condition in conditions if condition.kind == "topic"}
+        waiting = topics - self.received - set(self.subscriptions)
+        if waiting:
+            self._subscribe(waiting)
+        met.update(condition for condition in conditions
+                   if condition.kind == "topic" and condition.name in self.received)
+        return met
+
+    def _subscribe(self, topics):
+        from rclpy.qos import qos_profile_sensor_data
+        from rosidl_runtime_py.utilities import get_message
+
+        for topic, types in self.node.get_topic_names_and_types():
+            if topic in topics and types:
+                self.subscriptions[topic] = self.node.create_subscription(
+                    get_message(types[0]), topic, self._receiver(topic),
+                    qos_profile_sensor_data
+                )
+
+    def _receiver(self, topic):
+        def receive(_):
+            self.received.add(topic)
+        return receive
+
+    def close(self):
+        for subscription in self.subscriptions.values():
+            self.node.destroy_subscription(subscription)
+        self.subscriptions = {}
+
+
+class LaunchSequencer:
+    """
+    Starts commands through a `ProcessSupervisor` once their conditions hold, as checked by a
+    `ReadinessMonitor` on every `poll()`. Commands without conditions start straight away.
+
+        sequencer = LaunchSequencer(supervisor, ReadinessMonitor(node))
+        sequencer.add("simulation", simulation_command)
+        sequencer.add("controls", controls_command, SIMULATION_READY)
+        while sequencer.pending():
+            rclpy.spin_once(node, timeout_sec=0.2)
+            sequencer.poll()
+    """
+
+    def __init__(self, supervisor, monitor, log=print, warn_after=WARN_AFTER):
+        """
+        supervisor: The ProcessSupervisor to start the commands with
+        monitor:    The ReadinessMonitor checking conditions
+        log:        Called with messages about the launches waiting
+        warn_after: Seconds a launch waits before log is told what it's waiting for
+        """
+        self.supervisor = supervisor
+        self.monitor = monitor
+        self.log = log
+        self.warn_after = warn_after
+        # name -> (command, conditions, Popen kwargs, when it was added, warned yet)
+        self.waiting = {}
+
+    def add(self, name, command, conditions=(), **kwargs):
+        """
+        Starts command (with kwargs for Popen) as name once conditions hold. name is made
+        unique among the launches waiting and started, as by the supervisor, and returned.
+        """
+        if not conditions:
+            return self.supervisor.start(name, command, **kwargs)
+        unique, i = name, 1
+        while unique in self.waiting or unique in self.supervisor.processes:
+            i += 1
+            unique = f"{name} ({i})"
+        self.waiting[unique] = (command, tuple(conditions), kwargs, time.monotonic(), False)
+        return unique
+
+    def pending(self):
+        """Names of the launches still waiting"""
+        return list(self.waiting)
+
+    def poll(self):
+        """Starts every waiting launch whose conditions hold now, returns their names"""
+        if not self.waiting:
+            return []
+        met = self.monitor.met(
+            {condition for _, conditions, *_ in self.waiting.values() for condition in conditions}
+        )
+        started = []
+        for name, (command, conditions, kwargs, added, warned) in list(self.waiting.items()):
+            if met.issuperset(conditions):
+                del self.waiting[name]
+                started.append(self.supervisor.start(name, command, **kwargs))
+            elif not warned and time.monotonic() - added > self.warn_after:
+                missing = ", ".join(f"{c.kind} {c.name}" for c in conditions if c not in met)
+                self.log(f"{name} is still waiting for {missing}")
+                self.waiting[name] = (command, conditions, kwargs, added, True)
+        return started
+
+    def cancel(self):
+        """Drops the launches still waiting, returns their names"""
+        names = self.pending()
+        self.waiting = {}
+        return names
@@ -0,0 +1,323 @@
+"""
+Runs many headless simulations at once, e.g. for regression testing. Each simulation gets its
+own ROS_DOMAIN_ID and Gazebo master port so that simulations running side by side don't see
+each other, and the number running at once is capped by the cores available.
+"""
+import argparse
+import os
+import re
+import shlex
+import sys
+import time
+import yaml
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from subprocess import DEVNULL, STDOUT
+
+from eufs_launcher.headless import launch_command
+from eufs_launcher.supervisor import ProcessSupervisor, SHUTDOWN_SIGNALS
+
+
+# A simulation to run, timeout (in seconds) overrides that of the scheduler. test is a shell
+# command run alongside the simulation, in its ROS domain, whose exit status decides whether
+# the job passed. Without one, the simulation is run until the timeout.
+Job = namedtuple(
+    "Job",
+    ["track", "vehicle_model", "vehicle_model_config", "robot_name", "launch_group", "timeout",
+     "test"],
+    defaults=("DynamicBicycle", "configDry.yaml", "eufs", "no_perception", None, None)
+)
+
+# How a job went. A job without a test passed if its simulation ran until the timeout (or
+# exited successfully before), one with a test if the test exited with 0 before the timeout,
+# even if the simulation exited too. returncode is that of the test, or of the simulation when
+# it exited first (None if it was shut down), timed_out whether the job ran until its timeout,
+# duration in seconds, peak_rss the most memory the simulation and its nodes used at once and
+# error what went wrong when the job couldn't run its course.
+JobResult = namedtuple(
+    "JobResult",
+    ["job", "passed", "returncode", "timed_out", "duration", "domain_id", "gazebo_port",
+     "peak_rss", "log_path", "error"]
+)
+
+# Domain IDs which map to ports valid on every platform, see the ROS 2 docs on domain IDs
+MAX_DOMAIN_ID = 101
+
+# Port Gazebo's master listens on by default, simulations get the ones following it
+GAZEBO_PORT = 11345
+
+# Cores left to each simulation when capping how many run at once
+CORES_PER_SIM = 2
+
+
+def available_cores():
+    """Cores this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def simulation_command(job):
+    """The command running a job's simulation headless, without RViz, rqt or the Gazebo GUI"""
+    return launch_command("eufs_launcher", "simulation.launch.py", [
+        f"track:={job.track}",
+        f"vehicleModel:={job.vehicle_model}",
+        f"vehicleModelConfig:={job.vehicle_model_config}",
+        f"robot_name:={job.robot_name}",
+        f"launch_group:={job.launch_group}",
+        "gazebo_gui:=false",
+        "rviz:=false",
+        "show_rqt_gui:=false",
+    ])
+
+
+class SimulationScheduler:
+    """
+    Runs a queue of `Job`s, up to max_parallel at once, each under its own
+    `ProcessSupervisor` so that jobs which time out are shut down along with all their nodes.
+
+    A job runs in a slot, which gives it its ROS_DOMAIN_ID (base_domain_id + slot) and Gazebo
+    master port (base_port + slot), so no two jobs running at once share either. The command
+    run for a job is made by command(job) (`simulation_command()` by default), which can be
+    swapped for a stand-in process to test the scheduling without Gazebo.
+
+        scheduler = SimulationScheduler(timeout=300, log_dir="runs")
+        for result in scheduler.run([Job("small_track"), Job("rand", test="./drive.sh")]):
+            print(result.job.track, result.passed, result.error)
+    """
+
+    def __init__(self, max_parallel=None, timeout=600.0, command=simulation_command,
+                 log_dir=None, base_domain_id=1, base_port=GAZEBO_PORT,
+                 shutdown_signals=SHUTDOWN_SIGNALS, interval=0.5):
+        """
+        max_parallel:     Most jobs run at once (default: the available cores / CORES_PER_SIM)
+        timeout:          Seconds a job runs for (or may take for its test) before it is shut
+                          down, None for no limit
+        command:          Callable making the command of a job
+        log_dir:          Directory the output of each job is written to (default: discarded)
+        base_domain_id:   ROS_DOMAIN_ID of the first slot
+        base_port:        Gazebo master port of the first slot
+        shutdown_signals: Signals jobs are shut down with, see `ProcessSupervisor.shutdown()`
+        interval:         How often running jobs are checked on, in seconds
+        """
+        if max_parallel is None:
+            max_parallel = max(1, available_cores() // CORES_PER_SIM)
+        self.max_parallel = min(max_parallel, MAX_DOMAIN_ID - base_domain_id + 1)
+        if self.max_parallel < 1:
+            raise ValueError(f"no domain IDs left from {base_domain_id} to {MAX_DOMAIN_ID}")
+        self.timeout = timeout
+        self.command = command
+        self.log_dir = log_dir
+        self.base_domain_id = base_domain_id
+        self.base_port = base_port
+        self.shutdown_signals = shutdown_signals
+        self.interval = interval
+
+    def run(self, jobs, on_result=None):
+        """
+        Runs every job, blocking until they are all done.
+
+        Args:
+            jobs (iterable): the `Job`s to run, started in order
+            on_result (callable): called with each `JobResult` as soon as its job is done, from
+                                  the thread which ran it
+
+        Returns:
+            The `JobResult` of each job, in the order of jobs
+        """
+        jobs = list(jobs)
+        if self.log_dir is not None:
+            os.makedirs(self.log_dir, exist_ok=True)
+        slots = Queue()
+        for slot in range(min(self.max_parallel, len(jobs))):
+            slots.put(slot)
+
+        def run_in_slot(index, job):
+            slot = slots.get()
+            try:
+                result = self._run_job(index, job, slot)
+            finally:
+                slots.put(slot)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_parallel, len(jobs)))) as pool:
+            futures = [pool.submit(run_in_slot, i, job) for i, job in enumerate(jobs)]
+            return [future.result() for future in futures]
+
+    def _run_job(self, index, job, slot):
+        domain_id = self.base_domain_id + slot
+        port = self.base_port + slot
+        env = {
+            **os.environ,
+            "ROS_DOMAIN_ID": str(domain_id),
+            "GAZEBO_MASTER_URI": f"http://localhost:{port}",
+        }
+
+        started = time.monotonic()
+        log_path = None
+
+        def failed(error):
+            """The result of a job which couldn't be run, so that the other jobs still are"""
+            return JobResult(job, False, None, False, time.monotonic() - started, domain_id,
+                             port, 0, log_path, error)
+
+        output = DEVNULL
+        if self.log_dir is not None:
+            name = re.sub(r"[^\w.-]", "_", f"{index}_{job.track}")
+            log_path = os.path.join(self.log_dir, name + ".log")
+            try:
+                output = open(log_path, "wb")
+            except OSError as exc:
+                return failed(f"could not open its log: {exc}")
+
+        timeout = job.timeout if job.timeout is not None else self.timeout
+        supervisor = ProcessSupervisor()
+        test = None
+        try:
+            try:
+                simulation = supervisor.start(job.track, self.command(job), env=env,
+                                              stdout=output, stderr=STDOUT, stdin=DEVNULL)
+                if job.test is not None:
+                    test = supervisor.start("test", ["sh", "-c", job.test], env=env,
+                                            stdout=output, stderr=STDOUT, stdin=DEVNULL)
+            except (OSError, ValueError) as exc:
+                # e.g. ros2 isn't on the PATH. The simulation is stopped if only the test failed.
+                supervisor.shutdown(self.shutdown_signals)
+                return failed(f"could not be started: {exc}")
+            peak_rss = 0
+            timed_out = False
+            # The job is over once its test finishes or the simulation exits
+            while all(name in supervisor.running() for name in (simulation, test) if name):
+                usage = supervisor.sample().get(simulation)
+                if usage is not None:
+                    peak_rss = max(peak_rss, usage.rss)
+                if timeout is not None and time.monotonic() - started > timeout:
+                    timed_out = True
+                    break
+                time.sleep(self.interval)
+
+            # What exited by itself, before the shutdown, which isn't counted in the duration
+            exited = dict(supervisor.returncodes)
+            duration = time.monotonic() - started
+            # Stops whatever the simulation left running too
+            supervisor.shutdown(self.shutdown_signals)
+        finally:
+            if output is not DEVNULL:
+                output.close()
+
+        error = None
+        simulation_code = exited.get(simulation)
+        if test is None:
+            # The simulation doesn't exit on its own, unless it crashes
+            returncode = None if timed_out else simulation_code
+            passed = timed_out or returncode == 0
+            if not passed:
+                error = f"simulation exited with {returncode} after {duration:.1f}s"
+        elif test in exited:
+            # The test decides, even if the simulation exited within the same interval
+            returncode = exited[test]
+            passed = returncode == 0
+        elif timed_out:
+            returncode, passed = None, False
+            error = "test didn't finish before the timeout"
+        else:
+            returncode, passed = simulation_code, False
+            error = f"simulation exited with {returncode} before the test finished"
+        return JobResult(
+            job, passed, returncode, timed_out, duration, domain_id, port, peak_rss, log_path,
+            error
+        )
+
+
+def load_jobs(jobs_path):
+    """
+    Reads jobs from a yaml list, each a track name or a mapping of the fields of `Job`, e.g.
+
+        - small_track
+        - {track: rand, vehicle_model_config: configWet.yaml, timeout: 120}
+    """
+    with open(jobs_path, "r") as f:
+        entries = yaml.safe_load(f) or []
+    return [Job(entry) if isinstance(entry, str) else Job(**entry) for entry in entries]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Runs many headless simulations at once, each in its own ROS domain")
+    parser.add_argument("jobs", help="yaml file listing the jobs, see load_jobs()")
+    parser.add_argument(
+        '--parallel',
+        type=int,
+        help=f"most simulations run at once (default: available cores / {CORES_PER_SIM})")
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=600.0,
+        help="seconds each simulation runs for, or may take for its test, unless its job says "
+             "otherwise (default: 600)")
+    parser.add_argument('--log-dir', help="write the output of each simulation here")
+    parser.add_argument(
+        '--base-domain-id',
+        type=int,
+        default=1,
+        help="ROS_DOMAIN_ID of the first simulation running at once (default: 1)")
+    parser.add_argument(
+        '--base-port',
+        type=int,
+        default=GAZEBO_PORT,
+        help=f"Gazebo master port of the first simulation running at once (default: {GAZEBO_PORT})")
+    parser.add_argument(
+        '--shutdown-timeouts',
+        type=float,
+        nargs=3,
+        metavar=("INT", "TERM", "KILL"),
+        default=[timeout for _, timeout in SHUTDOWN_SIGNALS],
+        help="seconds a simulation is given to stop after SIGINT, then SIGTERM and SIGKILL, "
+             "before the next is sent (default: %(default)s)")
+    parser.add_argument(
+        '--stand-in',
+        help="shell command run instead of each simulation, to try out the scheduling. It gets "
+             "the job's fields as TRACK, VEHICLE_MODEL, VEHICLE_MODEL_CONFIG, ROBOT_NAME and "
+             "LAUNCH_GROUP")
+    args = parser.parse_args(argv)
+
+    def stand_in_command(job):
+        fields = " ".join(f"{field.upper()}={shlex.quote(str(value))}"
+                          for field, value in job._asdict().items()
+                          if field not in ("timeout", "test"))
+        return ["sh", "-c", f"{fields}; {args.stand_in}"]
+
+    command = simulation_command if args.stand_in is None else stand_in_command
+
+    shutdown_signals = tuple((sig, timeout) for (sig, _), timeout
+                             in zip(SHUTDOWN_SIGNALS, args.shutdown_timeouts))
+    scheduler = SimulationScheduler(
+        max_parallel=args.parallel, timeout=args.timeout, command=command,
+        log_dir=args.log_dir, base_domain_id=args.base_domain_id, base_port=args.base_port,
+        shutdown_signals=shutdown_signals
+    )
+    jobs = load_jobs(args.jobs)
+    print(f"Running {len(jobs)} simulations, {min(scheduler.max_parallel, len(jobs))} at once")
+
+    def report(result):
+        if result.passed:
+            outcome = "passed"
+        else:
+            outcome = "failed" if result.returncode is None else f"failed ({result.returncode})"
+        print(f"{result.job.track:<32} {outcome:<14} {result.duration:7.1f}s "
+              f"domain {result.domain_id:<3} {result.peak_rss / 2 ** 20:6.0f}MB")
+        if result.error is not None:
+            print(f"    {result.error}")
+
+    results = scheduler.run(jobs, on_result=report)
+    failed = sum(not result.passed for result in results)
+    print(f"{len(results) - failed} of {len(results)} simulations passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""
+Opt-in profiling of how long a simulation takes to start. With EUFS_STARTUP_PROFILE set to a
+file, every step of the launch chain that knows about it appends an event to that file: the
+launcher, `simulation.launch.py`, `load_car.launch.py` (xacro), each process started by
+`ros2 launch`, and the first message on key topics (see `watch_topics()`). Events are json
+lines of wall clock time, pid, phase and event ("begin", "end" or "mark"), so that processes
+can write to the same file at once.
+
+    EUFS_STARTUP_PROFILE=/tmp/startup.jsonl ros2 launch eufs_launcher eufs_launcher.launch.py
+    python3 -m eufs_launcher.startup_profile report /tmp/startup.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+
+ENV_VAR = "EUFS_STARTUP_PROFILE"
+
+# Topics whose first message marks parts of the simulation being up
+KEY_TOPICS = (
+    "/clock",
+    "/ros_can/state",
+    "/ground_truth/odom",
+    "/ground_truth/cones",
+    "/cones",
+)
+
+# How long watch_topics() waits for the first message of every topic, in seconds
+WATCH_TIMEOUT = 180.0
+
+
+def enabled():
+    return bool(os.environ.get(ENV_VAR))
+
+
+def record(phase, event="mark", **info):
+    """Appends an event to the profile, if profiling is enabled"""
+    path = os.environ.get(ENV_VAR)
+    if not path:
+        return
+    line = json.dumps({"time": time.time(), "pid": os.getpid(), "phase": phase,
+                       "event": event, **info})
+    # A single write to a file opened for appending is never interleaved with others
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (line + "\n").encode())
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def phase(name, **info):
+    """Records the beginning and end of what runs in the with block"""
+    record(name, "begin", **info)
+    try:
+        yield
+    finally:
+        record(name, "end")
+
+
+def read_events(path):
+    """The events of a profile, in the order they happened"""
+    events = []
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    return sorted(events, key=lambda event: event["time"])
+
+
+def spans(events):
+    """
+    Pairs up the beginning and end of each phase (of each process), marks are spans without
+    an end. Returns a list of (phase, start, end or None, event) sorted by start, where event
+    is the event the span started with.
+    """
+    found, open_spans = [], {}
+    for event in events:
+        key = (event["phase"], event["pid"])
+        if event["event"] == "begin":
+            open_spans[key] = event
+        elif event["event"] == "end" and key in open_spans:
+            begin = open_spans.pop(key)
+            found.append((event["phase"], begin["time"], event["time"], begin))
+        else:
+            found.append((event["phase"], event["time"], None, event))
+    # Phases which never ended, e.g. the launch was stopped before
+    found.extend((key[0], begin["time"], None, begin) for key, begin in open_spans.items())
+    return sorted(found, key=lambda span: span[1])
+
+
+def format_timeline(events):
+    """A text timeline of a profile, in seconds since its first event"""
+    if not events:
+        return "No events"
+    start = events[0]["time"]
+    lines = [f"{'at':>9} {'took':>9}  phase"]
+    for name, begin, end, event in spans(events):
+        info = {key: value for key, value in event.items()
+                if key not in ("time", "pid", "phase", "event")}
+        took = "" if end is None else f"{end - begin:8.3f}s"
+        details = " ".join(f"{key}={value}" for key, value in info.items())
+        lines.append(f"{begin - start:8.3f}s {took:>9}  {name} {details}".rstrip())
+    lines.append(f"Total: {events[-1]['time'] - start:.3f}s")
+    return "\n".join(lines)
+
+
+def trace(events):
+    """A profile in the Trace Event Format, which chrome://tracing and Perfetto open"""
+    start = events[0]["time"] if events else 0.0
+    trace_events = []
+    for name, begin, end, event in spans(events):
+        entry = {
+            "name": name,
+            "pid": event["pid"],
+            "tid": event["pid"],
+            "ts": (begin - start) * 1e6,
+            "args": {key: value for key, value in event.items()
+                     if key not in ("time", "pid", "phase", "event")},
+        }
+        if end is None:
+            entry.update(ph="i", s="p")
+        else:
+            entry.update(ph="X", dur=(end - begin) * 1e6)
+        trace_events.append(entry)
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+def summary(events):
+    """Seconds from the first event to the start of each phase (first occurrence), as json"""
+    if not events:
+        return {}
+    start = events[0]["time"]
+    times = {}
+    for name, begin, _, _ in spans(events):
+        times.setdefault(name, round(begin - start, 3))
+    return {"total": round(events[-1]["time"] - start, 3), "phases": times}
+
+
+def watch_topics(topics=KEY_TOPICS, timeout=WATCH_TIMEOUT):
+    """
+    Records the first message on each of topics, as "first message <topic>" marks. Subscribes
+    to each topic as soon as it is advertised, whatever its type, and returns once every
+    topic has had a message or timeout seconds have passed.
+    """
+    import rclpy
+    from rclpy.qos import qos_profile_sensor_data
+    from rosidl_runtime_py.utilities import get_message
+
+    rclpy.init()
+    node = rclpy.create_node("eufs_startup_profile")
+    record("watch topics", "begin", topics=list(topics))
+    pending = set(topics)
+    subscriptions = {}
+
+    def first_message(topic):
+        def callback(_):
+            if topic in pending:
+                pending.discard(topic)
+                record(f"first message {topic}")
+        return callback
+
+    deadline = time.monotonic() + timeout
+    try:
+        while pending and time.monotonic() < deadline:
+            for topic, types in node.get_topic_names_and_types():
+                if topic in pending and topic not in subscriptions and types:
+                    subscriptions[topic] = node.create_subscription(
+                        get_message(types[0]), topic, first_message(topic),
+                        qos_profile_sensor_data
+                    )
+            rclpy.spin_once(node, timeout_sec=0.1)
+    finally:
+        record("watch topics", "end", missing=sorted(pending))
+        node.destroy_node()
+        rclpy.shutdown()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profiles how long eufs_sim takes to start")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="prints the timeline of a profile")
+    report.add_argument("profile", help="file the events were written to")
+    report.add_argument(
+        '--format',
+        choices=["text", "json", "trace"],
+        default="text",
+        help="'text' timeline, 'json' summary of when each phase started, to track across "
+             "releases, or 'trace' for chrome://tracing (default: text)")
+    report.add_argument('-o', '--output', help="write the report here instead of printing it")
+
+    watch = commands.add_parser("watch", help="records the first message on key topics")
+    watch.add_argument(
+        '--topics',
+        nargs="+",
+        default=list(KEY_TOPICS),
+        help=f"topics to watch (default: {' '.join(KEY_TOPICS)})")
+    watch.add_argument(
+        '--timeout',
+        type=float,
+        default=WATCH_TIMEOUT,
+        help=f"seconds to wait for the topics (default: {WATCH_TIMEOUT:g})")
+
+    # Arguments ROS adds when this is run as a node are not ours
+    args, _ = parser.parse_known_args(argv)
+    if args.command == "watch":
+        watch_topics(args.topics, args.timeout)
+        return 0
+
+    events = read_events(args.profile)
+    if args.format == "text":
+        output = format_timeline(events)
+    else:
+        output = json.dumps(summary(events) if args.format == "json" else trace(events),
+                            indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
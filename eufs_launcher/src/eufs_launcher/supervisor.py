@@ -0,0 +1,215 @@
+import os
+import signal
+import time
+from collections import namedtuple
+from subprocess import Popen
+
+from eufs_launcher import startup_profile
+
+
+# Resource usage of a supervised process and its descendants: CPU use in percent of a core
+# since the last sample, resident memory in bytes, and the number of threads and processes
+Usage = namedtuple("Usage", ["cpu", "rss", "threads", "processes"])
+
+# Signals sent to stop supervised processes, and how long each is given to work (in seconds)
+# before the next one is sent to what is left of their process trees. SIGINT lets ros2 launch
+# shut its nodes down cleanly.
+SHUTDOWN_SIGNALS = ((signal.SIGINT, 10.0), (signal.SIGTERM, 5.0), (signal.SIGKILL, 2.0))
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def read_proc_stats(proc="/proc"):
+    """
+    Reads /proc/<pid>/stat of every process, for their parent and resource usage. Zombies and
+    processes exiting while they are read are left out.
+
+    Returns:
+        A dict mapping each pid to (ppid, start time, cpu time in ticks, threads, rss in pages)
+    """
+    stats = {}
+    for name in os.listdir(proc):
+        if not name.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc, name, "stat"), "rb") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may contain anything, so split after it
+        fields = stat[stat.rindex(b")") + 2:].split()
+        if fields[0] == b"Z":
+            continue
+        stats[int(name)] = (
+            int(fields[1]), int(fields[19]), int(fields[11]) + int(fields[12]),
+            int(fields[17]), int(fields[21])
+        )
+    return stats
+
+
+def descendants(children, pid):
+    """pid and every process under it, given a dict of each process's children"""
+    tree, pending = [], [pid]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, ()))
+    return tree
+
+
+class ProcessSupervisor:
+    """
+    Starts processes and keeps track of them and everything they start, e.g. the nodes of
+    `ros2 launch`. Each `sample()` reads /proc once for all of them, reporting their resource
+    usage and which of them exited unexpectedly. `shutdown()` stops them, escalating from
+    SIGINT to SIGTERM to SIGKILL for whatever is still running when each signal times out.
+
+    Processes which leave their tree (e.g. daemons started with a double fork) are not seen.
+
+        supervisor = ProcessSupervisor()
+        supervisor.start("simulation", ["ros2", "launch", ...])
+        for name, usage in supervisor.sample().items():
+            print(name, usage.cpu, usage.rss)
+        supervisor.shutdown()
+    """
+
+    def __init__(self, on_exit=None, proc="/proc"):
+        """
+        on_exit: Called with the name and return code of each process that exits before
+                 `shutdown()`, from `sample()` or `poll()`
+        proc:    Where procfs is mounted
+        """
+        self.on_exit = on_exit
+        self.proc = proc
+        self.processes = {}
+        self.returncodes = {}
+        self.usage = {}
+        self.trees = {}
+        self.stopping = False
+        # CPU time of each process at the last sample, by (pid, start time) so that reused
+        # pids aren't mistaken for the same process
+        self._cpu_times = {}
+        self._sampled = None
+
+    def start(self, name, command, **kwargs):
+        """Starts command as a supervised process called name (made unique), returns the name"""
+        unique, i = name, 1
+        while unique in self.processes:
+            i += 1
+            unique = f"{name} ({i})"
+        self.processes[unique] = Popen(command, **kwargs)
+        startup_profile.record(f"start {unique}", process_pid=self.processes[unique].pid)
+        return unique
+
+    def poll(self):
+        """Checks which processes exited since last time, returns their {name: return code}"""
+        exited = {}
+        for name, process in self.processes.items():
+            if name not in self.returncodes and process.poll() is not None:
+                exited[name] = self.returncodes[name] = process.returncode
+        if not self.stopping and self.on_exit is not None:
+            for name, returncode in exited.items():
+                self.on_exit(name, returncode)
+        return exited
+
+    def running(self):
+        """Names of the processes still running"""
+        return [name for name in self.processes if name not in self.returncodes]
+
+    def crashed(self):
+        """{name: return code} of the processes which failed before shutdown"""
+        return {name: code for name, code in self.returncodes.items() if code != 0}
+
+    def sample(self):
+        """
+        Measures the resource usage of every process still running along with its
+        descendants, and checks which ones exited.
+
+        Returns:
+            A dict mapping the name of each running process to its `Usage`
+        """
+        self.poll()
+        stats = read_proc_stats(self.proc)
+        now = time.monotonic()
+        elapsed = None if self._sampled is None else now - self._sampled
+        self._sampled = now
+
+        children = {}
+        for pid, (ppid, *_) in stats.items():
+            children.setdefault(ppid, []).append(pid)
+
+        usage, cpu_times = {}, {}
+        for name in self.running():
+            tree = [pid for pid in descendants(children, self.processes[name].pid)
+                    if pid in stats]
+            self.trees[name] = [(pid, stats[pid][1]) for pid in tree]
+            cpu, rss, threads = 0.0, 0, 0
+            for pid in tree:
+                _, started, ticks, process_threads, pages = stats[pid]
+                cpu_times[pid, started] = ticks
+                if elapsed:
+                    # Processes started since the last sample count from their start
+                    before = self._cpu_times.get((pid, started), 0)
+                    cpu += (ticks - before) / CLOCK_TICKS / elapsed * 100
+                rss += pages * PAGE_SIZE
+                threads += process_threads
+            usage[name] = Usage(cpu, rss, threads, len(tree))
+
+        self._cpu_times = cpu_times
+        self.usage = usage
+        return usage
+
+    def _remaining(self):
+        """
+        The pids of the processes of the last sampled trees which are still running, checked
+        against their start time so that reused pids are left alone
+        """
+        stats = read_proc_stats(self.proc)
+        return [
+            pid for tree in self.trees.values() for pid, started in tree
+            if pid in stats and stats[pid][1] == started
+        ]
+
+    def _signal(self, sig, roots_only):
+        """Sends sig to the supervised processes still running, or to what is left of their trees"""
+        roots = [process.pid for process in self.processes.values() if process.poll() is None]
+        pids = roots if roots_only else set(roots) | set(self._remaining())
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+
+    def _alive(self):
+        """Whether any supervised process or one of its known descendants is still running"""
+        # Supervised processes are zombies until poll() reaps them, so check them first
+        if any(process.poll() is None for process in self.processes.values()):
+            return True
+        return bool(self._remaining())
+
+    def shutdown(self, signals=SHUTDOWN_SIGNALS, interval=0.1):
+        """
+        Stops every process. The first signal is only sent to the supervised processes, so that
+        they can stop their children themselves, later ones go to every process of their trees.
+
+        Args:
+            signals (tuple): (signal, timeout in seconds) to send in turn
+            interval (float): how often to check whether the processes are gone, in seconds
+
+        Returns:
+            The names of the processes which were still running when the last signal timed out
+        """
+        self.stopping = True
+        # Note the trees as they are now, children are orphaned once their parent is gone
+        if self.running():
+            self.sample()
+        for i, (sig, timeout) in enumerate(signals):
+            if not self._alive():
+                break
+            self._signal(sig, roots_only=i == 0)
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline and self._alive():
+                time.sleep(interval)
+        self.poll()
+        return self.running()
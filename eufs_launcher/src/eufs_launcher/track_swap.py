@@ -0,0 +1,230 @@
+"""
+Swaps the track of a running simulation, without restarting Gazebo: the track model is deleted
+and the new track is spawned from `eufs_tracks.track_io.render_model_sdf()`, then the car is
+deleted and spawned again at the new track's start. This takes seconds rather than a full
+relaunch, e.g. to drive many tracks in one session.
+
+    ros2 run eufs_launcher eufs_track_swap hairpins_increasing_difficulty
+"""
+import argparse
+import math
+import sys
+import threading
+import time
+
+from eufs_tracks.track_io import TrackIndex, render_model_sdf
+
+
+# Name of the track model in the worlds of eufs_tracks, and its height there
+TRACK_ENTITY = "track"
+TRACK_Z = 0.5
+
+# Name the car is spawned with (the namespace of load_car.launch.py), and its height
+CAR_ENTITY = "eufs"
+CAR_Z = 0.1
+
+# Formats tracks are read from, in order of preference
+TRACK_FORMATS = ("binary", "csv", "launch")
+
+# Seconds a service may take to be available and to respond
+SERVICE_TIMEOUT = 30.0
+
+
+class GazeboEntities:
+    """
+    Spawns and deletes entities through the spawn_entity and delete_entity services of
+    gazebo_ros's factory plugin, or anything serving them, e.g. a stub node for testing.
+
+    When node is already being spun (as the launcher's node is, by rqt), pass spin=False, the
+    calls then wait for their response without spinning and must not run in that thread.
+    """
+
+    def __init__(self, node, spawn_service="/spawn_entity", delete_service="/delete_entity",
+                 timeout=SERVICE_TIMEOUT, spin=True):
+        from gazebo_msgs.srv import DeleteEntity, SpawnEntity
+        from rcl_interfaces.srv import GetParameters
+
+        self.node = node
+        self.timeout = timeout
+        self.spin = spin
+        self.spawn_client = node.create_client(SpawnEntity, spawn_service)
+        self.delete_client = node.create_client(DeleteEntity, delete_service)
+        self.get_parameters = GetParameters
+
+    def _call(self, client, request):
+        if not client.wait_for_service(timeout_sec=self.timeout):
+            raise RuntimeError(f"{client.srv_name} is not available")
+        future = client.call_async(request)
+        if self.spin:
+            import rclpy
+            rclpy.spin_until_future_complete(self.node, future, timeout_sec=self.timeout)
+        else:
+            done = threading.Event()
+            future.add_done_callback(lambda _: done.set())
+            done.wait(self.timeout)
+        if not future.done():
+            raise RuntimeError(f"{client.srv_name} did not respond")
+        return future.result()
+
+    def delete(self, name):
+        """Deletes entity name, returns whether it existed"""
+        request = self.delete_client.srv_type.Request(name=name)
+        return self._call(self.delete_client, request).success
+
+    def spawn(self, name, xml, x=0.0, y=0.0, z=0.0, yaw=0.0):
+        """Spawns xml (sdf or urdf) as entity name at a pose"""
+        request = self.spawn_client.srv_type.Request(name=name, xml=xml)
+        request.initial_pose.position.x = float(x)
+        request.initial_pose.position.y = float(y)
+        request.initial_pose.position.z = float(z)
+        request.initial_pose.orientation.z = math.sin(yaw / 2)
+        request.initial_pose.orientation.w = math.cos(yaw / 2)
+        response = self._call(self.spawn_client, request)
+        if not response.success:
+            raise RuntimeError(f"could not spawn {name}: {response.status_message}")
+
+    def robot_description(self, node_name="/robot_state_publisher"):
+        """The URDF of the car, as given to the robot_state_publisher of load_car.launch.py"""
+        client = self.node.create_client(self.get_parameters, f"{node_name}/get_parameters")
+        try:
+            request = self.get_parameters.Request(names=["robot_description"])
+            return self._call(client, request).values[0].string_value
+        finally:
+            self.node.destroy_client(client)
+
+
+class TrackSwapper:
+    """
+    Replaces the track of a running simulation with another track of eufs_tracks, and puts the
+    car at its start. Entities are spawned and deleted through entities, a `GazeboEntities` or
+    anything with the same delete(), spawn() and robot_description().
+
+        swapper = TrackSwapper(GazeboEntities(node))
+        for name in ["small_track", "rand"]:
+            swapper.swap(name)
+    """
+
+    def __init__(self, entities, index=None, sdf_mode="links", car_entity=CAR_ENTITY,
+                 robot_description=None):
+        """
+        entities:          What spawns and deletes entities
+        index:             The TrackIndex tracks are found in (default: the installed tracks)
+        sdf_mode:          How cones are rendered, see eufs_tracks.track_io.SDF_MODES. "links"
+                           is the fastest for Gazebo to load.
+        car_entity:        Name of the car's entity
+        robot_description: URDF the car is spawned from (default: asked from entities)
+        """
+        self.entities = entities
+        self.index = index
+        self.sdf_mode = sdf_mode
+        self.car_entity = car_entity
+        self.robot_description = robot_description
+
+    def load(self, name):
+        """The cones and car start of track name"""
+        if self.index is None:
+            self.index = TrackIndex()
+        self.index.refresh()
+        entries = {entry["format"]: entry for entry in self.index.find(name)}
+        for fmt in TRACK_FORMATS:
+            if fmt in entries:
+                return self.index.read(fmt, entries[fmt]["path"])
+        raise KeyError(f"no track called {name}")
+
+    def swap(self, name):
+        """
+        Swaps the current track for track name.
+
+        Returns:
+            A dict of how long each step took, in seconds
+        """
+        times = {}
+        started = time.monotonic()
+
+        def step(label):
+            nonlocal started
+            now = time.monotonic()
+            times[label] = now - started
+            started = now
+
+        cones, car_start = self.load(name)
+        sdf = render_model_sdf(cones, name, mode=self.sdf_mode)
+        # The car is spawned again by the same description, so only fetch it the first time
+        if self.robot_description is None:
+            self.robot_description = self.entities.robot_description()
+        step("render")
+
+        # The car is only deleted once the new track is in, so that it isn't left deleted if
+        # the track can't be spawned
+        self.entities.delete(TRACK_ENTITY)
+        step("delete track")
+        self.entities.spawn(TRACK_ENTITY, sdf, z=TRACK_Z)
+        step("spawn track")
+        # The car's plugins measure its position from where it is spawned, so the car is
+        # spawned again rather than moved
+        self.entities.delete(self.car_entity)
+        step("delete car")
+        x, y, yaw = car_start
+        self.entities.spawn(self.car_entity, self.robot_description, x, y, CAR_Z, yaw)
+        step("spawn car")
+        return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Swaps the track of a running simulation, without restarting it")
+    parser.add_argument("tracks", nargs="+", help="tracks to swap in, one after the other")
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.0,
+        help="seconds to stay on each track before swapping in the next one (default: 0)")
+    parser.add_argument(
+        '--sdf-mode',
+        choices=["include", "links"],
+        default="links",
+        help="how the cones are rendered, 'links' loads fastest (default: links)")
+    parser.add_argument('--car', default=CAR_ENTITY, help=f"car entity (default: {CAR_ENTITY})")
+    parser.add_argument(
+        '--robot-description',
+        metavar="URDF",
+        help="file the car is spawned from (default: the robot_description of "
+             "/robot_state_publisher)")
+    parser.add_argument(
+        '--spawn-service', default="/spawn_entity", help="(default: /spawn_entity)")
+    parser.add_argument(
+        '--delete-service', default="/delete_entity", help="(default: /delete_entity)")
+    # Arguments ROS adds when this is run as a node are not ours
+    args, _ = parser.parse_known_args(argv)
+
+    import rclpy
+    rclpy.init()
+    node = rclpy.create_node("eufs_track_swap")
+    try:
+        robot_description = None
+        if args.robot_description is not None:
+            with open(args.robot_description, "r") as f:
+                robot_description = f.read()
+        entities = GazeboEntities(node, args.spawn_service, args.delete_service)
+        swapper = TrackSwapper(entities, sdf_mode=args.sdf_mode, car_entity=args.car,
+                               robot_description=robot_description)
+        for i, name in enumerate(args.tracks):
+            if i and args.interval:
+                time.sleep(args.interval)
+            times = swapper.swap(name)
+            steps = ", ".join(f"{label} {seconds:.2f}s" for label, seconds in times.items())
+            print(f"Swapped in {name} in {sum(times.values()):.2f}s ({steps})")
+    except (KeyError, RuntimeError) as exc:
+        print(f"Error: {exc.args[0]}")
+        return 1
+    except Exception as exc:
+        print(f"Error: {type(exc).__name__}: {exc}")
+        return 1
+    finally:
+        node.destroy_node()
+        rclpy.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
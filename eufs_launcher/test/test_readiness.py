@@ -0,0 +1,36 @@
+from eufs_launcher.readiness import Condition, LaunchSequencer
+from eufs_launcher.supervisor import ProcessSupervisor
+
+
+READY = (Condition("topic", "/ready"),)
+
+
+class Monitor:
+    """Stands in for a ReadinessMonitor, conditions hold once ready is set"""
+
+    def __init__(self):
+        self.ready = False
+
+    def met(self, conditions):
+        return set(conditions) if self.ready else set()
+
+
+def test_launches_with_the_same_name_all_start():
+    supervisor = ProcessSupervisor()
+    monitor = Monitor()
+    sequencer = LaunchSequencer(supervisor, monitor)
+    try:
+        names = [
+            sequencer.add("controls", ["true"]),
+            sequencer.add("controls", ["true"], READY),
+            sequencer.add("controls", ["true"], READY),
+        ]
+        assert names == ["controls", "controls (2)", "controls (3)"]
+        assert sequencer.pending() == names[1:]
+
+        monitor.ready = True
+        assert sequencer.poll() == names[1:]
+        assert not sequencer.pending()
+        assert sorted(supervisor.processes) == sorted(names)
+    finally:
+        supervisor.shutdown()
@@ -0,0 +1,68 @@
+import signal
+
+from eufs_launcher.scheduler import Job, SimulationScheduler
+
+
+# Stand-ins are plain shell commands, which needn't be given long to stop
+SHUTDOWN_SIGNALS = ((signal.SIGINT, 0.2), (signal.SIGTERM, 0.2), (signal.SIGKILL, 1.0))
+
+
+def run(job, simulation="exec sleep 30", interval=0.05):
+    """Runs job with a stand-in simulation, returns its result"""
+    scheduler = SimulationScheduler(
+        max_parallel=1, timeout=10.0, command=lambda _: ["sh", "-c", simulation],
+        shutdown_signals=SHUTDOWN_SIGNALS, interval=interval
+    )
+    result, = scheduler.run([job])
+    return result
+
+
+def test_timeout_without_test_passes():
+    result = run(Job("small_track", timeout=0.5))
+    assert result.passed
+    assert result.timed_out
+    assert result.returncode is None
+
+
+def test_crash_without_test_fails():
+    result = run(Job("small_track", timeout=5.0), simulation="exit 2")
+    assert not result.passed
+    assert result.returncode == 2
+
+
+def test_test_exit_zero_passes():
+    result = run(Job("small_track", test="sleep 0.2"))
+    assert result.passed
+    assert not result.timed_out
+    assert result.returncode == 0
+
+
+def test_test_exit_code_fails():
+    result = run(Job("small_track", test="exit 3"))
+    assert not result.passed
+    assert result.returncode == 3
+
+
+def test_test_decides_when_both_exit():
+    # Both exit within the same interval, the simulation with an error
+    result = run(Job("small_track", test="sleep 0.2"), simulation="sleep 0.2; exit 1",
+                 interval=1.0)
+    assert result.passed
+    assert result.returncode == 0
+
+
+def test_test_timeout_fails():
+    result = run(Job("small_track", timeout=0.5, test="exec sleep 30"))
+    assert not result.passed
+    assert result.timed_out
+
+
+def test_start_error_is_reported():
+    scheduler = SimulationScheduler(
+        max_parallel=2, timeout=0.5, shutdown_signals=SHUTDOWN_SIGNALS, interval=0.05,
+        command=lambda job: ["/nonexistent/simulation"] if job.track == "bad"
+        else ["sh", "-c", "exec sleep 30"]
+    )
+    bad, good = scheduler.run([Job("bad"), Job("good")])
+    assert not bad.passed and "could not be started" in bad.error
+    assert good.passed
@@ -1,6 +1,9 @@
+import hashlib
+import json
 import os
+import tempfile
+import time
 from os.path import join
-from os.path import isfile
 
 import xacro
 
@@ -29,6 +32,7 @@ def spawn_car(context, *args, **kwargs):
     roll = get_argument(context, 'roll')
     pitch = get_argument(context, 'pitch')
     yaw = get_argument(context, 'yaw')
+    spawn_service_timeout = get_argument(context, 'spawn_service_timeout')
 
     simulate_perception = 'true' if launch_group == 'no_perception' else 'false'
     config_file = join(get_package_share_directory('eufs_racecar'), 'robots', robot_name,
@@ -41,30 +45,24 @@ def spawn_car(context, *args, **kwargs):
 
     xacro_path = join(get_package_share_directory('eufs_racecar'),
                       'robots', robot_name, 'robot.urdf.xacro')
-    urdf_path = join(get_package_share_directory('eufs_racecar'),
-                     'robots', robot_name, 'robot.urdf')
-
-    if not isfile(urdf_path):
-        os.mknod(urdf_path)
-
-    doc = xacro.process_file(xacro_path,
-                             mappings={
-                                 'robot_name': robot_name,
-                                 'vehicle_model': vehicle_model,
-                                 'command_mode': command_mode,
-                                 'config_file': config_file,
-                                 'noise_config': noise_file,
-                                 'recolor_config': recolor_config,
-                                 'publish_tf': publish_tf,
-                                 'simulate_perception': simulate_perception,
-                                 'pub_ground_truth': pub_ground_truth,
-                                 'bounding_box_settings': bounding_boxes_file,
-                             })
-    out = xacro.open_output(urdf_path)
-    out.write(doc.toprettyxml(indent='  '))
-
-    with open(urdf_path, 'r') as urdf_file:
-        robot_description = urdf_file.read()
+    mappings = {
+        'robot_name': robot_name,
+        'vehicle_model': vehicle_model,
+        'command_mode': command_mode,
+        'config_file': config_file,
+        'noise_config': noise_file,
+        'recolor_config': recolor_config,
+        'publish_tf': publish_tf,
+        'simulate_perception': simulate_perception,
+        'pub_ground_truth': pub_ground_truth,
+        'bounding_box_settings': bounding_boxes_file,
+    }
+    # The vehicle model config is read into the URDF by the xacro, the other files are only
+    # referred to by path
+    profile_event("robot description", "begin")
+    urdf_path, robot_description = cached_robot_description(xacro_path, mappings,
+                                                            [config_file])
+    profile_event("robot description", "end")
 
     return [
         Node(
@@ -81,7 +79,7 @@ def spawn_car(context, *args, **kwargs):
                 '-R', roll,
                 '-P', pitch,
                 '-Y', yaw,
-                '-spawn_service_timeout', '60.0',
+                '-spawn_service_timeout', spawn_service_timeout,
                 '--ros-args', '--log-level', 'warn'
             ]
         ),
@@ -114,7 +112,101 @@ def spawn_car(context, *args, **kwargs):
     ]
 
 
+def profile_event(phase, event="mark", **info):
+    """
+    Appends an event to the startup profile named by EUFS_STARTUP_PROFILE, if it is set. See
+    eufs_launcher.startup_profile, which can't be imported from here as eufs_racecar doesn't
+    depend on it.
+    """
+    path = os.environ.get("EUFS_STARTUP_PROFILE")
+    if not path:
+        return
+    line = json.dumps({"time": time.time(), "pid": os.getpid(), "phase": phase,
+                       "event": event, **info})
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (line + "\n").encode())
+    finally:
+        os.close(fd)
+
+
+def urdf_cache_dir():
+    """Where generated URDFs are cached: $XDG_CACHE_HOME/eufs_racecar/urdf (~/.cache by default)"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or join(os.path.expanduser("~"), ".cache")
+    return join(cache_home, "eufs_racecar", "urdf")
+
+
+def hash_files(paths, digest=None):
+    """Hashes the paths and contents of files, missing files hash differently to empty ones"""
+    digest = digest or hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode() + b"\0")
+        try:
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        except OSError:
+            digest.update(b"missing")
+    return digest
+
+
+def write_atomic(file_path, data):
+    """Writes a file through a temporary file renamed over it, so readers never see it half done"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=".urdf.")
+    try:
+        with os.fdopen(fd, "w") as tmp_file:
+            tmp_file.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def cached_robot_description(xacro_path, mappings, config_files=()):
+    """
+    Returns the path and contents of the URDF generated from a xacro with mappings, only running
+    xacro if it isn't cached yet.
+
+    URDFs are kept in `urdf_cache_dir()` under a hash of the xacro, its mappings and the config
+    files it reads, so that any change to them makes a new one. The files the xacro includes
+    are only known once it has run, so they are listed next to the URDF with their hash, and the
+    URDF is made again if they changed since. Sims launched at the same time may both make the
+    URDF, but will only ever read a complete one.
+    """
+    digest = hash_files([xacro_path] + list(config_files))
+    digest.update(json.dumps(mappings, sort_keys=True).encode())
+    key = digest.hexdigest()
+    cache_dir = urdf_cache_dir()
+    urdf_path = join(cache_dir, key + ".urdf")
+    includes_path = join(cache_dir, key + ".json")
+
+    try:
+        with open(includes_path, "r") as f:
+            includes = json.load(f)
+        if hash_files(includes["files"]).hexdigest() == includes["hash"]:
+            with open(urdf_path, "r") as f:
+                profile_event("urdf cache hit")
+                return urdf_path, f.read()
+    except (OSError, ValueError, KeyError):
+        pass
+
+    # xacro keeps adding the files it includes to all_includes
+    included = len(xacro.all_includes)
+    profile_event("xacro", "begin", xacro=xacro_path)
+    doc = xacro.process_file(xacro_path, mappings=mappings)
+    robot_description = doc.toprettyxml(indent='  ')
+    profile_event("xacro", "end")
+    files = sorted(set(xacro.all_includes[included:]))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    write_atomic(urdf_path, robot_description)
+    write_atomic(includes_path, json.dumps({"files": files,
+                                            "hash": hash_files(files).hexdigest()}))
+    return urdf_path, robot_description
+
+
 def generate_launch_description():
+    profile_event("load_car.launch.py")
     rqt_perspective_file = join(get_package_share_directory('eufs_rqt'),
                                 'config', 'eufs_sim.perspective')
 
@@ -184,6 +276,12 @@ def generate_launch_description():
         DeclareLaunchArgument('yaw', default_value='0',
                               description='Vehicle initial yaw'),
 
+        # spawn_entity.py spawns the car as soon as Gazebo's spawn service is up, this only
+        # bounds how long it waits for Gazebo to start on slow machines before giving up
+        DeclareLaunchArgument('spawn_service_timeout', default_value='600.0',
+                              description='Seconds to wait for Gazebo to be '
+                                          'ready to spawn the car'),
+
         Node(
             name='rviz',
             package='rviz2',
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Compares reading the bundled track csvs with `eufs_tracks.track_io.csv_io` against the pandas
+path previously used by `Track.load_csv()`.
+
+For every track in eufs_tracks/csv, both readers are timed and their results checked to be the
+same. The time to import each reader in a fresh interpreter is reported too, as it is paid
+by every tool that reads a track.
+
+Usage: python3 csv_reader.py [--repeat N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+
+import numpy as np
+
+from eufs_tracks.track_io import CONE_TAGS, CAR_START_TAG, CONE_COLUMNS
+from eufs_tracks.track_io.csv_io import load_csv
+
+TRACKS_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_csv_pandas(file_path):
+    """The pandas path of `Track.load_csv()`"""
+    import pandas as pd
+
+    df = pd.read_csv(file_path, float_precision="round_trip")
+    cones = {
+        tag: df[df["tag"] == tag][list(CONE_COLUMNS)].to_numpy(dtype="float64")
+        for tag in CONE_TAGS
+    }
+    car_start = (0.0, 0.0, 0.0)
+    for car in df[df["tag"] == CAR_START_TAG].itertuples():
+        car_start = (car.x, car.y, car.direction)
+    return cones, car_start
+
+
+def import_time(module, repeat):
+    """Best wall time of importing module in a fresh interpreter, minus the interpreter start"""
+    def run(code):
+        return min(timeit.repeat(
+            lambda: subprocess.run([sys.executable, "-c", code], check=True),
+            number=1, repeat=repeat))
+    return run(f"import {module}") - run("pass")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions (default: 20)")
+    args = parser.parse_args()
+
+    try:
+        import pandas  # noqa: F401
+    except ImportError:
+        sys.exit("pandas is needed to compare against")
+
+    print(f"{'track':<32} {'rows':>5} {'track_io':>10} {'pandas':>10} {'speedup':>8}")
+    total_fast = total_pandas = 0.0
+
+    csv_dir = os.path.join(TRACKS_ROOT, "csv")
+    for file_name in sorted(os.listdir(csv_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        file_path = os.path.join(csv_dir, file_name)
+
+        cones, car_start = load_csv(file_path)
+        expected_cones, expected_car_start = load_csv_pandas(file_path)
+        assert car_start == expected_car_start, file_name
+        for tag in CONE_TAGS:
+            expected = expected_cones[tag]
+            found = cones.get(tag, np.empty((0, len(CONE_COLUMNS))))
+            assert np.array_equal(found, expected, equal_nan=True), (file_name, tag)
+
+        fast = min(timeit.repeat(lambda: load_csv(file_path), number=1, repeat=args.repeat))
+        slow = min(timeit.repeat(lambda: load_csv_pandas(file_path),
+                                 number=1, repeat=args.repeat))
+        total_fast += fast
+        total_pandas += slow
+
+        with open(file_path) as f:
+            rows = sum(1 for _ in f) - 1
+        print(f"{file_name[:-len('.csv')]:<32} {rows:>5} {fast * 1e3:>8.3f}ms "
+              f"{slow * 1e3:>8.3f}ms {slow / fast:>7.1f}x")
+
+    print(f"{'total':<32} {'':>5} {total_fast * 1e3:>8.3f}ms {total_pandas * 1e3:>8.3f}ms "
+          f"{total_pandas / total_fast:>7.1f}x")
+
+    repeat = max(3, args.repeat // 4)
+    fast = import_time("eufs_tracks.track_io.csv_io", repeat)
+    slow = import_time("pandas", repeat)
+    print(f"{'import':<32} {'':>5} {fast * 1e3:>8.1f}ms {slow * 1e3:>8.1f}ms "
+          f"{slow / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Checks how long it takes to import each rqt plugin of eufs_sim, as rqt does when a perspective
+is opened, against a budget.
+
+Every plugin module is imported in a fresh interpreter under `python -X importtime`, after what
+rqt has already imported by the time it loads a plugin (Qt, qt_gui and rclpy), so that only
+what the plugin itself adds is counted. The best time of --repeat runs and the slowest imports
+it pays for are reported, and the exit status is 1 if any plugin is over --budget. Heavy
+dependencies (numpy, yaml, the converters, ...) should be imported on first use instead.
+
+Usage: python3 plugin_imports.py [--budget MS] [--repeat N] [module ...]
+"""
+
+import argparse
+import subprocess
+import sys
+
+# Modules of the rqt plugins of eufs_launcher and eufs_tracks (see their plugin.xml)
+PLUGINS = [
+    "eufs_launcher.LauncherModule",
+    "eufs_tracks.converter_tool.converter_gui",
+    "eufs_tracks.track_generator.track_generator_gui",
+]
+
+# What rqt has imported before it loads a plugin
+PRELOADED = [
+    "python_qt_binding.QtCore",
+    "python_qt_binding.QtGui",
+    "python_qt_binding.QtWidgets",
+    "qt_gui.plugin",
+    "rclpy",
+]
+
+
+def import_times(module):
+    """
+    Imports module in a fresh interpreter, after `PRELOADED`.
+
+    Returns:
+        A list of (name, self, cumulative) of module and everything imported for it, module
+        first, names indented by two spaces for each level of nesting, times in milliseconds
+    """
+    code = "\n".join(f"import {name}" for name in PRELOADED + [module])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            stderr=subprocess.PIPE, universal_newlines=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    # Lines are "import time: self | cumulative | name", name indented by how deep the import
+    # is, and a module is listed after the imports it makes
+    entries = []
+    for line in result.stderr.splitlines():
+        fields = line[len("import time:"):].split("|")
+        if line.startswith("import time:") and fields[0].strip().isdigit():
+            entries.append((fields[2][1:], int(fields[0]) / 1000, int(fields[1]) / 1000))
+
+    for i in reversed(range(len(entries))):
+        if entries[i][0] == module:
+            break
+    else:
+        raise RuntimeError(f"{module} isn't in the output of -X importtime")
+    times = [entries[i]]
+    for name, own, cumulative in reversed(entries[:i]):
+        if not name.startswith(" "):
+            break
+        times.append((name, own, cumulative))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("modules", nargs="*", default=PLUGINS,
+                        help="plugin modules to import (default: those of eufs_sim)")
+    parser.add_argument("--budget", type=float, default=100.0,
+                        help="milliseconds each plugin may take to import (default: 100)")
+    parser.add_argument("--repeat", type=int, default=5, help="timing repetitions (default: 5)")
+    parser.add_argument("--top", type=int, default=5,
+                        help="number of the slowest imports of each plugin to list (default: 5)")
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        try:
+            runs = [import_times(module) for _ in range(args.repeat)]
+        except RuntimeError as exc:
+            print(f"{module}: could not be imported: {exc}")
+            over_budget.append(module)
+            continue
+        times = min(runs, key=lambda run: run[0][2])
+        total = times[0][2]
+        verdict = "ok" if total <= args.budget else "OVER BUDGET"
+        print(f"{module:<50} {total:8.2f}ms  {verdict}")
+        if total > args.budget:
+            over_budget.append(module)
+
+        # The slowest of the imports the plugin makes itself, along with everything they import
+        direct = [entry for entry in times[1:] if not entry[0].startswith("   ")]
+        for name, _, cumulative in sorted(direct, key=lambda entry: -entry[2])[:args.top]:
+            print(f"    {name.strip():<46} {cumulative:8.2f}ms")
+
+    if over_budget:
+        print(f"Over the budget of {args.budget:g}ms: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Compares the model.sdf rendering modes on the bundled tracks.
+
+For every track in eufs_tracks/csv, the model.sdf is rendered in each mode and the
+following is reported:
+
+    size      size of the rendered model.sdf
+    elements  number of xml elements Gazebo has to build
+    parse     time to parse the model.sdf, plus the model.sdf of every <include>d cone
+              model, as Gazebo resolves each include separately when loading the world
+    render    time to render the model.sdf
+
+Usage: python3 sdf_modes.py [--repeat N] [--collision-radius R]
+"""
+
+import argparse
+import os
+import timeit
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from eufs_tracks.track_io import CONE_TAGS, load_csv
+from eufs_tracks.track_io.sdf import CONE_MODELS, load_templates, render_model_sdf
+
+TRACKS_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse(sdf, included_models):
+    """Parses an sdf the way Gazebo loads it, including every referenced cone model"""
+    root = ET.fromstring(sdf)
+    for include in root[0].iter("include"):
+        ET.fromstring(included_models[include.find("uri").text])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions (default: 20)")
+    parser.add_argument("--collision-radius", type=float, default=30.0,
+                        help="radius of the stripped collisions mode (default: 30)")
+    args = parser.parse_args()
+
+    templates = load_templates(os.path.join(TRACKS_ROOT, "resource"))
+    included_models = {}
+    for model in CONE_MODELS.values():
+        with open(os.path.join(TRACKS_ROOT, "models", model, "model.sdf")) as f:
+            included_models["model://" + model] = f.read()
+
+    modes = [
+        ("include", {"mode": "include"}),
+        ("links", {"mode": "links"}),
+        (f"links r={args.collision_radius:g}",
+         {"mode": "links", "collision_radius": args.collision_radius}),
+    ]
+
+    print(f"{'track':<32} {'cones':>5} {'mode':<14} {'size':>9} {'elements':>8} "
+          f"{'parse':>9} {'render':>9}")
+    totals = {label: np.zeros(4) for label, _ in modes}
+
+    csv_dir = os.path.join(TRACKS_ROOT, "csv")
+    for file_name in sorted(os.listdir(csv_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        name = file_name[:-len(".csv")]
+        cones, car_start = load_csv(os.path.join(csv_dir, file_name))
+        n_cones = sum(len(cones.get(tag, ())) for tag in CONE_TAGS)
+
+        for label, kwargs in modes:
+            def render():
+                return render_model_sdf(cones, name, templates, collision_origin=car_start[:2],
+                                        **kwargs)
+            sdf = render()
+            elements = sum(1 for _ in ET.fromstring(sdf).iter())
+            elements += sum(
+                sum(1 for _ in ET.fromstring(included_models[include.find("uri").text]).iter())
+                for include in ET.fromstring(sdf)[0].iter("include")
+            )
+            parse_time = min(timeit.repeat(lambda: parse(sdf, included_models),
+                                           number=1, repeat=args.repeat))
+            render_time = min(timeit.repeat(render, number=1, repeat=args.repeat))
+
+            result = np.array([len(sdf), elements, parse_time, render_time])
+            totals[label] += result
+            print(f"{name:<32} {n_cones:>5} {label:<14} {len(sdf) / 1024:>7.1f}kB {elements:>8} "
+                  f"{parse_time * 1e3:>7.2f}ms {render_time * 1e3:>7.2f}ms")
+
+    print()
+    for label, (size, elements, parse_time, render_time) in totals.items():
+        print(f"{'total':<32} {'':>5} {label:<14} {size / 1024:>7.1f}kB {int(elements):>8} "
+              f"{parse_time * 1e3:>7.2f}ms {render_time * 1e3:>7.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
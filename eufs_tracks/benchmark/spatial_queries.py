@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Compares the spatial queries of `eufs_tracks.track_io.ConeGrid` against comparing every query
+with every cone.
+
+For every track in eufs_tracks/csv, a batch of query poses is scattered around its cones (as a
+car driving the track would be), and the following queries are timed on the grid and by brute
+force, and their results checked to be the same:
+
+    radius   cones within --radius metres
+    nearest  --k nearest cones
+    window   cones within a --ahead by 2 * --half-width metre window in front of each pose
+
+Usage: python3 spatial_queries.py [--queries N] [--repeat N]
+"""
+
+import argparse
+import os
+import timeit
+
+import numpy as np
+
+from eufs_tracks.track_io import ConeGrid, load_csv
+
+TRACKS_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def brute_force(xy, poses, args):
+    """The same queries as `ConeGrid`, comparing every pose with every cone"""
+    def distances():
+        offset = xy[None, :, :] - poses[:, None, :2]
+        return offset, np.sqrt((offset ** 2).sum(axis=2))
+
+    def window():
+        offset, _ = distances()
+        cos, sin = np.cos(poses[:, 2])[:, None], np.sin(poses[:, 2])[:, None]
+        forward = cos * offset[..., 0] + sin * offset[..., 1]
+        left = cos * offset[..., 1] - sin * offset[..., 0]
+        return np.nonzero(
+            (forward >= 0) & (forward <= args.ahead) & (np.abs(left) <= args.half_width))
+
+    return {
+        "radius": lambda: np.nonzero(distances()[1] <= args.radius),
+        "nearest": lambda: np.sort(
+            np.partition(distances()[1], min(args.k, len(xy)) - 1, axis=1)[:, :args.k], axis=1),
+        "window": window,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--queries", type=int, default=1000, help="poses per batch (default: 1000)")
+    parser.add_argument("--repeat", type=int, default=20, help="timing repetitions (default: 20)")
+    parser.add_argument("--radius", type=float, default=10.0)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--ahead", type=float, default=20.0)
+    parser.add_argument("--half-width", type=float, default=5.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'track':<32} {'cones':>5} {'query':>8} {'grid':>10} {'brute':>10} {'speedup':>8}")
+
+    csv_dir = os.path.join(TRACKS_ROOT, "csv")
+    for file_name in sorted(os.listdir(csv_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        cones, _ = load_csv(os.path.join(csv_dir, file_name))
+        grid = ConeGrid(cones)
+        if not len(grid):
+            continue
+
+        centres = grid.xy[rng.integers(len(grid), size=args.queries)]
+        poses = np.column_stack((centres + rng.normal(0.0, 2.0, centres.shape),
+                                 rng.uniform(-np.pi, np.pi, args.queries)))
+        queries = {
+            "radius": lambda: grid.radius(poses[:, :2], args.radius),
+            "nearest": lambda: grid.nearest(poses[:, :2], args.k),
+            "window": lambda: grid.window(poses, args.ahead, args.half_width),
+        }
+        brute = brute_force(grid.xy, poses, args)
+
+        # Check both find the same cones
+        query, cone, _ = queries["radius"]()
+        assert sorted(zip(query, cone)) == sorted(zip(*brute["radius"]())), file_name
+        _, distance = queries["nearest"]()
+        expected = brute["nearest"]()
+        assert np.allclose(distance[:, :expected.shape[1]], expected), file_name
+        query, cone, _ = queries["window"]()
+        assert sorted(zip(query, cone)) == sorted(zip(*brute["window"]())), file_name
+
+        for name, run in queries.items():
+            fast = min(timeit.repeat(run, number=1, repeat=args.repeat))
+            slow = min(timeit.repeat(brute[name], number=1, repeat=args.repeat))
+            print(f"{file_name[:-len('.csv')]:<32} {len(grid):>5} {name:>8} "
+                  f"{fast * 1e3:>8.3f}ms {slow * 1e3:>8.3f}ms {slow / fast:>7.1f}x")
+
+    print(f"(times are per batch of {args.queries} queries)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,37 +5,127 @@ from eufscli import VerbExtension
 
 from ament_index_python.packages import get_package_share_directory
 
-from eufs_tracks.converter_tool import Converter
+from eufs_tracks.converter_tool import Converter, BatchConverter
+from eufs_tracks.track_io.binary import EXTENSION as BINARY_EXTENSION
+from eufs_tracks.track_io.catalog import EXTENSION as CATALOG_EXTENSION
 
 
 class EUFSTracksConvert(VerbExtension):
     '''
-    Converts tracks between 'launch' and 'csv' formats
+    Converts tracks between 'launch', 'csv', 'binary' and 'catalog' formats
     '''
 
     def configure(self, parser):
-        parser.add_argument("track", action="store", help="File path")
+        parser.add_argument("track", action="store", nargs="+",
+                            help="File path. Several files, directories or globs "
+                                 "convert in batch mode")
         parser.add_argument("fsource", action="store",
-                            help="File format of source file ['launch' or 'csv']")
+                            help="File format of source file "
+                                 "['launch', 'csv', 'binary' or 'catalog']")
         parser.add_argument("ftarget", action="store",
-                            help="File format of target file ['launch' or 'csv']")
+                            help="File format of target file "
+                                 "['launch', 'csv', 'binary' or 'catalog']")
         parser.add_argument("-n", "--name", action="store", dest="name",
                             default="", help="Name of target")
+        parser.add_argument("--float32", action="store_true",
+                            help="store binary tracks with single precision")
+        parser.add_argument("--sdf-mode", choices=["include", "links"], default="include",
+                            help="how cones are written to the model.sdf of launch targets "
+                                 "(default: include). 'links' flattens the track into a single "
+                                 "model, which Gazebo loads faster")
+        parser.add_argument("--collision-radius", type=float, default=None,
+                            help="with --sdf-mode links, only cones this close to the car's "
+                                 "start collide (default: all cones collide)")
+        parser.add_argument("--validate", action="store_true",
+                            help="don't convert tracks with overlapping cones, or breaking the "
+                                 "cone spacing or track width regulations")
+
+        # Noise arguments
+        noise_group = parser.add_argument_group("Noise")
+        noise_group.add_argument("--noise-objects", type=int, default=0,
+                                 help="number of noise objects scattered around launch targets "
+                                      "(default: 0)")
+        noise_group.add_argument("--noise-clearance", type=float, default=3.0,
+                                 help="minimum distance of noise objects from the track in "
+                                      "metres (default: 3)")
+        noise_group.add_argument("--noise-seed", type=int, default=None,
+                                 help="seed the noise objects are scattered with "
+                                      "(default: random)")
+
+        # Catalog arguments
+        catalog_group = parser.add_argument_group("Catalogs")
+        catalog_group.add_argument("--catalog", default=None,
+                                   help="catalog to append to when converting to 'catalog' "
+                                        "(default: tracks.trkc in eufs_tracks/catalog)")
+        catalog_group.add_argument("--entry", default=None,
+                                   help="index or name of the track to export when converting "
+                                        "from 'catalog' (default: every track)")
+
+        # Batch mode arguments
+        batch_group = parser.add_argument_group("Batch Mode")
+        batch_group.add_argument("-j", "--jobs", type=int, default=None,
+                                 help="number of parallel conversions (default: number of CPUs)")
+        batch_group.add_argument("--force", action="store_true",
+                                 help="convert all files, even those unchanged since the last run")
 
     def main(self, args):
-        assert args.fsource in ["launch", "csv"], "fsource must be either 'launch' or 'csv'"
-        assert args.ftarget in ["launch", "csv"], "ftarget must be either 'launch' or 'csv'"
+        formats = ["launch", "csv", "binary", "catalog"]
+        assert args.fsource in formats, \
+            "fsource must be one of 'launch', 'csv', 'binary' or 'catalog'"
+        assert args.ftarget in formats, \
+            "ftarget must be one of 'launch', 'csv', 'binary' or 'catalog'"
+
+        assert args.collision_radius is None or args.sdf_mode == "links", \
+            "--collision-radius requires --sdf-mode links"
+        assert args.noise_objects >= 0, "--noise-objects can't be negative"
+
+        params = {'dtype': 'float32'} if args.float32 else {}
+        if args.sdf_mode != "include":
+            params['sdf_mode'] = args.sdf_mode
+        if args.collision_radius is not None:
+            params['collision_radius'] = args.collision_radius
+        if args.noise_objects:
+            params['noise_objects'] = args.noise_objects
+            params['noise_clearance'] = args.noise_clearance
+        if args.noise_seed is not None:
+            params['noise_seed'] = args.noise_seed
+        if args.validate:
+            params['validate'] = True
+        if args.catalog is not None:
+            params['catalog'] = os.path.abspath(args.catalog)
+        if args.entry is not None:
+            params['entry'] = args.entry
+
+        # Convert many tracks in parallel, skipping ones which haven't changed
+        if len(args.track) > 1 or BatchConverter.is_pattern(args.track[0]):
+            assert args.name == "", "--name can only be used when converting a single track"
+            converter = BatchConverter(args.fsource, args.ftarget,
+                                       jobs=args.jobs, force=args.force)
+            _, _, failed = converter.run(args.track, params)
+            return 1 if failed else 0
 
+        track = args.track[0]
         TRACKS_SHARE = get_package_share_directory("eufs_tracks")
         # Check if file is in current directory
-        if not os.path.exists(args.track):
+        if not os.path.exists(track):
             if args.fsource == "csv":
-                args.track = os.path.join(TRACKS_SHARE, 'csv', args.track + ".csv")
+                track = os.path.join(TRACKS_SHARE, 'csv', track + ".csv")
+            elif args.fsource == "binary":
+                track = os.path.join(TRACKS_SHARE, 'binary', track + BINARY_EXTENSION)
+            elif args.fsource == "catalog":
+                track = os.path.join(TRACKS_SHARE, 'catalog', track + CATALOG_EXTENSION)
             else:
-                args.track = os.path.join(TRACKS_SHARE, 'launch', args.track + ".launch")
+                track = os.path.join(TRACKS_SHARE, 'launch', track + ".launch")
 
         # Add name override if provided
-        params = {'override_name': args.name} if args.name != "" else {}
+        if args.name != "":
+            params['override_name'] = args.name
 
         # Convert track
-        Converter.convert(args.fsource, args.ftarget, args.track, params)
+        try:
+            Converter.convert(args.fsource, args.ftarget, track, params)
+        except ValueError as exc:
+            if not args.validate:
+                raise
+            print(f"Not converted, {exc}")
+            return 1
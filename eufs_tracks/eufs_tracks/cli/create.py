@@ -1,11 +1,44 @@
 #!/usr/bin/env python3
 
 import datetime
+import errno
 import os
+import random
 from ament_index_python.packages import get_package_share_directory
 from eufscli import VerbExtension
 
 from eufs_tracks.track_generator import TrackGenerator
+from eufs_tracks.track_io import render_track, write_artifacts, write_binary, Catalog
+from eufs_tracks.track_io import fingerprint, FingerprintIndex
+from eufs_tracks.track_io.binary import EXTENSION as BINARY_EXTENSION
+from eufs_tracks.track_io.catalog import EXTENSION as CATALOG_EXTENSION
+from eufs_tracks.track_io.fingerprints import DEFAULT_THRESHOLD
+from eufs_tracks.track_io.validate import TrackValidator, describe
+from eufs_tracks.track_io.laptime import LapTimeEstimator
+
+# With --dedupe, --validate or a lap time range, give up after generating this many times
+# --count tracks
+MAX_ATTEMPTS = 10
+
+# The arguments that are TrackGenerator settings, and the name of each setting
+GENERATOR_SETTINGS = {
+    'seed': 'seed',
+    'length': 'length',
+    'resolution': 'resolution',
+    'track_width': 'track_width',
+    'margin': 'margin',
+    'min_cone_spacing': 'min_cone_spacing',
+    'max_cone_spacing': 'max_cone_spacing',
+    'cone_bias': 'cone_spacing_bias',
+    'min_corner_radius': 'min_corner_radius',
+    'start_straight_length': 'starting_straight_length',
+    'start_straight_downsample': 'starting_straight_downsample',
+    'start_cone_separation': 'starting_cone_spacing',
+    'rel_accuracy': 'rel_accuracy',
+    'max_frequency': 'max_frequency',
+    'amplitude': 'amplitude',
+    'check_self_intersects': 'check_self_intersection',
+}
 
 
 class EUFSTracksCreate(VerbExtension):
@@ -15,11 +48,29 @@ class EUFSTracksCreate(VerbExtension):
 
     def configure(self, parser):
         # Main cli arguments
-        # TODO: enable cli to produce different formats (e.g launch file)
         parser.add_argument(
             '-o', '--output_file',
             default="track",
-            help="csv output file (default='track'). Saves to eufs_tracks shared directory")
+            help="name of the output track (default='track'). "
+                 "Saves to eufs_tracks shared directory")
+        parser.add_argument(
+            '--format',
+            choices=["csv", "launch", "sdf", "binary"],
+            default="csv",
+            help="format of the output track (default: csv). 'launch' creates a launchable track "
+                 "(launch, world and model files), 'sdf' only creates its model files")
+        parser.add_argument(
+            '--sdf-mode',
+            choices=["include", "links"],
+            default="include",
+            help="how cones are written to the model.sdf of 'launch' and 'sdf' formats "
+                 "(default: include). 'links' flattens the track into a single model, "
+                 "which Gazebo loads faster")
+        parser.add_argument(
+            '--collision-radius',
+            type=float,
+            help="with --sdf-mode links, only cones this close to the car's start collide "
+                 "(default: all cones collide)")
         parser.add_argument(
             '-y', '--yes',
             action="store_true",
@@ -45,6 +96,47 @@ class EUFSTracksCreate(VerbExtension):
             type=float,
             help="minimum margin on either side of a track (default: 0)")
 
+        # Batch generation
+        batch_group = parser.add_argument_group("Batch Generation")
+        batch_group.add_argument(
+            '--count',
+            type=int,
+            default=1,
+            help="number of tracks to generate, named after the output file with an index "
+                 "appended (default: 1). With --seed, the seeds seed, seed + 1, ... are tried "
+                 "in turn, skipping those whose track is rejected. The seed of each track is "
+                 "printed, or kept in --catalog")
+        batch_group.add_argument(
+            '--catalog',
+            help="append the tracks to this catalog instead of saving them in --format. "
+                 "Plain names are kept in the catalog folder of eufs_tracks")
+        batch_group.add_argument(
+            '--dedupe',
+            action="store_true",
+            help="skip tracks whose layout is a near-duplicate of one generated before them "
+                 "(or already in --catalog), and generate others in their place")
+        batch_group.add_argument(
+            '--dedupe-threshold',
+            type=float,
+            default=DEFAULT_THRESHOLD,
+            help="fingerprint distance under which two tracks are near-duplicates "
+                 f"(default: {DEFAULT_THRESHOLD})")
+        batch_group.add_argument(
+            '--validate',
+            action="store_true",
+            help="skip tracks breaking the cone spacing or track width they were generated "
+                 "with, or with overlapping cones, and generate others in their place. A single "
+                 "track is only warned about")
+        batch_group.add_argument(
+            '--min-lap-time',
+            type=float,
+            help="skip tracks whose estimated lap time (see 'laptime') is shorter than this "
+                 "many seconds, and generate others in their place")
+        batch_group.add_argument(
+            '--max-lap-time',
+            type=float,
+            help="skip tracks whose estimated lap time is longer than this many seconds")
+
         # Regulation parameters
         regulation_group = parser.add_argument_group("Regulation Parameters")
         regulation_group.add_argument(
@@ -96,34 +188,194 @@ class EUFSTracksCreate(VerbExtension):
             type=int,
             help="number of points sampled along the curve (default: Non-trivial)")
 
-    def main(self, args):
-        # Generate track
-        gen = TrackGenerator({k: v for k, v in vars(args).items() if v is not None})
-        start_cones, left_cones, right_cones = gen()
+    @staticmethod
+    def save_track(fmt, name, start_cones, left_cones, right_cones, overwrite=False,
+                   sdf_mode="include", collision_radius=None):
+        """
+        Saves a generated track to the eufs_tracks share directory
+
+        Returns:
+        The list of files written
 
-        # Save track
+        Arguments:
+        fmt       -- format to save the track as (csv, launch, sdf or binary)
+        name      -- name of the track
+        overwrite -- replace existing files, otherwise raises FileExistsError
+        sdf_mode  -- how cones are rendered in the model.sdf (include or links)
+        collision_radius -- in links mode, cones further than this from the start don't collide
+        """
         TRACKS_SHARE = get_package_share_directory("eufs_tracks")
-        args.output_file = datetime.datetime.today().strftime(args.output_file)
-        args.output_file = os.path.join(TRACKS_SHARE, "csv", args.output_file + ".csv")
-        try:
+
+        def check_overwrite(file_path):
+            if not overwrite and os.path.exists(file_path):
+                raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), file_path)
+
+        if fmt == "csv":
+            file_path = os.path.join(TRACKS_SHARE, "csv", name + ".csv")
+            check_overwrite(file_path)
             TrackGenerator.write_to_csv(
-                args.output_file,
+                file_path,
                 start_cones,
                 left_cones,
                 right_cones,
-                overwrite=args.yes
+                overwrite=overwrite
             )
-        except FileExistsError:
-            print(f"The file '{args.output_file}' already exists.")
+            return [file_path]
+
+        # The other formats are rendered straight from the cone arrays
+        cones = TrackGenerator.to_cones(start_cones, left_cones, right_cones)
+        if fmt == "binary":
+            file_path = os.path.join(TRACKS_SHARE, "binary", name + BINARY_EXTENSION)
+            check_overwrite(file_path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            return [write_binary(file_path, cones)]
+
+        artifacts = render_track(cones, (0.0, 0.0, 0.0), name, mode=sdf_mode,
+                                 collision_radius=collision_radius)
+        if fmt == "sdf":
+            artifacts = {
+                path: data for path, data in artifacts.items()
+                if path.startswith("models" + os.sep)
+            }
+        for path in artifacts:
+            check_overwrite(os.path.join(TRACKS_SHARE, path))
+        return write_artifacts(artifacts, TRACKS_SHARE)
+
+    @staticmethod
+    def catalog_path(catalog):
+        """Resolves a --catalog argument, plain names are kept in eufs_tracks/catalog"""
+        if not catalog.endswith(CATALOG_EXTENSION):
+            catalog = catalog + CATALOG_EXTENSION
+        if os.path.dirname(catalog) == "":
+            TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+            catalog = os.path.join(TRACKS_SHARE, "catalog", catalog)
+        os.makedirs(os.path.dirname(os.path.abspath(catalog)), exist_ok=True)
+        return catalog
+
+    @staticmethod
+    def save_or_ask(args, name, start_cones, left_cones, right_cones):
+        """Saves a track, asking before replacing existing files"""
+        try:
+            EUFSTracksCreate.save_track(
+                args.format,
+                name,
+                start_cones,
+                left_cones,
+                right_cones,
+                overwrite=args.yes,
+                sdf_mode=args.sdf_mode,
+                collision_radius=args.collision_radius
+            )
+        except FileExistsError as exc:
+            print(f"The file '{exc.filename}' already exists.")
             overwrite = input("Do you want to replace it? [Y/n]: ")
 
-            if overwrite.lower().startwith('y'):
-                TrackGenerator.write_to_csv(
-                    args.output_file,
+            if overwrite.lower().startswith('y'):
+                EUFSTracksCreate.save_track(
+                    args.format,
+                    name,
                     start_cones,
                     left_cones,
                     right_cones,
-                    overwrite=True
+                    overwrite=True,
+                    sdf_mode=args.sdf_mode,
+                    collision_radius=args.collision_radius
                 )
             else:
                 print("Abort.")
+
+    def main(self, args):
+        assert args.collision_radius is None or args.sdf_mode == "links", \
+            "--collision-radius requires --sdf-mode links"
+        assert args.count >= 1, "--count must be at least 1"
+        assert args.min_lap_time is None or args.max_lap_time is None \
+            or args.min_lap_time <= args.max_lap_time, \
+            "--min-lap-time must not be greater than --max-lap-time"
+
+        config = {
+            setting: getattr(args, arg) for arg, setting in GENERATOR_SETTINGS.items()
+            if getattr(args, arg) is not None
+        }
+        name = datetime.datetime.today().strftime(args.output_file)
+
+        # Generate and save a single track, unless it has to be regenerated until its lap time
+        # is in range
+        validator = TrackValidator.from_generator(config) if args.validate else None
+        estimator = None
+        if args.min_lap_time is not None or args.max_lap_time is not None:
+            estimator = LapTimeEstimator()
+            low = -float("inf") if args.min_lap_time is None else args.min_lap_time
+            high = float("inf") if args.max_lap_time is None else args.max_lap_time
+        if args.count == 1 and args.catalog is None and estimator is None:
+            start_cones, left_cones, right_cones = TrackGenerator(config)()
+            if validator is not None:
+                for violation in validator(
+                        TrackGenerator.to_cones(start_cones, left_cones, right_cones)):
+                    print(f"Warning: {describe(violation)}")
+            EUFSTracksCreate.save_or_ask(args, name, start_cones, left_cones, right_cones)
+            return
+
+        catalog = None if args.catalog is None else EUFSTracksCreate.catalog_path(args.catalog)
+        fingerprints = None
+        if args.dedupe:
+            fingerprints = FingerprintIndex(threshold=args.dedupe_threshold)
+            if catalog is not None and os.path.exists(catalog):
+                with Catalog(catalog) as existing:
+                    fingerprints = FingerprintIndex.from_catalog(
+                        existing, threshold=args.dedupe_threshold)
+
+        # Generate many tracks, each with its own seed so that it can be regenerated
+        tracks = []
+        i = attempt = 0
+        while i < args.count:
+            if attempt == MAX_ATTEMPTS * args.count:
+                print(f"Gave up after {attempt} attempts, only {i} tracks passed")
+                break
+            seed = random.random() if args.seed is None else args.seed + attempt
+            attempt += 1
+            generator = TrackGenerator({**config, 'seed': seed})
+            path = generator.generate_path()
+            track_name = name if args.count == 1 and args.catalog is None else f"{name}_{i}"
+
+            # The lap time only needs the path, so skip placing cones on those out of range
+            if estimator is not None:
+                lap_time = estimator.estimate_path(path[0], path[2])
+                if not low <= lap_time <= high:
+                    print(f"Skipped seed {seed}, estimated lap time {lap_time:.2f}s")
+                    continue
+            start_cones, left_cones, right_cones = generator.place(path)
+
+            if validator is not None:
+                violations = validator(
+                    TrackGenerator.to_cones(start_cones, left_cones, right_cones))
+                if violations:
+                    print(f"Skipped seed {seed}: "
+                          + "; ".join(describe(violation) for violation in violations))
+                    continue
+
+            if fingerprints is not None:
+                signature = fingerprint(
+                    TrackGenerator.to_cones(start_cones, left_cones, right_cones))
+                duplicate = None
+                if signature is not None:
+                    duplicate = fingerprints.add(signature, track_name)
+                if duplicate is not None:
+                    print(f"Skipped seed {seed}, a near-duplicate of '{duplicate}'")
+                    continue
+            i += 1
+
+            if args.catalog is None:
+                EUFSTracksCreate.save_or_ask(
+                    args, track_name, start_cones, left_cones, right_cones)
+                if args.count > 1:
+                    print(f"Generated '{track_name}' from seed {seed}")
+            else:
+                cones = TrackGenerator.to_cones(start_cones, left_cones, right_cones)
+                metadata = {"name": track_name, "seed": seed}
+                if estimator is not None:
+                    metadata["lap_time"] = lap_time
+                tracks.append((cones, (0.0, 0.0, 0.0), metadata))
+
+        if catalog is not None:
+            indices = Catalog.append(catalog, tracks)
+            print(f"Appended {len(indices)} tracks to '{catalog}'")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import json
+from eufscli import VerbExtension
+
+from eufs_tracks.track_io import TrackIndex
+from eufs_tracks.track_io.index import FORMATS
+
+
+class EUFSTracksInspect(VerbExtension):
+    '''
+    Shows what is known about a track of the eufs_tracks share directory
+    '''
+
+    def configure(self, parser):
+        parser.add_argument("track", action="store", help="Name of the track")
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            help="only show the track in this format (default: all)")
+        parser.add_argument(
+            '--json',
+            action="store_true",
+            help="print the index entries as json")
+
+    def main(self, args):
+        entries = TrackIndex().refresh().find(args.track, args.format)
+        if not entries:
+            print(f"No track called '{args.track}'")
+            return 1
+
+        if args.json:
+            print(json.dumps(entries, indent=2))
+            return
+
+        for entry in entries:
+            print(f"{entry['name']} ({entry['format']})")
+            print(f"  path:      {entry['path']}")
+            if "error" in entry:
+                print(f"  error:     {entry['error']}")
+                continue
+
+            cones = ", ".join(f"{count} {tag}" for tag, count in entry["cones"].items())
+            print(f"  cones:     {cones}")
+            print(f"  length:    {entry['length']:.1f}m")
+            x, y, yaw = entry["car_start"]
+            print(f"  car start: x={x:g} y={y:g} yaw={yaw:g}")
+            if entry["bbox"] is not None:
+                x_min, y_min, x_max, y_max = entry["bbox"]
+                print(f"  bounds:    x=[{x_min:g}, {x_max:g}] y=[{y_min:g}, {y_max:g}] "
+                      f"({x_max - x_min:.1f}m x {y_max - y_min:.1f}m)")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import numpy as np
+from eufscli import VerbExtension
+
+from eufs_tracks.cli.create import EUFSTracksCreate
+from eufs_tracks.track_io import TrackIndex, Catalog
+from eufs_tracks.track_io.index import FORMATS
+from eufs_tracks.track_io.laptime import LapTimeEstimator, load_vehicle
+from eufs_tracks.track_io.laptime import DEFAULT_ROBOT, DEFAULT_CONDITION
+
+
+class EUFSTracksLapTime(VerbExtension):
+    '''
+    Ranks tracks by their estimated lap time, without simulating them
+    '''
+
+    def configure(self, parser):
+        parser.add_argument(
+            '--catalog',
+            help="rank the tracks of this catalog instead of those of the eufs_tracks share "
+                 "directory. Plain names are looked up in the catalog folder of eufs_tracks")
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            help="only rank tracks of this format (default: the first format found of each "
+                 "track)")
+        parser.add_argument(
+            '--robot',
+            default=DEFAULT_ROBOT,
+            help=f"robot of eufs_racecar whose vehicle model is used (default: {DEFAULT_ROBOT})")
+        parser.add_argument(
+            '--condition',
+            choices=["Dry", "Wet"],
+            default=DEFAULT_CONDITION,
+            help=f"track condition of the vehicle model (default: {DEFAULT_CONDITION})")
+        parser.add_argument(
+            '--reverse',
+            action="store_true",
+            help="list the slowest tracks first")
+        parser.add_argument(
+            '--json',
+            action="store_true",
+            help="print the names and lap times as json")
+
+    def main(self, args):
+        estimator = LapTimeEstimator(load_vehicle(args.robot, args.condition))
+
+        if args.catalog is not None:
+            catalog_path = EUFSTracksCreate.catalog_path(args.catalog)
+            assert os.path.exists(catalog_path), f"No catalog at '{catalog_path}'"
+            with Catalog(catalog_path) as catalog:
+                names = [metadata.get("name", str(i))
+                         for i, metadata in enumerate(catalog.metadata)]
+                times = estimator.estimate_many(cones for cones, _ in catalog)
+        else:
+            index = TrackIndex().refresh()
+            entries = {}
+            for entry in index.tracks(args.format):
+                if "error" not in entry:
+                    entries.setdefault(entry["name"], entry)
+            names = list(entries)
+            times = estimator.estimate_many(
+                index.read(entry["format"], entry["path"])[0] for entry in entries.values())
+
+        # Tracks whose lap time couldn't be estimated go last
+        order = sorted(range(len(names)), key=lambda i: (np.isnan(times[i]),
+                                                         -times[i] if args.reverse else times[i]))
+        if args.json:
+            print(json.dumps([
+                {"name": names[i], "lap_time": None if np.isnan(times[i]) else float(times[i])}
+                for i in order
+            ], indent=2))
+            return
+
+        print(f"{'name':<32} {'lap time':>9}")
+        for i in order:
+            lap_time = "-" if np.isnan(times[i]) else f"{times[i]:.2f}s"
+            print(f"{names[i]:<32} {lap_time:>9}")
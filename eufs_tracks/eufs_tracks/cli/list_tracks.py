@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+import json
+from eufscli import VerbExtension
+
+from eufs_tracks.track_io import TrackIndex
+from eufs_tracks.track_io.index import FORMATS
+
+
+class EUFSTracksList(VerbExtension):
+    '''
+    Lists the tracks of the eufs_tracks share directory
+    '''
+
+    def configure(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            help="only list tracks of this format (default: all)")
+        parser.add_argument(
+            '--json',
+            action="store_true",
+            help="print the index entries as json")
+
+    def main(self, args):
+        tracks = TrackIndex().refresh().tracks(args.format)
+
+        if args.json:
+            print(json.dumps(tracks, indent=2))
+            return
+
+        # Group the formats of each track on a single line
+        formats = {}
+        for track in tracks:
+            formats.setdefault(track["name"], []).append(track)
+
+        print(f"{'name':<32} {'formats':<20} {'cones':>6} {'length':>8}")
+        for name, entries in formats.items():
+            described = [entry for entry in entries if "error" not in entry]
+            if described:
+                cones = sum(described[0]["cones"].values())
+                length = f"{described[0]['length']:.1f}m"
+            else:
+                cones, length = "-", "-"
+            fmts = ",".join(entry["format"] for entry in entries)
+            print(f"{name:<32} {fmts:<20} {cones:>6} {length:>8}")
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+from eufscli import VerbExtension
+
+from eufs_tracks.track_io import ThumbnailCache
+from eufs_tracks.track_io.index import FORMATS
+from eufs_tracks.track_io.thumbnail import DEFAULT_SIZE
+
+
+class EUFSTracksThumbnails(VerbExtension):
+    '''
+    Draws the thumbnails shown in the launcher's and converter's track menus ahead of time
+    '''
+
+    def configure(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=list(FORMATS),
+            help="only draw the thumbnails of tracks of this format (default: all)")
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=DEFAULT_SIZE,
+            help=f"width and height of the thumbnails in pixels (default: {DEFAULT_SIZE})")
+        parser.add_argument(
+            '-j', '--jobs',
+            type=int,
+            default=None,
+            help="number of processes to draw with (default: one per cpu)")
+
+    def main(self, args):
+        assert args.size > 0, "--size must be positive"
+        cache = ThumbnailCache(size=args.size)
+        thumbnails = cache.render_all(args.format, args.jobs)
+
+        failed = [path for path, thumbnail in thumbnails.items() if thumbnail is None]
+        print(f"{len(thumbnails) - len(failed)} thumbnails in '{cache.cache_dir}'")
+        if failed:
+            print(f"{len(failed)} tracks could not be drawn")
+            return 1
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+import os
+import random
+from eufscli import VerbExtension
+
+from ament_index_python.packages import get_package_share_directory
+
+from eufs_tracks.cli.create import EUFSTracksCreate
+from eufs_tracks.track_io import TrackIndex, Catalog, write_csv, write_binary
+from eufs_tracks.track_io import render_track, write_artifacts
+from eufs_tracks.track_io.index import FORMATS
+from eufs_tracks.track_io.binary import EXTENSION as BINARY_EXTENSION
+from eufs_tracks.track_io.variants import NoisyVariants
+
+
+class EUFSTracksVariants(VerbExtension):
+    '''
+    Generates noisy variants of a track of the eufs_tracks share directory
+    '''
+
+    def configure(self, parser):
+        parser.add_argument("track", action="store", help="Name of the track")
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=100,
+            help="number of variants (default: 100)")
+        parser.add_argument(
+            '--format',
+            choices=["catalog", "csv", "binary", "launch"],
+            default="catalog",
+            help="format of the variants (default: catalog). 'csv', 'binary' and 'launch' write "
+                 "a track per variant, named after the track with an index appended. 'launch' "
+                 "tracks have their noise objects in the world")
+        parser.add_argument(
+            '--catalog',
+            help="catalog to append the variants to (default: <track>_variants in the "
+                 "catalog folder of eufs_tracks). Plain names are kept in that folder")
+        parser.add_argument(
+            '--from-format',
+            choices=list(FORMATS),
+            help="format of the track to read (default: the first one found)")
+        parser.add_argument(
+            '-s', '--seed',
+            type=int,
+            help="random number generator seed (default: random)")
+
+        noise_group = parser.add_argument_group("Noise")
+        noise_group.add_argument(
+            '--cone-noise',
+            type=float,
+            default=0.0,
+            help="radius in metres of the uniform offset of each cone (default: 0)")
+        noise_group.add_argument(
+            '--covariance-scale',
+            type=float,
+            default=1.0,
+            help="scale of the Gaussian offset of each cone by its covariance (default: 1, "
+                 "0 disables it)")
+        noise_group.add_argument(
+            '--color-noise',
+            type=float,
+            default=0.0,
+            help="fraction of cones whose colour is unknown (default: 0)")
+        noise_group.add_argument(
+            '--object-noise',
+            type=float,
+            default=0.0,
+            help="fraction of the tiles around the track that get a noise object, kept in the "
+                 "catalog metadata of 'catalog' variants (default: 0)")
+
+    def main(self, args):
+        assert args.count >= 1, "--count must be at least 1"
+        assert 0 <= args.color_noise <= 1, "--color-noise must be between 0 and 1"
+        assert 0 <= args.object_noise <= 1, "--object-noise must be between 0 and 1"
+        assert args.format != "launch" or not args.color_noise, \
+            "--color-noise only applies to maps, not to 'launch' variants"
+
+        index = TrackIndex().refresh()
+        entries = index.find(args.track, args.from_format)
+        if not entries:
+            print(f"No track called '{args.track}'")
+            return 1
+        cones, car_start = index.read(entries[0]["format"], entries[0]["path"])
+
+        seed = random.randrange(2 ** 32) if args.seed is None else args.seed
+        variants = NoisyVariants(
+            cones, car_start, args.count,
+            cone_noise=args.cone_noise,
+            covariance_scale=args.covariance_scale,
+            color_noise=args.color_noise,
+            object_noise=args.object_noise,
+            seed=seed
+        )
+
+        if args.format == "catalog":
+            catalog = EUFSTracksCreate.catalog_path(args.catalog or args.track + "_variants")
+            tracks = (
+                (cones, car_start, {
+                    "name": f"{args.track}_{i}",
+                    "variant_of": args.track,
+                    "seed": seed,
+                    "variant": i,
+                    "noise_objects": objects,
+                })
+                for i, (cones, car_start, objects) in enumerate(variants)
+            )
+            indices = Catalog.append(catalog, list(tracks))
+            print(f"Appended {len(indices)} variants of '{args.track}' to '{catalog}'")
+            return
+
+        TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+        if args.format == "launch":
+            for i, (cones, car_start, objects) in enumerate(variants):
+                write_artifacts(render_track(cones, car_start, f"{args.track}_{i}",
+                                             noise_objects=objects), TRACKS_SHARE)
+            print(f"Wrote {args.count} variants of '{args.track}' to '{TRACKS_SHARE}'")
+            return
+
+        folder = os.path.join(TRACKS_SHARE, args.format)
+        os.makedirs(folder, exist_ok=True)
+        for i, (cones, car_start, _) in enumerate(variants):
+            file_path = os.path.join(folder, f"{args.track}_{i}")
+            if args.format == "csv":
+                write_csv(file_path + ".csv", cones, car_start)
+            else:
+                write_binary(file_path + BINARY_EXTENSION, cones, car_start)
+        print(f"Wrote {args.count} variants of '{args.track}' to '{folder}'")
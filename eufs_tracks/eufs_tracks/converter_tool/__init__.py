@@ -1,2 +1,13 @@
-from .converter import Converter  # noqa: F401
-from .converter_gui import EUFSConverterGUI  # noqa: F401
+from eufs_tracks.lazy import lazy_exports
+
+# Module each name of the package is defined in. Names are imported on first use, so that rqt
+# loading EUFSConverterGUI doesn't import the converters and the command line tools don't
+# import Qt.
+_EXPORTS = {
+    "Converter": ".converter",
+    "BatchConverter": ".batch",
+    "EUFSConverterGUI": ".converter_gui",
+    "ThumbnailLoader": ".thumbnail_loader",
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -0,0 +1,239 @@
+import os
+import json
+import hashlib
+import numpy as np
+from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from ament_index_python.packages import get_package_share_directory
+
+from eufs_tracks.track_io import atomic_write, Catalog
+from eufs_tracks.track_io.binary import EXTENSION as BINARY_EXTENSION
+from eufs_tracks.track_io.catalog import EXTENSION as CATALOG_EXTENSION
+
+from .converter import Converter
+
+
+# Extension of the files each source format is read from
+SOURCE_EXTENSIONS = {
+    "launch": ".launch",
+    "csv": ".csv",
+    "binary": BINARY_EXTENSION,
+    "catalog": CATALOG_EXTENSION,
+}
+
+
+def _convert_one(job):
+    """
+    Worker entry point, converts a single file. Must be picklable for the process pool.
+
+    Returns the files written or, for tracks going into a catalog, their catalog entry: the
+    parent appends them itself, in the order of the inputs.
+    """
+    cfrom, cto, which_file, params = job
+    try:
+        if cto == "catalog" and cfrom in ("launch", "csv", "binary"):
+            if params.get("validate"):
+                Converter.check_track(Converter.load_track(cfrom, which_file), which_file)
+            result = Converter.catalog_entry(cfrom, which_file, params)
+        else:
+            result = Converter.convert(cfrom, cto, which_file, params)
+    except Exception as exc:
+        return which_file, None, f"{type(exc).__name__}: {exc}"
+    if result is None:
+        return which_file, None, f"conversion from {cfrom} to {cto} is not supported"
+    return which_file, result, None
+
+
+class BatchConverter:
+    """
+    Converts many tracks at once across a pool of processes.
+
+    A manifest of the previous run is kept next to the outputs. Each entry stores the hash of
+    the inputs of a conversion, the version of the converter and the files it wrote. Files whose
+    entry still matches are skipped, so re-running a batch only redoes what changed.
+    """
+
+    MANIFEST_NAME = ".convert_manifest.json"
+
+    def __init__(self, cfrom, cto, jobs=None, force=False, manifest_path=None):
+        """
+        cfrom:         Type to convert from (launch, csv, binary, catalog)
+        cto:           Type to convert to   (launch, csv, binary, catalog)
+        jobs:          Number of worker processes (default: number of CPUs)
+        force:         Convert every file, even if the manifest says it is up to date
+        manifest_path: Where to keep the manifest (default: in the eufs_tracks share directory)
+        """
+        self.cfrom = cfrom
+        self.cto = cto
+        self.jobs = jobs
+        self.force = force
+
+        self.TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+        if manifest_path is None:
+            manifest_path = os.path.join(self.TRACKS_SHARE, BatchConverter.MANIFEST_NAME)
+        self.manifest_path = manifest_path
+
+    @staticmethod
+    def is_pattern(path):
+        """Returns true if path should be expanded to multiple files (a directory or a glob)"""
+        return os.path.isdir(path) or any(c in path for c in "*?[")
+
+    def expand_inputs(self, patterns):
+        """
+        Expands directories, globs and track names into a sorted list of files to convert.
+
+        Directories are searched (non-recursively) for files of the source format, ignoring the
+        files listed in the directory's blacklist.txt. Names which aren't existing files are looked
+        up in the eufs_tracks share directory, as for a single conversion.
+        """
+        extension = SOURCE_EXTENSIONS[self.cfrom]
+        files = set()
+        for pattern in patterns:
+            if os.path.isdir(pattern):
+                blacklist = []
+                blacklist_filepath = os.path.join(pattern, "blacklist.txt")
+                if os.path.isfile(blacklist_filepath):
+                    with open(blacklist_filepath, "r") as f:
+                        blacklist = [line.strip() for line in f]
+                found = [
+                    f for f in glob(os.path.join(pattern, "*" + extension))
+                    if os.path.basename(f) not in blacklist
+                ]
+            elif BatchConverter.is_pattern(pattern):
+                found = glob(pattern, recursive=True)
+            elif os.path.exists(pattern):
+                found = [pattern]
+            else:
+                found = [os.path.join(self.TRACKS_SHARE, self.cfrom, pattern + extension)]
+
+            files.update(os.path.abspath(f) for f in found if os.path.isfile(f))
+        return sorted(files)
+
+    def input_hash(self, which_file, params={}):
+        """
+        Hashes the contents of everything a conversion of which_file reads, along with the
+        conversion parameters. Launch files only hold the car's starting pose, so the model
+        they refer to is hashed too.
+        """
+        sha = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+        with open(which_file, "rb") as f:
+            sha.update(f.read())
+
+        if self.cfrom == "launch":
+            name = os.path.basename(which_file).split(".")[0]
+            sdf_path = os.path.join(self.TRACKS_SHARE, "models", name, "model.sdf")
+            if os.path.isfile(sdf_path):
+                with open(sdf_path, "rb") as f:
+                    sha.update(f.read())
+        return sha.hexdigest()
+
+    def load_manifest(self):
+        if not os.path.isfile(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except ValueError:
+            print(f"Ignoring corrupt manifest '{self.manifest_path}'")
+            return {}
+
+    def is_up_to_date(self, entry, digest):
+        return (
+            entry is not None
+            and entry["hash"] == digest
+            and entry["version"] == Converter.VERSION
+            and all(os.path.exists(output) for output in entry["outputs"])
+        )
+
+    def clashing_inputs(self, files, params={}):
+        """
+        Finds the files whose conversions would write tracks of the same name, e.g. csv/rand.csv
+        and /tmp/rand.csv, as they would overwrite each other. Returns {name: [files]}.
+        """
+        writers = {}
+        for which_file in files:
+            try:
+                names = Converter.output_names(self.cfrom, self.cto, which_file, params)
+            except Exception:
+                # Unreadable catalogs fail when converted
+                continue
+            for name in names:
+                writers.setdefault(name, []).append(which_file)
+        return {name: written for name, written in writers.items() if len(written) > 1}
+
+    def run(self, patterns, params={}):
+        """
+        Converts every file matched by patterns that changed since the last run. Files whose
+        outputs would have the same name are not converted, and count as failed.
+
+        patterns: List of files, directories, globs or track names
+        params:   Parameters passed on to `Converter.convert` for every file
+
+        Returns a tuple of lists (converted, skipped, failed) of input files.
+        """
+        manifest = self.load_manifest()
+        files = self.expand_inputs(patterns)
+
+        failed = []
+        for name, written in sorted(self.clashing_inputs(files, params).items()):
+            print(f"Not converting {', '.join(repr(f) for f in written)}: each would write "
+                  f"the track {name}")
+            failed += [which_file for which_file in written if which_file not in failed]
+
+        pending = []
+        digests = {}
+        skipped = []
+        for which_file in files:
+            if which_file in failed:
+                manifest.pop(f"{self.cfrom}->{self.cto}:{which_file}", None)
+                continue
+            key = f"{self.cfrom}->{self.cto}:{which_file}"
+            digests[which_file] = self.input_hash(which_file, params)
+            if not self.force and self.is_up_to_date(manifest.get(key), digests[which_file]):
+                skipped.append(which_file)
+            else:
+                pending.append((self.cfrom, self.cto, which_file, params))
+
+        converted = []
+        # Catalog entry of each track going into a catalog, in the order of the inputs
+        entries = {}
+        if pending:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                for which_file, outputs, error in pool.map(_convert_one, pending):
+                    key = f"{self.cfrom}->{self.cto}:{which_file}"
+                    if error is not None:
+                        print(f"Failed to convert '{which_file}': {error}")
+                        manifest.pop(key, None)
+                        failed.append(which_file)
+                        continue
+                    if self.cto == "catalog":
+                        entries[which_file] = outputs
+                        outputs = [Converter.catalog_path(params)]
+
+                    manifest[key] = {
+                        "hash": digests[which_file],
+                        "version": Converter.VERSION,
+                        "outputs": outputs,
+                    }
+                    converted.append(which_file)
+
+            if entries:
+                # Appended here rather than by the workers, so that the order of the catalog
+                # doesn't depend on which worker finishes first
+                try:
+                    Catalog.append(Converter.catalog_path(params), list(entries.values()),
+                                   params.get("dtype", np.float64))
+                except Exception as exc:
+                    print(f"Failed to append to '{Converter.catalog_path(params)}': {exc}")
+                    for which_file in entries:
+                        manifest.pop(f"{self.cfrom}->{self.cto}:{which_file}", None)
+                        converted.remove(which_file)
+                        failed.append(which_file)
+
+            # Only this process ever writes the manifest, workers just convert
+            atomic_write(self.manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+
+        print(f"Converted {len(converted)}, skipped {len(skipped)} (up to date), "
+              f"failed {len(failed)}")
+        return converted, skipped, failed
@@ -1,11 +1,14 @@
 import os
 import numpy as np
-import pandas as pd
-import xml.etree.ElementTree as ET
 
 from ament_index_python.packages import get_package_share_directory
 from rclpy.node import Node
 
+from eufs_tracks.track_io import CONE_TAGS
+from eufs_tracks.track_io import load_csv, write_csv, write_binary, load_binary, Catalog
+from eufs_tracks.track_io.binary import EXTENSION as BINARY_EXTENSION
+from eufs_tracks.track_io.catalog import EXTENSION as CATALOG_EXTENSION
+
 
 # Class which generates CSV files from SDF Gazebo track models
 # CSV files consist of type of cones and their x and y positions
@@ -23,6 +26,130 @@ class Track(Node):
         # conversion is fully bijective.
         self.car_start_data = ("car_start", 0.0, 0.0, 0.0)
 
+    @staticmethod
+    def cone_attribute(tag):
+        """Returns the name of the attribute holding the cones of class tag"""
+        return "big_orange_cones" if tag == "big_orange" else tag + "_cones"
+
+    def get_cones(self):
+        """Returns a dict mapping each cone class to its (n, 5) array, or None if it has none"""
+        return {tag: getattr(self, Track.cone_attribute(tag)) for tag in CONE_TAGS}
+
+    def set_cones(self, cones):
+        """Sets the cones of each class from a dict as returned by `get_cones()`"""
+        for tag in CONE_TAGS:
+            data = cones.get(tag)
+            if data is not None and len(data) == 0:
+                data = None
+            setattr(self, Track.cone_attribute(tag), data)
+
+    def cone_grid(self, cell_size=None):
+        """
+        Returns a `ConeGrid` over the cones of the track, for batched radius, nearest and window
+        queries (see `eufs_tracks.track_io.spatial`). It is built on the first call and rebuilt
+        only when the cone arrays or cell_size change.
+        """
+        from eufs_tracks.track_io.spatial import ConeGrid
+
+        cones = tuple(self.get_cones().values())
+        cached = getattr(self, "_cone_grid", None)
+        if (cached is None or cached[1] != cell_size
+                or any(a is not b for a, b in zip(cached[0], cones))):
+            cached = (cones, cell_size, ConeGrid(self.get_cones(), cell_size))
+            self._cone_grid = cached
+        return cached[2]
+
+    def validate(self, validator=None):
+        """
+        Returns the list of rules the track breaks, as `Violation`s (see
+        `eufs_tracks.track_io.validate.TrackValidator`, whose defaults are used if no validator
+        is given). Empty if the track is valid.
+        """
+        from eufs_tracks.track_io.validate import TrackValidator
+
+        return (validator or TrackValidator())(self.get_cones(), self.car_start)
+
+    def fingerprint(self):
+        """
+        Returns the fingerprint of the track's layout, to compare it with other tracks (see
+        `eufs_tracks.track_io.fingerprints`), or None if it has too few cones.
+        """
+        from eufs_tracks.track_io.fingerprints import fingerprint
+
+        return fingerprint(self.get_cones())
+
+    @property
+    def car_start(self):
+        """The car's starting pose as a tuple of floats (x, y, yaw)"""
+        return tuple(float(value) for value in self.car_start_data[1:4])
+
+    def load_csv(self, file_path):
+        """
+        Loads a track csv file (see `eufs_tracks.track_io.csv_io`).
+        Store as elements of the class.
+
+        Args:
+            file_path (str): the path to the csv file to load
+
+        Returns:
+            Nothing
+        """
+        cones, (x, y, yaw) = load_csv(file_path)
+        self.set_cones({tag: cones.get(tag) for tag in CONE_TAGS})
+        self.car_start_data = ("car_start", x, y, yaw, 0.0, 0.0, 0.0)
+
+    def load_binary(self, file_path):
+        """
+        Loads a track in the binary track format (see `eufs_tracks.track_io.binary`).
+        The cone arrays are read-only views of the memory mapped file.
+
+        Args:
+            file_path (str): the path to the binary track file to load
+
+        Returns:
+            Nothing
+        """
+        cones, (x, y, yaw) = load_binary(file_path)
+        self.set_cones(cones)
+        self.car_start_data = ("car_start", x, y, yaw, 0.0, 0.0, 0.0)
+
+    def load_catalog(self, catalog, entry):
+        """
+        Loads a track of a catalog (see `eufs_tracks.track_io.catalog`).
+        The cone arrays are read-only views of the memory mapped catalog.
+
+        Args:
+            catalog (str or Catalog): the path to the catalog, or the catalog already open
+            entry (int or str): the index or name of the track in the catalog
+
+        Returns:
+            The metadata of the track
+        """
+        if not isinstance(catalog, Catalog):
+            with Catalog(catalog) as opened:
+                return self.load_catalog(opened, entry)
+
+        i = catalog.entry(entry)
+        cones, (x, y, yaw) = catalog[i]
+        metadata = catalog.metadata[i]
+        self.set_cones(cones)
+        self.car_start_data = ("car_start", x, y, yaw, 0.0, 0.0, 0.0)
+        return metadata
+
+    def save_binary(self, filename, dtype=np.float64):
+        """Save track in the binary track format
+
+        Args:
+            filename (str): the name and path of the file to save
+            dtype: np.float32 or np.float64, the precision to store the cones with
+
+        Returns:
+            The path of the saved file
+        """
+        filename = write_binary(filename, self.get_cones(), self.car_start, dtype)
+        print("Succesfully saved to binary")
+        return filename
+
     def load_sdf(self, file_path):
         """
         Loads a Gazebo model .SDF file and identify cones in it
@@ -39,162 +166,41 @@ class Track(Node):
             print("Please give me a .sdf file. Exiting")
             return
 
-        root = ET.parse(file_path).getroot()
-        blue = []
-        yellow = []
-        orange = []
-        big_orange = []
-
-        # iterate over all links of the model
-        if len(root[0].findall("include")) != 0:
-            for child in root[0].iter("include"):
-                pose = child.find("pose").text.split(" ")[0:2]
-                cov_node = child.find("covariance")
-                if cov_node is None:
-                    cov_info = [0.01, 0.01, 0.0]
-                else:
-                    covariance_x = float(cov_node.attrib["x"])
-                    covariance_y = float(cov_node.attrib["y"])
-                    covariance_xy = float(cov_node.attrib["xy"])
-                    cov_info = [covariance_x, covariance_y, covariance_xy]
-                mesh_str = "_".join(child.find("name").text.split("_")[:-1])
-                # indentify cones by the name of their mesh
-                if "blue_cone" == mesh_str:
-                    blue.append(pose + cov_info)
-                elif "yellow_cone" == mesh_str:
-                    yellow.append(pose + cov_info)
-                elif "big_cone" == mesh_str:
-                    big_orange.append(pose + cov_info)
-                elif "orange_cone" == mesh_str:
-                    orange.append(pose + cov_info)
-                else:
-                    print("[track_gen.py] No such object: " + mesh_str)
+        with open(file_path, "rb") as sdf_file:
+            self.load_sdf_data(sdf_file.read())
 
-        # convert all lists to numpy as arrays for efficiency
-        if len(blue) != 0:
-            self.blue_cones = np.array(blue, dtype="float64")
-        else:
-            self.blue_cones = None
-            print("No blue cones found!")
+    def load_sdf_data(self, data):
+        """
+        Identify the cones in the contents of a Gazebo model .SDF file
+        based on their mesh tag. Store as elements of the class.
 
-        if len(yellow) != 0:
-            self.yellow_cones = np.array(yellow, dtype="float64")
-        else:
-            self.yellow_cones = None
-            print("No yellow cones found!")
+        Args:
+            data (str or bytes): the contents of the SDF file
 
-        if len(big_orange) != 0:
-            self.big_orange_cones = np.array(big_orange, dtype="float64")
-        else:
-            self.big_orange_cones = None
-            print("No big orange cones found!")
+        Returns:
+            Nothing
+        """
+        from eufs_tracks.track_io.sdf import parse_model_sdf
 
-        if len(orange) != 0:
-            self.orange_cones = np.array(orange, dtype="float64")
-        else:
-            self.orange_cones = None
-            print("No orange cones found!")
+        self.set_cones(parse_model_sdf(data))
+
+        for tag in CONE_TAGS:
+            if getattr(self, Track.cone_attribute(tag)) is None:
+                print(f"No {tag.replace('_', ' ')} cones found!")
 
     def save_csv(self, filename, hdr=None):
-        """Save track as a csv file along with tags: blue, yellow or big
+        """Save track as a csv file along with tags: blue, yellow, orange or big_orange
 
         Args:
             file_path (str): the name and path of the file to save
             hdr (str): header of the CSV file
 
         Returns:
-            Nothing
+            The path of the saved file
         """
-
-        if filename.find(".csv") == -1:
-            filename = filename + ".csv"
-
-        df = pd.DataFrame(
-            columns=["tag", "x", "y", "direction", "x_variance", "y_variance", "xy_covariance"]
-        )
-
-        # assuming there always are blue and yellow cones
-        df["x"] = np.hstack((self.blue_cones[:, 0], self.yellow_cones[:, 0]))
-        df["y"] = np.hstack((self.blue_cones[:, 1], self.yellow_cones[:, 1]))
-        df["tag"].iloc[:] = "blue"
-        df["tag"].iloc[-self.yellow_cones.shape[0]:] = "yellow"
-        df["direction"] = 0
-        df["x_variance"] = np.hstack((self.blue_cones[:, 2], self.yellow_cones[:, 2]))
-        df["y_variance"] = np.hstack((self.blue_cones[:, 3], self.yellow_cones[:, 3]))
-        df["xy_covariance"] = np.hstack((self.blue_cones[:, 4], self.yellow_cones[:, 4]))
-
-        if self.big_orange_cones is not None:
-            empty = pd.DataFrame(
-                np.nan,
-                index=np.arange(self.big_orange_cones.shape[0]),
-                columns=["tag", "x", "y", "direction", "x_variance", "y_variance", "xy_covariance"]
-            )
-            df = df.append(empty)
-            df["x"] = np.hstack((df["x"].dropna().values, self.big_orange_cones[:, 0]))
-            df["y"] = np.hstack((df["y"].dropna().values, self.big_orange_cones[:, 1]))
-            df["tag"].iloc[-self.big_orange_cones.shape[0]:] = "big_orange"
-            df["direction"] = np.hstack((
-                df["direction"].dropna().values,
-                [0 for _ in self.big_orange_cones[:, 2]]))
-            df["x_variance"] = np.hstack(
-                (df["x_variance"].dropna().values, self.big_orange_cones[:, 2]))
-            df["y_variance"] = np.hstack((
-                df["y_variance"].dropna().values, self.big_orange_cones[:, 3]))
-            df["xy_covariance"] = np.hstack((
-                df["xy_covariance"].dropna().values,
-                self.big_orange_cones[:, 4]))
-
-        if self.orange_cones is not None:
-            empty = pd.DataFrame(
-                np.nan,
-                index=np.arange(self.orange_cones.shape[0]),
-                columns=["tag", "x", "y", "direction", "x_variance", "y_variance", "xy_covariance"]
-            )
-            df = df.append(empty)
-            df["x"] = np.hstack((df["x"].dropna().values, self.orange_cones[:, 0]))
-            df["y"] = np.hstack((df["y"].dropna().values, self.orange_cones[:, 1]))
-            df["tag"].iloc[-self.orange_cones.shape[0]:] = "orange"
-            df["direction"] = np.hstack((
-                df["direction"].dropna().values,
-                [0 for _ in self.orange_cones[:, 2]]
-            ))
-            df["x_variance"] = np.hstack((
-                df["x_variance"].dropna().values, self.orange_cones[:, 2]))
-            df["y_variance"] = np.hstack((
-                df["y_variance"].dropna().values, self.orange_cones[:, 3]))
-            df["xy_covariance"] = np.hstack((
-                df["xy_covariance"].dropna().values, self.orange_cones[:, 4]))
-
-        # Add car data (always ("car_start",0,0,0,0,0,0)
-        # unless this file is called from ConversionTools))
-        cardf = pd.DataFrame(
-            [self.car_start_data],
-            columns=[
-                "tag",
-                "x",
-                "y",
-                "direction",
-                "x_variance",
-                "y_variance",
-                "xy_covariance"
-            ]
-        )
-        df = df.append(cardf)
-
-        df.to_csv(
-            filename,
-            index=False,
-            columns=[
-                "tag",
-                "x",
-                "y",
-                "direction",
-                "x_variance",
-                "y_variance",
-                "xy_covariance"
-            ]
-        )
+        filename = write_csv(filename, self.get_cones(), self.car_start)
         print("Succesfully saved to csv")
+        return filename
 
     @staticmethod
     def sdf_to_csv(track_name,
@@ -223,19 +229,22 @@ class Track(Node):
         track.car_start_data = car_start_data
         track.load_sdf(track_path)
         out_name = track_name if override_name is None else override_name
-        track.save_csv(os.path.join(TRACKS_SHARE, "csv", out_name))
+        return track.save_csv(os.path.join(TRACKS_SHARE, "csv", out_name))
 
 
 # Here are all the track formats we care about:
 # - `launch` (well, we actually want the model data, not the .launch, but we'll treat it as wanting
 #             the .launch since the end user shouldn't have to care about the distinction)
 # - `csv`
+# - `binary` (compact memory-mappable format, see `eufs_tracks.track_io.binary`)
+# - `catalog` (many tracks packed in a single file, see `eufs_tracks.track_io.catalog`)
 class Converter(Node):
     def __init__(self):
         pass
 
-    # Keep track of how many we've placed so that we can give each a unique name.
-    link_num = -1
+    # Bump this whenever the output of a conversion changes so that cached
+    # batch conversions (see `BatchConverter`) are redone.
+    VERSION = 2
 
     #########################################################
     #                Main Conversion Method                 #
@@ -246,22 +255,53 @@ class Converter(Node):
         """
         Will convert which_file of filetype cfrom to filetype cto with filename which_file
 
-        cfrom:      Type to convert from (launch, csv) [should be a string]
-        cto:        Type to convert to   (launch, csv) [should be a string]
+        cfrom:      Type to convert from (launch, csv, binary, catalog) [should be a string]
+        cto:        Type to convert to   (launch, csv, binary, catalog) [should be a string]
 
         which_file: The file to be converted - should be a full filepath.
 
         params:     Additional parameters that may be necessary. These will depend on conversion
                     type, so check the docstrings of the specific desired conversion function for
-                    full information.
+                    full information. With validate set, tracks breaking the rules of
+                    `TrackValidator` aren't converted (see `Converter.check_track()`).
+
+        Returns the list of files written, or None if the conversion is not supported.
         """
+        if params.get("validate") and cfrom != "catalog":
+            Converter.check_track(Converter.load_track(cfrom, which_file), which_file)
 
         if cfrom == "launch" and cto == "csv":
             return Converter.launch_to_csv(which_file, params)
         elif cfrom == "csv" and cto == "launch":
             return Converter.csv_to_launch(which_file, params)
+        elif cfrom in ["launch", "csv"] and cto == "binary":
+            return Converter.to_binary(cfrom, which_file, params)
+        elif cfrom == "binary" and cto in ["launch", "csv"]:
+            return Converter.from_binary(cto, which_file, params)
+        elif cfrom in ["launch", "csv", "binary"] and cto == "catalog":
+            return Converter.to_catalog(cfrom, which_file, params)
+        elif cfrom == "catalog" and cto in ["launch", "csv", "binary"]:
+            return Converter.from_catalog(cto, which_file, params)
         return None
 
+    @staticmethod
+    def check_track(track, name):
+        """Raises a ValueError listing the rules track breaks, if it breaks any"""
+        from eufs_tracks.track_io.validate import describe
+
+        violations = track.validate()
+        if violations:
+            raise ValueError(f"'{name}' is invalid: "
+                             + "; ".join(describe(violation) for violation in violations))
+
+    @staticmethod
+    def read_launch_car_start(which_file):
+        """Returns the car's starting pose (x, y, yaw) from a track .launch"""
+        from eufs_tracks.track_io.sdf import parse_launch_car_start
+
+        with open(which_file) as car_data_reader:
+            return parse_launch_car_start(car_data_reader.read())
+
     @staticmethod
     def launch_to_csv(which_file, params={}):
         """
@@ -271,16 +311,12 @@ class Converter(Node):
         """
 
         filename = which_file.split("/")[-1].split(".")[0]
-        with open(which_file) as car_data_reader:
-            car_data = car_data_reader.read()
-        car_x = car_data.split("<arg name=\"x\" default=\"")[1].split("\"")[0]
-        car_y = car_data.split("<arg name=\"y\" default=\"")[1].split("\"")[0]
-        car_yaw = car_data.split("<arg name=\"yaw\" default=\"")[1].split("\"")[0]
-        Track.sdf_to_csv(
+        car_x, car_y, car_yaw = Converter.read_launch_car_start(which_file)
+        return [Track.sdf_to_csv(
             filename,
             car_start_data=("car_start", car_x, car_y, car_yaw, 0.0, 0.0, 0.0),
             override_name=params.get("override_name", None)
-        )
+        )]
 
     @staticmethod
     def csv_to_launch(which_file, params={}):
@@ -288,235 +324,269 @@ class Converter(Node):
         Converts a .csv to a .launch
 
         which_file: The name of the csv file to convert example: rand.csv
-        """
 
-        # Save eufs_tracks directory
-        TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+        params:
+            override_name:    Name of the generated track (default: name of which_file)
+            sdf_mode:         How cones are written to the model.sdf, "include" or "links"
+                              (default: include). See `Converter.render_track()`.
+            collision_radius: "links" mode only, cones further than this from the car's start
+                              have no collision (default: all cones collide)
+            collision_tags:   "links" mode only, the cone classes which keep their collisions
+                              (default: all of them)
+            noise_objects:    Number of noise objects scattered around the track (default: 0)
+            noise_clearance:  Minimum distance of noise objects from the track in metres
+                              (default: 3)
+            noise_seed:       Seed the noise objects are scattered with (default: random)
+        """
 
         # Use override name if provided
         GENERATED_FILENAME = params.get("override_name", which_file.split("/")[-1].split(".")[0])
 
-        # First, we read in the csv data into a dataframe
-        df = pd.read_csv(which_file)
-        blue_cones = df[df['tag'] == "blue"]
-        yellow_cones = df[df['tag'] == "yellow"]
-        orange_cones = df[df['tag'] == "orange"]
-        big_orange_cones = df[df['tag'] == "big_orange"]
-        car_location = df[df['tag'] == "car_start"]
-
-        # Here we parse the data and get a full list of all relevant info of
-        # the cones and the car (type,x,y,yaw)
-        raw_blue = []
-        raw_yellow = []
-        raw_orange = []
-        raw_big_orange = []
-        raw_car_location = (0, 0, 0, 0, 0, 0, 0, 0)
-
-        # Note that the indexing may be confusing, pandas has inserted an "index" column,
-        # so all indices that you would expect should be shifted upwards by 1
-
-        # Blue cones
-        for bluecone in blue_cones.itertuples():
-            x = bluecone[2]
-            y = bluecone[3]
-            x_cov = bluecone[5]
-            y_cov = bluecone[6]
-            xy_cov = bluecone[7]
-            raw_blue.append(("blue", 1.0 * x, 1.0 * y, 0, x_cov, y_cov, xy_cov))
-
-        # Yellow cones
-        for yellowcone in yellow_cones.itertuples():
-            x = yellowcone[2]
-            y = yellowcone[3]
-            x_cov = bluecone[5]
-            y_cov = bluecone[6]
-            xy_cov = bluecone[7]
-            raw_yellow.append(("yellow", 1.0 * x, 1.0 * y, 0, x_cov, y_cov, xy_cov))
-
-        # Orange cones
-        for orangecone in orange_cones.itertuples():
-            x = orangecone[2]
-            y = orangecone[3]
-            x_cov = bluecone[5]
-            y_cov = bluecone[6]
-            xy_cov = bluecone[7]
-            raw_orange.append(("orange", 1.0 * x, 1.0 * y, 0, x_cov, y_cov, xy_cov))
-
-        # Big orange cones
-        for big_orangecone in big_orange_cones.itertuples():
-            x = big_orangecone[2]
-            y = big_orangecone[3]
-            x_cov = bluecone[5]
-            y_cov = bluecone[6]
-            xy_cov = bluecone[7]
-            raw_big_orange.append(("big_orange", 1.0 * x, 1.0 * y, 0, x_cov, y_cov, xy_cov))
-
-        # Car start
-        for c in car_location.itertuples():
-            raw_car_location = ("car", 1.0 * c[2], 1.0 * c[3], c[4], 0, 0, 0)
-
-        # Combine
-        all_cones = (raw_blue + raw_yellow + raw_orange + raw_big_orange)
-
-        # Create launch file
-        launch_template_file = os.path.join(TRACKS_SHARE, 'resource/randgen_launch_template')
-        with open(launch_template_file, "r") as launch_template:
-            # .launches need to point to .worlds and model files of the same name,
-            # so here we are pasting in copies of the relevant filename.
-            launch_merged = "".join(launch_template)
-            launch_merged = GENERATED_FILENAME.join(launch_merged.split("%FILLNAME%"))
-
-            # Fill in the car's position
-            launch_merged = str(raw_car_location[1]).join(launch_merged.split('%PLACEX%'))
-            launch_merged = str(raw_car_location[2]).join(launch_merged.split('%PLACEY%'))
-            launch_merged = str(raw_car_location[3]).join(launch_merged.split('%PLACEROTATION%'))
-
-            # Write launch file.
-            launch_out_filepath = os.path.join(
-                TRACKS_SHARE, 'launch', GENERATED_FILENAME + '.launch')
-            with open(launch_out_filepath, "w") as launch_out:
-                launch_out.write(launch_merged)
-
-        # Create world file
-        world_template_filepath = os.path.join(TRACKS_SHARE, 'resource', 'randgen_world_template')
-        with open(world_template_filepath, "r") as world_template:
-            # The world file needs to point to the correct model folder,
-            # which conveniently has the same name as the world file itself.
-            world_merged = "".join(world_template)
-            world_merged = GENERATED_FILENAME.join(world_merged.split("%FILLNAME%"))
-
-            # Write world file
-            world_out_filepath = os.path.join(TRACKS_SHARE, 'worlds', GENERATED_FILENAME + ".world")
-            with open(world_out_filepath, "w") as world_out:
-                world_out.write(world_merged)
-
-        # Create model folder
-        MODEL_TEMPLATE_SHARE = os.path.join(TRACKS_SHARE, 'resource', 'randgen_model_template')
-
-        # 1. Create the folder
-        # If the folder does exist, it gets automatically overridden by the rest of this function
-        MODEL_FOLDER = os.path.join(TRACKS_SHARE, 'models', GENERATED_FILENAME)
-        if not os.path.exists(MODEL_FOLDER):
-            os.mkdir(MODEL_FOLDER)
-
-        # 2. Config file
-        config_template_filepath = os.path.join(MODEL_TEMPLATE_SHARE, 'model.config')
-        with open(config_template_filepath, "r") as config_template:
-            # Let the config file know the name of the track it represents
-            config_merged = "".join(config_template)
-            config_merged = GENERATED_FILENAME.join(config_merged.split("%FILLNAME%"))
-
-            # Write config file
-            config_out_filepath = os.path.join(MODEL_FOLDER, 'model.config')
-            with open(config_out_filepath, "w") as config_out:
-                config_out.write(config_merged)
-
-        # 3. SDF file
-        sdf_template_filepath = os.path.join(MODEL_TEMPLATE_SHARE, 'model.sdf')
-        with open(sdf_template_filepath, "r") as sdf_template:
-            sdf_merged = "".join(sdf_template)
-            sdf_split_again = sdf_merged.split("$===$")
-
-            # sdf_split_again list contents:
-            #        0: Main body of sdf file
-            #        1: Outline of noise mesh visual data
-            #        2: Outline of noise mesh collision data
-            #        3: Noisecube collision data, meant for noise as
-            #            a low-complexity collision to prevent falling out the world
-            #        4: Outline of noise mesh visual data for innactive noise
-
-            # Here we break up sdf_split_again into its constituent parts
-            # At the end of this process we will have:
-            #   sdf_main:                  The global template for the sdf
-            #   sdf_model_with_collisions: The template for cone and noise models with
-            #                              collision data.
-            #
-            # And the corresponding sdf_ghost_model and sdf_ghost_model_with_collisions
-            # which store inactive (hidden) models.
-            sdf_main = sdf_split_again[0]
-            sdf_split_along_collisions = sdf_split_again[6].split("%FILLCOLLISION%")
-            sdf_model_with_collisions = sdf_split_again[2].join(sdf_split_along_collisions)
-
-            # Let the sdf file know which launch file it represents.
-            sdf_main = GENERATED_FILENAME.join(sdf_main.split("%FILLNAME%"))
-
-            # Calculate model data for cones
-            collision_template = sdf_model_with_collisions.split("%MODELNAME%")
-
-            def join_cone_model_data(cone_type):
-                cone_name = "_".join(cone_type.split("_")[:2])
-                cone_model = "model://" + cone_name
-                return cone_model.join(collision_template)
-
-            sdf_blue_cone_model = join_cone_model_data("blue_cone")
-            sdf_yellow_cone_model = join_cone_model_data("yellow_cone")
-            sdf_orange_cone_model = join_cone_model_data("orange_cone")
-            sdf_big_orange_cone_model = join_cone_model_data("big_cone")
-
-            # Let's place all the models!
-            # We'll keep track of how many we've placed
-            # so that we can give each a unique name.
-            Converter.link_num = -1
-
-            def setup_covariance(x, y, xy):
-                output = str(x).join(sdf_split_again[5].split("%XCOV%"))
-                output = str(y).join(output.split("%YCOV%"))
-                output = str(xy).join(output.split("%XYCOV%"))
-                return output
-
-            def put_model_at_position(mod, x, y, modtype, x_cov=0.01, y_cov=0.01, xy_cov=0):
-                """
-                mod: model template to be placed
-                x,y: x and y positions for mod
-
-                returns model template with x,y, and link_num inserted.
-                """
-                Converter.link_num += 1
-                mod_filled = str(y).join(mod.split("%PLACEY%"))
-                mod_filled = str(x).join(mod_filled.split("%PLACEX%"))
-                mod_filled = str(Converter.link_num).join(mod_filled.split("%LINKNUM%"))
-                mod_filled = modtype.join(mod_filled.split("%LINKTYPE%"))
-                mod_with_cov = setup_covariance(str(x_cov), str(y_cov), str(xy_cov)).join(
-                    mod_filled.split("%FILLCOVARIANCE%"))
-                return mod_with_cov
-
-            sdf_allmodels = ""
-
-            def expand_allmodels(allmods, mod, modtype, x, y, x_cov=0.01,
-                                 y_cov=0.01, xy_cov=0):
-                """
-                Takes in a model and a pixel location, converts the pixel location to a raw
-                location, and places the model inside sdf_allmodels
-                """
-                mod_at_p = put_model_at_position(mod, x, y, modtype, x_cov, y_cov, xy_cov)
-                return allmods + "\n" + mod_at_p
-
-            # Add all models into a template
-            color_to_model = {
-                "yellow": sdf_yellow_cone_model,
-                "blue": sdf_blue_cone_model,
-                "orange": sdf_orange_cone_model,
-                "big_orange": sdf_big_orange_cone_model
-            }
-            for cone in all_cones:
-                name, x, y, direction, x_cov, y_cov, xy_cov = cone
-                if name in color_to_model:
-                    # Normal cones.
-                    sdf_allmodels = expand_allmodels(
-                        sdf_allmodels,
-                        color_to_model[name],
-                        name + "_cone" if name != "big_orange" else "big_cone",
-                        x,
-                        y,
-                        x_cov,
-                        y_cov,
-                        xy_cov
-                    )
-
-            # Splice the sdf file back together.
-            sdf_main = sdf_allmodels.join(sdf_main.split("%FILLDATA%"))
-
-            # Write it out.
-            sdf_out_filepath = os.path.join(MODEL_FOLDER, "model.sdf")
-            with open(sdf_out_filepath, "w") as sdf_out:
-                sdf_out.write(sdf_main)
+        track = Track()
+        track.load_csv(which_file)
+        return Converter.track_to_launch(track, GENERATED_FILENAME, params)
+
+    @staticmethod
+    def load_track(cfrom, which_file):
+        """
+        Loads a Track from a .launch (and the model it refers to), a .csv or a binary track
+
+        cfrom:      Type of which_file (launch, csv, binary)
+        which_file: The file to load - should be a full filepath.
+        """
+        track = Track()
+        if cfrom == "launch":
+            TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+            filename = which_file.split("/")[-1].split(".")[0]
+            car_x, car_y, car_yaw = Converter.read_launch_car_start(which_file)
+            track.car_start_data = ("car_start", car_x, car_y, car_yaw, 0.0, 0.0, 0.0)
+            track.load_sdf(os.path.join(TRACKS_SHARE, "models", filename, "model.sdf"))
+        elif cfrom == "binary":
+            track.load_binary(which_file)
+        else:
+            track.load_csv(which_file)
+        return track
+
+    @staticmethod
+    def to_binary(cfrom, which_file, params={}):
+        """
+        Converts a .launch or a .csv to a binary track
+
+        cfrom:      Type to convert from (launch, csv)
+        which_file: The name of the file to convert example: rand.csv
+
+        params:
+            override_name: Name of the generated track (default: name of which_file)
+            dtype:         np.float32 or np.float64, precision of the cones (default: float64)
+        """
+        TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+        filename = which_file.split("/")[-1].split(".")[0]
+        track = Converter.load_track(cfrom, which_file)
+
+        BINARY_FOLDER = os.path.join(TRACKS_SHARE, "binary")
+        os.makedirs(BINARY_FOLDER, exist_ok=True)
+        out_name = params.get("override_name", filename)
+        return [track.save_binary(os.path.join(BINARY_FOLDER, out_name + BINARY_EXTENSION),
+                                  params.get("dtype", np.float64))]
+
+    @staticmethod
+    def from_binary(cto, which_file, params={}):
+        """
+        Converts a binary track to a .launch or a .csv
+
+        cto:        Type to convert to (launch, csv)
+        which_file: The name of the binary track to convert example: rand.trk
+
+        params:     As for `Converter.csv_to_launch()` when converting to a .launch
+        """
+        TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+        out_name = params.get("override_name", which_file.split("/")[-1].split(".")[0])
+
+        track = Track()
+        track.load_binary(which_file)
+        if cto == "launch":
+            return Converter.track_to_launch(track, out_name, params)
+        return [track.save_csv(os.path.join(TRACKS_SHARE, "csv", out_name))]
+
+    @staticmethod
+    def to_catalog(cfrom, which_file, params={}):
+        """
+        Appends a .launch, .csv or binary track to a catalog
+
+        cfrom:      Type to convert from (launch, csv, binary)
+        which_file: The name of the file to convert example: rand.csv
+
+        params:
+            catalog:       Path of the catalog, created if needed
+                           (default: tracks.trkc in the catalog folder of eufs_tracks)
+            override_name: Name of the track in the catalog (default: name of which_file)
+            dtype:         np.float32 or np.float64, precision of the cones (default: float64)
+        """
+        catalog_path = Converter.catalog_path(params)
+        Catalog.append(catalog_path, [Converter.catalog_entry(cfrom, which_file, params)],
+                       params.get("dtype", np.float64))
+        return [catalog_path]
+
+    @staticmethod
+    def catalog_path(params={}):
+        """The catalog `Converter.to_catalog()` appends to, its folder created if needed"""
+        TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+        catalog_path = params.get(
+            "catalog", os.path.join(TRACKS_SHARE, "catalog", "tracks" + CATALOG_EXTENSION))
+        os.makedirs(os.path.dirname(os.path.abspath(catalog_path)), exist_ok=True)
+        return catalog_path
+
+    @staticmethod
+    def catalog_entry(cfrom, which_file, params={}):
+        """
+        Loads a .launch, .csv or binary track as an entry of `Catalog.append()`, as
+        `Converter.to_catalog()` would append it
+        """
+        track = Converter.load_track(cfrom, which_file)
+        name = params.get("override_name", which_file.split("/")[-1].split(".")[0])
+        return track.get_cones(), track.car_start, {"name": name}
+
+    @staticmethod
+    def output_names(cfrom, cto, which_file, params={}):
+        """
+        Names of the tracks a conversion of which_file writes, each to files named after it (a
+        name may be written more than once). Converting to a catalog writes no files of its own.
+        """
+        if cto == "catalog":
+            return []
+        if cfrom != "catalog":
+            return [params.get("override_name", which_file.split("/")[-1].split(".")[0])]
+
+        catalog_name = which_file.split("/")[-1].split(".")[0]
+        with Catalog(which_file) as catalog:
+            if "entry" in params:
+                entries = [catalog.entry(params["entry"])]
+            else:
+                entries = range(len(catalog))
+            return [params.get("override_name", catalog.metadata[i].get("name")
+                               or f"{catalog_name}_{i}") for i in entries]
+
+    @staticmethod
+    def from_catalog(cto, which_file, params={}):
+        """
+        Exports tracks of a catalog to .launch, .csv or binary tracks
+
+        cto:        Type to convert to (launch, csv, binary)
+        which_file: The catalog to export from example: tracks.trkc
+
+        params:
+            entry:         Index or name of the track to export (default: every track)
+            override_name: Name of the exported track, only when exporting a single entry
+                           (default: its name in the catalog)
+            validate:      Skip the tracks breaking the rules of `TrackValidator`
+            Other params are passed on as for `Converter.from_binary()`
+        """
+        TRACKS_SHARE = get_package_share_directory("eufs_tracks")
+        catalog_name = which_file.split("/")[-1].split(".")[0]
+        written = []
+        with Catalog(which_file) as catalog:
+            if "entry" in params:
+                entries = [catalog.entry(params["entry"])]
+            else:
+                assert "override_name" not in params, "override_name needs a single entry"
+                entries = range(len(catalog))
+
+            for i in entries:
+                track = Track()
+                metadata = track.load_catalog(catalog, i)
+                out_name = params.get("override_name",
+                                      metadata.get("name") or f"{catalog_name}_{i}")
+                if params.get("validate"):
+                    try:
+                        Converter.check_track(track, out_name)
+                    except ValueError as exc:
+                        print(f"Skipped {exc}")
+                        continue
+                if cto == "launch":
+                    written += Converter.track_to_launch(track, out_name, params)
+                elif cto == "binary":
+                    BINARY_FOLDER = os.path.join(TRACKS_SHARE, "binary")
+                    os.makedirs(BINARY_FOLDER, exist_ok=True)
+                    written.append(track.save_binary(
+                        os.path.join(BINARY_FOLDER, out_name + BINARY_EXTENSION),
+                        params.get("dtype", np.float64)))
+                else:
+                    written.append(track.save_csv(os.path.join(TRACKS_SHARE, "csv", out_name)))
+        return written
+
+    #########################################################
+    #                  In-Memory Conversion                 #
+    #########################################################
+
+    @staticmethod
+    def render_track(track, name, templates=None, params={}):
+        """
+        Renders the .launch, .world and model files of a track without touching the disk
+
+        track:     The Track to render
+        name:      The name of the generated track
+        templates: Templates as returned by `eufs_tracks.track_io.sdf.load_templates()`
+                   (default: the installed ones, only read once per process)
+        params:    sdf_mode, collision_radius, collision_tags and noise_*, see
+                   `Converter.csv_to_launch()`. The "links" sdf mode renders every cone as a link
+                   of a single model, which Gazebo loads faster than the default one <include>
+                   per cone. Noise objects are scattered with
+                   `eufs_tracks.track_io.variants.scatter_noise()`.
+
+        Returns a dict mapping each file's path, relative to the eufs_tracks share directory,
+        to its contents (bytes). Pass it to `Converter.write_artifacts()` to save it.
+        """
+        from eufs_tracks.track_io.sdf import render_track
+        from eufs_tracks.track_io.variants import scatter_noise
+
+        cones = track.get_cones()
+        noise_objects = scatter_noise(cones, params.get("noise_objects", 0),
+                                      clearance=params.get("noise_clearance", 3.0),
+                                      seed=params.get("noise_seed", None))
+        return render_track(cones, track.car_start, name, templates,
+                            mode=params.get("sdf_mode", "include"),
+                            collision_radius=params.get("collision_radius", None),
+                            collision_tags=params.get("collision_tags", CONE_TAGS),
+                            noise_objects=noise_objects)
+
+    @staticmethod
+    def parse_track(artifacts, name):
+        """
+        Reads a Track back from files rendered by `Converter.render_track()`
+
+        artifacts: Dict mapping paths relative to the share directory to their contents
+        name:      The name of the track
+        """
+        from eufs_tracks.track_io.sdf import parse_track
+
+        cones, (x, y, yaw) = parse_track(artifacts, name)
+        track = Track()
+        track.set_cones(cones)
+        track.car_start_data = ("car_start", x, y, yaw, 0.0, 0.0, 0.0)
+        return track
+
+    @staticmethod
+    def write_artifacts(artifacts, root=None):
+        """
+        Writes rendered files to disk
+
+        artifacts: Dict as returned by `Converter.render_track()`
+        root:      The directory to write to (default: the eufs_tracks share directory)
+
+        Returns the list of files written.
+        """
+        from eufs_tracks.track_io.sdf import write_artifacts
+
+        return write_artifacts(artifacts, root)
+
+    @staticmethod
+    def track_to_launch(track, GENERATED_FILENAME, params={}):
+        """
+        Writes the .launch, .world and model files of a track to the eufs_tracks share directory
+
+        track:              The Track to write
+        GENERATED_FILENAME: The name of the generated track
+        params:             Rendering parameters, see `Converter.render_track()`
+        """
+        artifacts = Converter.render_track(track, GENERATED_FILENAME, params=params)
+        return Converter.write_artifacts(artifacts)
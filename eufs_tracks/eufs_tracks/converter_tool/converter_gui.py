@@ -1,6 +1,6 @@
 from shutil import copyfile
-from os import listdir, mkdir
-from os.path import isfile, join, exists
+from os import mkdir
+from os.path import basename, join, exists
 
 from ament_index_python.packages import get_package_share_directory
 
@@ -9,7 +9,9 @@ from python_qt_binding import loadUi
 from python_qt_binding.QtWidgets import QWidget, QComboBox, QPushButton
 from python_qt_binding.QtWidgets import QLabel, QLineEdit, QApplication
 
-from eufs_tracks.converter_tool import Converter
+from eufs_tracks.converter_tool.thumbnail_loader import ThumbnailLoader
+from eufs_tracks.track_io import TrackIndex, ThumbnailCache
+from eufs_tracks.track_io.schema import BINARY_EXTENSION
 
 
 class EUFSConverterGUI(Plugin):
@@ -27,6 +29,7 @@ class EUFSConverterGUI(Plugin):
 
         # Store gazebo's path as it is used quite a lot:
         self.TRACKS = get_package_share_directory('eufs_tracks')
+        self.track_index = TrackIndex(self.TRACKS)
 
         # Extend the widget with all attributes and children from UI file
         # UI file which should be in the "resource" folder of this package
@@ -50,15 +53,18 @@ class EUFSConverterGUI(Plugin):
         self.RENAME_FILE_TEXTBOX = self._widget.findChild(QLineEdit, "RenameFileTextbox")
         self.RENAME_FILE_HEADER = self._widget.findChild(QLabel, "RenameFileHeader")
         self.FILE_FOR_CONVERSION_BOX = self._widget.findChild(QComboBox, "FileForConversion")
+        self.thumbnail_loader = ThumbnailLoader(
+            self.FILE_FOR_CONVERSION_BOX, ThumbnailCache(self.track_index)
+        )
 
         # Hook up buttons to onclick functions
         self.CONVERT_BUTTON.clicked.connect(self.convert_button_pressed)
         self.RENAME_BUTTON.clicked.connect(self.copy_button_pressed)
 
         # Setup Conversion Tools dropdowns
-        for f in ["launch", "csv"]:
+        for f in ["launch", "csv", "binary"]:
             self.CONVERT_FROM_MENU.addItem(f)
-        for f in ["csv", "launch"]:
+        for f in ["csv", "launch", "binary"]:
             self.CONVERT_TO_MENU.addItem(f)
 
         self.update_converter_dropdown()
@@ -141,6 +147,11 @@ class EUFSConverterGUI(Plugin):
             path_to = join(self.TRACKS, 'csv', raw_name_to + "." + ending)
             copyfile(path_from, path_to)
 
+        elif "." + ending == BINARY_EXTENSION:
+            path_from = join(self.TRACKS, 'binary', file_to_copy_from)
+            path_to = join(self.TRACKS, 'binary', raw_name_to + "." + ending)
+            copyfile(path_from, path_to)
+
         self.logger.info("Copy created Successfully!")
 
     def update_copier(self):
@@ -166,39 +177,30 @@ class EUFSConverterGUI(Plugin):
             filename = join(self.TRACKS, 'launch/' + filename)
         elif from_type == "csv":
             filename = join(self.TRACKS, 'csv/' + filename)
+        elif from_type == "binary":
+            filename = join(self.TRACKS, 'binary/' + filename)
 
-        # Convert it
+        # Convert it, the converters (rclpy, numpy, ...) are only imported the first time
+        from eufs_tracks.converter_tool.converter import Converter
         Converter.convert(from_type, to_type, filename)
         self.logger.info("Converted from: " + from_type + " to: " + to_type + " for: " + filename)
 
     def update_converter_dropdown(self):
         """Keep the drop-down menus of ConversionTools in sync with the filesystem."""
         from_type = self.CONVERT_FROM_MENU.currentText()
-        all_files = []
 
-        if from_type == "launch":
-            # Get tracks from eufs_tracks package
-            relevant_path = join(self.TRACKS, 'launch')
-            launch_files = [f for f in listdir(relevant_path) if isfile(join(relevant_path, f))]
-
-            # Remove "blacklisted" files (ones that don't define tracks)
-            blacklist_filepath = join(self.TRACKS, 'launch/blacklist.txt')
-            blacklist_ = open(blacklist_filepath, "r")
-            blacklist = [f.strip() for f in blacklist_]
-            all_files = [f for f in launch_files if f not in blacklist]
-        elif from_type == "csv":
-            relevant_path = join(self.TRACKS, 'csv')
-            all_files = [
-                f for f in listdir(relevant_path)
-                if isfile(join(relevant_path, f)) and f[-3:] == "csv"
-            ]
+        # Get tracks from eufs_tracks package, the index only rereads what changed
+        # and leaves out "blacklisted" files (ones that don't define tracks)
+        tracks = self.track_index.refresh().tracks(from_type)
 
         # Remove old files from selector
         the_selector = self.FILE_FOR_CONVERSION_BOX
         the_selector.clear()
 
         # Add files to selector
-        for f in all_files:
-            the_selector.addItem(f)
+        for track in tracks:
+            the_selector.addItem(basename(track["path"]))
+        # Their previews are drawn (or read from the cache) in the background
+        self.thumbnail_loader.load(tracks)
 
         self.update_copier()
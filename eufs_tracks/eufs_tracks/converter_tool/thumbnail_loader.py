@@ -0,0 +1,71 @@
+import threading
+from queue import Queue, Empty
+
+from python_qt_binding.QtCore import QObject, QSize, QTimer
+from python_qt_binding.QtGui import QIcon
+
+
+class ThumbnailLoader(QObject):
+    """
+    Fills in the icons of a track drop-down menu with the thumbnails of its tracks. Thumbnails
+    are found, or drawn if they aren't cached yet, in a background thread and set on the menu
+    from the Qt event loop as they come in, so that the menu is usable straight away however
+    many tracks there are.
+    """
+
+    def __init__(self, combo_box, cache, interval=50):
+        """
+        combo_box: The QComboBox listing the tracks
+        cache:     The ThumbnailCache to get the thumbnails from
+        interval:  How often the menu is updated while loading, in milliseconds
+        """
+        super(ThumbnailLoader, self).__init__(combo_box)
+        self.combo_box = combo_box
+        self.cache = cache
+        self.loaded = Queue()
+        self.generation = 0
+        self.thread = None
+
+        self.combo_box.setIconSize(QSize(cache.size, cache.size))
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.set_loaded)
+
+    def load(self, entries):
+        """
+        Starts loading the thumbnails of the items of the menu, replacing any that were still
+        being loaded. entries are the TrackIndex entries of the items, in the same order.
+        """
+        # A thread from an earlier load() stops at its next item and what it queued is dropped
+        self.generation += 1
+        items = [(i, self.combo_box.itemText(i), entry) for i, entry in enumerate(entries)]
+        self.thread = threading.Thread(
+            target=self._load, args=(self.generation, items), daemon=True
+        )
+        self.thread.start()
+        self.timer.start()
+
+    def _load(self, generation, items):
+        # Nothing but the queue is shared with the GUI thread, None marks the end of the load
+        for i, text, entry in items:
+            if generation != self.generation:
+                return
+            self.loaded.put((generation, i, text, self.cache.get(entry)))
+        self.loaded.put((generation, None, None, None))
+
+    def set_loaded(self):
+        while True:
+            try:
+                generation, i, text, thumbnail = self.loaded.get_nowait()
+            except Empty:
+                return
+            if generation != self.generation:
+                continue
+            if i is None:
+                self.timer.stop()
+                continue
+            # Skip items that have changed since, the menu was cleared without a new load()
+            if i >= self.combo_box.count() or self.combo_box.itemText(i) != text:
+                continue
+            if thumbnail is not None:
+                self.combo_box.setItemIcon(i, QIcon(thumbnail))
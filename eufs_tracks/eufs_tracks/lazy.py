@@ -0,0 +1,27 @@
+import sys
+import importlib
+
+
+def lazy_exports(package, exports):
+    """
+    Imports the names a package exports on first use (PEP 562) rather than with the package,
+    so that using one of them doesn't import the modules of all the others.
+
+        __getattr__, __dir__ = lazy_exports(__name__, {"TrackIndex": ".index"})
+
+    package: __name__ of the package
+    exports: Dict mapping each name to the module it is defined in, relative to the package
+
+    Returns the __getattr__ and __dir__ functions of the package.
+    """
+    def __getattr__(name):
+        if name not in exports:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(exports[name], package), name)
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(exports))
+
+    return __getattr__, __dir__
@@ -1,2 +1,10 @@
-from .track_generator import TrackGenerator  # noqa: F401
-from .track_generator_gui import EUFSTracksGUI  # noqa: F401
+from eufs_tracks.lazy import lazy_exports
+
+# Module each name of the package is defined in. Names are imported on first use, so that the
+# command line tools using TrackGenerator don't import Qt.
+_EXPORTS = {
+    "TrackGenerator": ".track_generator",
+    "EUFSTracksGUI": ".track_generator_gui",
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
@@ -427,6 +427,27 @@ class TrackGenerator:
 
         return start_cones, l_cones[1:], r_cones[1:]
 
+    @staticmethod
+    def to_cones(start_cones, l_cones, r_cones, variance=0.01):
+        """
+        Converts the output of the generator into a dict mapping each cone class to an (n, 5)
+        array of x, y, x_variance, y_variance, xy_covariance, as used by `eufs_tracks.track_io`.
+        Left cones are blue, right cones are yellow and starting cones are big orange.
+        """
+        def columns(cones):
+            cones = np.asarray(cones)
+            data = np.zeros((len(cones), 5))
+            data[:, 0] = cones.real
+            data[:, 1] = cones.imag
+            data[:, 2:4] = variance
+            return data
+
+        return {
+            "blue": columns(l_cones),
+            "yellow": columns(r_cones),
+            "big_orange": columns(start_cones),
+        }
+
     @staticmethod
     def write_to_csv(file_path, start_cones, l_cones, r_cones, overwrite=False):
         if not overwrite and exists(file_path):
@@ -451,7 +472,14 @@ class TrackGenerator:
         if 'seed' in properties:
             self.rng = random.Random(self.config['seed'])
 
-    def __call__(self):
+    def generate_path(self):
+        """
+        Generates the path of a track, moved to its starting point, without placing cones.
+
+        Returns:
+        A tuple containing the position, normals, and corner_radii arrays, as
+        taken by place()
+        """
         margin = self.config['track_width'] / 2 + self.config['margin']
         if 'length' in self.config:
             path = TrackGenerator.generate_path_w_length(
@@ -478,12 +506,14 @@ class TrackGenerator:
         else:
             raise KeyError("missing one of required properties length or max_frequency")
 
-        path = TrackGenerator.pick_starting_point(
+        return TrackGenerator.pick_starting_point(
             *path,
             starting_straight_length=self.config['starting_straight_length'],
             downsample=self.config['starting_straight_downsample']
         )
 
+    def place(self, path):
+        """places the cones of a path from generate_path()"""
         return TrackGenerator.place_cones(
             *path, self.config['min_corner_radius'],
             min_cone_spacing=self.config['min_cone_spacing'],
@@ -493,3 +523,6 @@ class TrackGenerator:
             start_offset=self.config['starting_straight_length'],
             starting_cone_spacing=self.config['starting_cone_spacing']
         )
+
+    def __call__(self):
+        return self.place(self.generate_path())
@@ -2,14 +2,12 @@ import random
 import math
 
 from qt_gui.plugin import Plugin
-from python_qt_binding.QtCore import QPointF
+from python_qt_binding.QtCore import QPointF, QTimer
 from python_qt_binding.QtWidgets import QWidget, QVBoxLayout, QSpinBox, QDoubleSpinBox
 from python_qt_binding.QtWidgets import QGroupBox, QFormLayout, QPushButton, QSizePolicy
 from python_qt_binding.QtWidgets import QHBoxLayout, QLabel, QFileDialog, QSplitter
 from python_qt_binding.QtGui import QBrush, QPainter, QPen, QColor
 
-from eufs_tracks.track_generator import TrackGenerator
-
 
 # ranges include both start and end values
 constant_ranges = {
@@ -61,6 +59,15 @@ ranges = {
 }
 
 
+def generate_track():
+    """
+    Generates a track with the current settings. TrackGenerator (and numpy) is imported here
+    rather than with the module, so that rqt loading the plugin doesn't pay for it.
+    """
+    from eufs_tracks.track_generator.track_generator import TrackGenerator
+    return TrackGenerator(settings)()
+
+
 def log_scaling(control, scaling):
     control.setSingleStep(control.value() * scaling)
 
@@ -175,7 +182,8 @@ class TrackControls(QWidget):
 
         def save_track():
             filename = QFileDialog.getSaveFileName(self, "Save File", "track.csv", "CSV (*.csv)")[0]
-            TrackGenerator.write_to_csv(filename, *TrackGenerator(settings)(), overwrite=True)
+            from eufs_tracks.track_generator.track_generator import TrackGenerator
+            TrackGenerator.write_to_csv(filename, *generate_track(), overwrite=True)
         save_btn.clicked.connect(save_track)
 
         layout.addWidget(generation_group)
@@ -192,13 +200,18 @@ class TrackDisplay(QWidget):
         super(TrackDisplay, self).__init__()
         self.resize(200, 200)
         self.setMinimumSize(480, 480)
-        self.start_cones, self.left_cones, self.right_cones = TrackGenerator(settings)()
+        # The first track is generated once the event loop runs, so that building the plugin
+        # doesn't wait for the generator and numpy
+        self.start_cones = self.left_cones = self.right_cones = None
+        QTimer.singleShot(0, self.regenerate_path)
 
     def regenerate_path(self):
-        self.start_cones, self.left_cones, self.right_cones = TrackGenerator(settings)()
+        self.start_cones, self.left_cones, self.right_cones = generate_track()
         self.repaint(0, 0, -1, -1)
 
     def paintEvent(self, e):
+        if self.left_cones is None:
+            return
 
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
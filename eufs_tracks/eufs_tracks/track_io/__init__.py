@@ -0,0 +1,41 @@
+from eufs_tracks.lazy import lazy_exports
+
+# Module each name of the package is defined in. Names are imported on first use, so that e.g.
+# the GUIs listing tracks through TrackIndex don't import every reader and numpy.
+_EXPORTS = {
+    "CONE_TAGS": ".schema",
+    "CAR_START_TAG": ".schema",
+    "CONE_COLUMNS": ".schema",
+    "CSV_COLUMNS": ".schema",
+    "UNKNOWN_COLOR_TAG": ".schema",
+    "atomic_write": ".atomic",
+    "encode_binary": ".binary",
+    "decode_binary": ".binary",
+    "write_binary": ".binary",
+    "load_binary": ".binary",
+    "SDF_MODES": ".sdf",
+    "render_track": ".sdf",
+    "write_artifacts": ".sdf",
+    "parse_track": ".sdf",
+    "render_model_sdf": ".sdf",
+    "encode_csv": ".csv_io",
+    "decode_csv": ".csv_io",
+    "write_csv": ".csv_io",
+    "load_csv": ".csv_io",
+    "Catalog": ".catalog",
+    "TrackIndex": ".index",
+    "ThumbnailCache": ".thumbnail",
+    "ConeGrid": ".spatial",
+    "SegmentIndex": ".spatial",
+    "track_segments": ".spatial",
+    "fingerprint": ".fingerprints",
+    "FingerprintIndex": ".fingerprints",
+    "TrackValidator": ".validate",
+    "LapTimeEstimator": ".laptime",
+    "load_vehicle": ".laptime",
+    "NoisyVariants": ".variants",
+    "load_noise_models": ".variants",
+    "scatter_noise": ".variants",
+}
+
+__getattr__, __dir__ = lazy_exports(__name__, _EXPORTS)
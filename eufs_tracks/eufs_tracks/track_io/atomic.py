@@ -0,0 +1,30 @@
+import os
+import tempfile
+
+
+def atomic_write(file_path, data):
+    """
+    Writes data to file_path by writing a temporary file in the same directory
+    and renaming it over the target. Readers (and other converter processes
+    writing the same file) will only ever see the old or the new contents.
+
+    Args:
+        file_path (str): the path of the file to write
+        data (str or bytes): the contents of the file
+
+    Returns:
+        file_path
+    """
+    directory, basename = os.path.split(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix="." + basename + ".")
+    try:
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as tmp_file:
+            tmp_file.write(data)
+        # mkstemp creates files only readable by us, keep the usual permissions
+        mode = os.stat(file_path).st_mode & 0o777 if os.path.exists(file_path) else 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return file_path
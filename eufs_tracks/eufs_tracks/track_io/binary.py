@@ -0,0 +1,130 @@
+import os
+import struct
+import numpy as np
+
+from .atomic import atomic_write
+from .schema import CONE_COLUMNS, BINARY_EXTENSION
+
+
+# Compact binary track format (.trk)
+#
+# All values are little-endian. The file starts with a fixed size header:
+#
+#   magic      8 bytes   b"EUFSTRK\0"
+#   version    uint16    FORMAT_VERSION
+#   itemsize   uint8     4 (float32 columns) or 8 (float64 columns)
+#   n_classes  uint8     number of entries in the class table
+#   reserved   4 bytes
+#   car_start  3 float64 x, y, yaw of the car's starting pose
+#   reserved   24 bytes
+#
+# followed by n_classes class table entries:
+#
+#   tag        16 bytes  cone class, ascii, null padded (e.g. "blue")
+#   offset     uint64    byte offset of the class data from the start of the track
+#   count      uint64    number of cones in the class
+#
+# The data of each class is stored column by column (x, y, x_variance, y_variance,
+# xy_covariance), each column holding `count` values. Class data is aligned to 16 bytes so
+# that it can be viewed in place through `np.memmap` without copying.
+
+MAGIC = b"EUFSTRK\0"
+FORMAT_VERSION = 1
+EXTENSION = BINARY_EXTENSION
+
+HEADER = struct.Struct("<8sHBB4x3d24x")
+CLASS_ENTRY = struct.Struct("<16sQQ")
+ALIGNMENT = 16
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def encode_binary(cones, car_start=(0.0, 0.0, 0.0), dtype=np.float64):
+    """
+    Encodes a track into the binary track format.
+
+    Args:
+        cones (dict): maps a cone class (e.g. "blue") to an (n, 5) array of
+                      x, y, x_variance, y_variance, xy_covariance. None or empty arrays
+                      are stored as classes with no cones.
+        car_start (tuple): x, y, yaw of the car's starting pose
+        dtype: np.float32 or np.float64, the type the columns are stored as
+
+    Returns:
+        The encoded track (bytes)
+    """
+    dtype = np.dtype(dtype).newbyteorder("<")
+    assert dtype.kind == "f" and dtype.itemsize in (4, 8), "dtype must be float32 or float64"
+
+    offset = _align(HEADER.size + CLASS_ENTRY.size * len(cones))
+    entries = []
+    blocks = []
+    for tag, data in cones.items():
+        if data is None:
+            data = np.empty((0, len(CONE_COLUMNS)))
+        data = np.asarray(data, dtype=dtype).reshape(-1, len(CONE_COLUMNS))
+        block = np.ascontiguousarray(data.T).tobytes()
+
+        entries.append(CLASS_ENTRY.pack(tag.encode("ascii"), offset, data.shape[0]))
+        blocks.append((offset, block))
+        offset = _align(offset + len(block))
+
+    buffer = bytearray(offset)
+    HEADER.pack_into(buffer, 0, MAGIC, FORMAT_VERSION, dtype.itemsize, len(cones),
+                     *(float(value) for value in car_start))
+    buffer[HEADER.size:HEADER.size + CLASS_ENTRY.size * len(entries)] = b"".join(entries)
+    for block_offset, block in blocks:
+        buffer[block_offset:block_offset + len(block)] = block
+    return bytes(buffer)
+
+
+def decode_binary(buffer, offset=0):
+    """
+    Decodes a track in the binary track format without copying its data.
+
+    Args:
+        buffer: the encoded track, anything exposing the buffer protocol (bytes, np.memmap, ...)
+        offset (int): where the track starts in buffer
+
+    Returns:
+        A tuple (cones, car_start). cones maps each cone class to an (n, 5) read-only
+        view into buffer, car_start is the (x, y, yaw) tuple of the car's starting pose.
+    """
+    buffer = np.frombuffer(buffer, dtype=np.uint8)
+    magic, version, itemsize, n_classes, *car_start = HEADER.unpack_from(buffer, offset)
+    if magic != MAGIC:
+        raise ValueError("not an eufs binary track")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported binary track version {version}")
+    dtype = np.dtype(f"<f{itemsize}")
+
+    cones = {}
+    for i in range(n_classes):
+        tag, data_offset, count = CLASS_ENTRY.unpack_from(
+            buffer, offset + HEADER.size + i * CLASS_ENTRY.size)
+        start = offset + data_offset
+        columns = buffer[start:start + count * len(CONE_COLUMNS) * itemsize].view(dtype)
+        cones[tag.rstrip(b"\0").decode("ascii")] = columns.reshape(len(CONE_COLUMNS), count).T
+
+    return cones, tuple(car_start)
+
+
+def write_binary(file_path, cones, car_start=(0.0, 0.0, 0.0), dtype=np.float64):
+    """Writes a track to file_path in the binary track format, see `encode_binary()`"""
+    if not file_path.endswith(EXTENSION):
+        file_path = file_path + EXTENSION
+    return atomic_write(file_path, encode_binary(cones, car_start, dtype))
+
+
+def load_binary(file_path):
+    """
+    Memory maps a track in the binary track format. Nothing is read until the arrays are used.
+
+    Returns:
+        A tuple (cones, car_start), see `decode_binary()`
+    """
+    if os.path.getsize(file_path) < HEADER.size:
+        raise ValueError(f"'{file_path}' is not an eufs binary track")
+    return decode_binary(np.memmap(file_path, dtype=np.uint8, mode="r"))
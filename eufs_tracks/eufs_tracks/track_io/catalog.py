@@ -0,0 +1,302 @@
+import os
+import json
+import fcntl
+import mmap
+import struct
+import numpy as np
+
+from .binary import encode_binary, decode_binary
+from .schema import CONE_TAGS
+
+
+# Catalog of many tracks packed into a single file (.trkc)
+#
+# All values are little-endian. The file starts with a fixed size header:
+#
+#   magic            8 bytes  b"EUFSCAT\0"
+#   version          uint16   FORMAT_VERSION
+#   reserved         6 bytes
+#   count            uint64   number of tracks
+#   index_offset     uint64   byte offset of the index
+#   metadata_offset  uint64   byte offset of the metadata
+#   metadata_size    uint64   size of the metadata in bytes
+#   reserved         16 bytes
+#
+# followed by the tracks, each one encoded in the binary track format (see
+# `eufs_tracks.track_io.binary`) and aligned to 16 bytes, so that their arrays can be viewed in
+# place. The index holds count entries of:
+#
+#   offset  uint64  byte offset of the track
+#   size    uint64  size of the track in bytes
+#
+# and the metadata is a utf-8 json list with a dict per track (name, length, cone counts,
+# fingerprint, seed, ...).
+#
+# Tracks are only ever appended. An append writes the new tracks, then a new index and metadata
+# after them, and only then points the header at them, so readers never see a half written
+# catalog, and memory maps of the file stay valid. The index and metadata left behind are dead
+# space, and once it is more than COMPACT_RATIO of the file the append copies the tracks to a
+# new file which replaces the catalog. Writers hold an exclusive lock on the file, readers
+# hold a shared one while reading the header and index.
+
+MAGIC = b"EUFSCAT\0"
+FORMAT_VERSION = 1
+EXTENSION = ".trkc"
+
+HEADER = struct.Struct("<8sH6xQQQQ16x")
+INDEX_ENTRY = struct.Struct("<QQ")
+ALIGNMENT = 16
+
+# Fraction of a catalog's file which may be dead space before an append compacts it
+COMPACT_RATIO = 0.5
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def track_length(cones):
+    """
+    Estimates the length of a track as the mean perimeter of its blue and yellow cones,
+    assuming they are ordered along the track as generated tracks are. Gaps of more than
+    4 times the median cone spacing (the ends of open tracks, cones out of order) are left
+    out. Returns 0 if it has no cones.
+    """
+    perimeters = []
+    for tag in ("blue", "yellow"):
+        data = cones.get(tag)
+        if data is None or len(data) < 2:
+            continue
+        points = np.asarray(data)[:, :2]
+        spacing = np.linalg.norm(points - np.roll(points, 1, axis=0), axis=1)
+        perimeters.append(spacing[spacing <= 4 * np.median(spacing)].sum())
+    return float(np.mean(perimeters)) if perimeters else 0.0
+
+
+def _write_index(f, offset, index, metadata):
+    """
+    Writes index and metadata at offset of the catalog open as file object f, then points its
+    header at them
+    """
+    index_data = b"".join(INDEX_ENTRY.pack(*entry) for entry in index)
+    metadata_data = json.dumps(metadata).encode()
+    f.seek(offset)
+    f.write(index_data)
+    f.write(metadata_data)
+    f.flush()
+    os.fsync(f.fileno())
+
+    # Only now that everything is on disk, make it visible
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index), offset,
+                        offset + len(index_data), len(metadata_data)))
+    f.flush()
+    os.fsync(f.fileno())
+    return offset + len(index_data) + len(metadata_data)
+
+
+def _rewrite(f, file_path, index, metadata):
+    """
+    Copies the tracks of the catalog open as file object f to a new file without dead space,
+    which replaces file_path. The caller holds the lock of f.
+    """
+    temp_path = file_path + ".compact"
+    with open(temp_path, "wb") as out:
+        offset = _align(HEADER.size)
+        compacted = []
+        for track_offset, size in index:
+            f.seek(track_offset)
+            out.seek(offset)
+            out.write(f.read(size))
+            compacted.append((offset, size))
+            offset = _align(offset + size)
+        _write_index(out, offset, compacted, metadata)
+    os.replace(temp_path, file_path)
+
+
+def _open_locked(file_path):
+    """
+    Opens the catalog at file_path (creating it if needed) with an exclusive lock. A catalog
+    compacted while waiting for the lock is the file that was replaced, so it is opened again.
+    """
+    while True:
+        fd = os.open(file_path, os.O_RDWR | os.O_CREAT, 0o644)
+        f = os.fdopen(fd, "r+b")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            if os.stat(file_path).st_ino == os.fstat(fd).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        f.close()
+
+
+def _read_index(f):
+    """Reads the header, index and metadata of the catalog open as file object f"""
+    header = f.read(HEADER.size)
+    if len(header) == 0:
+        return [], []
+    if len(header) < HEADER.size:
+        raise ValueError("not an eufs track catalog")
+    magic, version, count, index_offset, metadata_offset, metadata_size = HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("not an eufs track catalog")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported track catalog version {version}")
+
+    f.seek(index_offset)
+    index = list(INDEX_ENTRY.iter_unpack(f.read(count * INDEX_ENTRY.size)))
+    f.seek(metadata_offset)
+    metadata = json.loads(f.read(metadata_size).decode()) if metadata_size else []
+    return index, metadata
+
+
+class Catalog:
+    """
+    Read access to a track catalog. The file is memory mapped, so opening it only reads its
+    index, and any track can then be read in constant time. Tracks are returned as read-only
+    views into the file.
+
+        with Catalog("tracks.trkc") as catalog:
+            cones, car_start = catalog[42]
+            print(catalog.metadata[42]["length"])
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = None
+        self._map = None
+        self.refresh()
+
+    def refresh(self):
+        """Reopens the catalog to pick up tracks appended since it was opened"""
+        self.close()
+        self._file = open(self.file_path, "rb")
+        fcntl.flock(self._file, fcntl.LOCK_SH)
+        try:
+            self.index, self.metadata = _read_index(self._file)
+            size = os.fstat(self._file.fileno()).st_size
+        finally:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        if size:
+            self._map = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        self._names = None
+
+    def close(self):
+        # Views of the file handed out may still use the map, it is closed once they are gone
+        self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        """Returns the (cones, car_start) of the i-th track, see `decode_binary()`"""
+        offset, _ = self.index[i]
+        return decode_binary(self._map, offset)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def find(self, name):
+        """Returns the index of the first track called name, raises KeyError if there is none"""
+        if self._names is None:
+            self._names = {}
+            for i, metadata in enumerate(self.metadata):
+                self._names.setdefault(metadata.get("name"), i)
+        if name not in self._names:
+            raise KeyError(f"no track called '{name}' in {self.file_path}")
+        return self._names[name]
+
+    def entry(self, key):
+        """Returns the index of a track given by its index or name (str), e.g. from the cli"""
+        if isinstance(key, str):
+            try:
+                return self.find(key)
+            except KeyError:
+                if not key.lstrip("-").isdigit():
+                    raise
+                key = int(key)
+        return range(len(self))[key]
+
+    @staticmethod
+    def append(file_path, tracks, dtype=np.float64):
+        """
+        Appends tracks to a catalog, creating it if needed. The catalog is locked while tracks
+        is being iterated over, so pass tracks which are ready rather than a slow generator.
+
+        Each append writes the whole index and metadata again after the new tracks, so its cost
+        grows with the size of the catalog, and appending n tracks one at a time takes O(n^2):
+        append many tracks per call instead. The index and metadata an append replaces are dead
+        space, and an append leaving more than COMPACT_RATIO of the file dead also compacts the
+        catalog, copying all of its tracks (see `compact()`).
+
+        Args:
+            file_path (str): the path to the catalog
+            tracks (iterable): (cones, car_start, metadata) tuples. cones maps each cone class to
+                               an (n, 5) array, car_start is (x, y, yaw) and metadata is a dict
+                               of json types (e.g. name and seed). The length, cone counts
+                               and fingerprint (see `eufs_tracks.track_io.fingerprints`) are
+                               added to metadata unless it already has them.
+            dtype: np.float32 or np.float64, the precision to store the cones with
+
+        Returns:
+            The indices of the appended tracks
+        """
+        from .fingerprints import fingerprint
+
+        with _open_locked(file_path) as f:
+            try:
+                index, metadata = _read_index(f)
+                first = len(index)
+
+                # New tracks go after everything already in the file, so that nothing a
+                # reader may be looking at is overwritten
+                offset = _align(max(os.fstat(f.fileno()).st_size, HEADER.size))
+                for cones, car_start, track_metadata in tracks:
+                    data = encode_binary(cones, car_start, dtype)
+                    f.seek(offset)
+                    f.write(data)
+                    index.append((offset, len(data)))
+                    offset = _align(offset + len(data))
+
+                    track_metadata = dict(track_metadata)
+                    track_metadata.setdefault("length", track_length(cones))
+                    track_metadata.setdefault("cones", {
+                        tag: 0 if cones.get(tag) is None else len(cones[tag])
+                        for tag in CONE_TAGS
+                    })
+                    if "fingerprint" not in track_metadata:
+                        signature = fingerprint(cones)
+                        track_metadata["fingerprint"] = None if signature is None else [
+                            round(float(value), 6) for value in signature
+                        ]
+                    metadata.append(track_metadata)
+
+                size = _write_index(f, offset, index, metadata)
+                live = sum(_align(track_size) for _, track_size in index) + size - offset
+                if size - HEADER.size - live > COMPACT_RATIO * size:
+                    _rewrite(f, file_path, index, metadata)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return list(range(first, len(index)))
+
+    @staticmethod
+    def compact(file_path):
+        """
+        Rewrites a catalog without the dead space left by appends, copying all of its tracks.
+        Appends compact catalogs themselves once there is enough dead space to be worth it.
+        """
+        with _open_locked(file_path) as f:
+            try:
+                _rewrite(f, file_path, *_read_index(f))
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
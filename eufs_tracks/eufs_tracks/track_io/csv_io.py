@@ -0,0 +1,111 @@
+import re
+import numpy as np
+
+from .atomic import atomic_write
+from .schema import CONE_TAGS, CAR_START_TAG, CONE_COLUMNS, CSV_COLUMNS
+
+
+# Reader and writer of track csvs, without pandas.
+#
+# Each row of a track csv holds an object of the track (a cone, noise, the car's start, ...):
+#
+#   tag,x,y,direction,x_variance,y_variance,xy_covariance
+#
+# Columns are looked up by the header, so their order doesn't matter. Empty fields are read
+# as nan. The yaw of the car is stored in the direction column of the car_start row, the
+# direction of other objects is unused.
+
+_FIELD_SEPARATOR = re.compile(r",|\n")
+
+
+def decode_csv(data):
+    """
+    Parses the contents of a track csv into per-tag arrays. The whole file is split at once and
+    converted to floats in a single numpy call, rows are never looked at one by one.
+
+    Args:
+        data (str or bytes): the contents of the csv
+
+    Returns:
+        A tuple (cones, car_start). cones maps each tag found (other than car_start) to an
+        (n, 5) float64 array of x, y, x_variance, y_variance, xy_covariance. car_start is the
+        (x, y, yaw) tuple of the car's starting pose, (0, 0, 0) if the track has none.
+    """
+    if isinstance(data, bytes):
+        data = data.decode()
+    header, _, body = data.replace("\r", "").strip().partition("\n")
+
+    header = [column.strip() for column in header.split(",")]
+    missing = [column for column in CSV_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"track csv is missing the columns {missing}")
+
+    # Fields are kept as python strings, numpy converts them straight to floats
+    fields = np.array(_FIELD_SEPARATOR.split(body) if body else [], dtype=object)
+    if fields.size % len(header):
+        raise ValueError(f"track csv rows must all have {len(header)} fields")
+    fields = fields.reshape(-1, len(header))
+
+    tags = fields[:, header.index("tag")]
+    values = fields[:, [header.index(column) for column in CSV_COLUMNS[1:]]]
+    values[values == ""] = "nan"
+    values = values.astype(np.float64)
+
+    # Columns of values, as CSV_COLUMNS without the tag
+    cone_columns = [CSV_COLUMNS.index(column) - 1 for column in CONE_COLUMNS]
+    cones = {
+        str(tag): values[tags == tag][:, cone_columns]
+        for tag in np.unique(tags) if tag != CAR_START_TAG
+    }
+
+    car_start = (0.0, 0.0, 0.0)
+    car_rows = values[tags == CAR_START_TAG]
+    if len(car_rows):
+        # The last car start wins, and its yaw is stored in the direction column
+        x, y, yaw = car_rows[-1, :3]
+        car_start = (float(x), float(y), float(yaw))
+    return cones, car_start
+
+
+def encode_csv(cones, car_start=(0.0, 0.0, 0.0)):
+    """
+    Formats a track as a csv
+
+    Args:
+        cones (dict): maps a tag (e.g. "blue") to an (n, 5) array of x, y, x_variance,
+                      y_variance, xy_covariance. None entries are skipped. Cone classes are
+                      written in the order of CONE_TAGS, followed by any other tag.
+        car_start (tuple): x, y, yaw of the car's starting pose
+
+    Returns:
+        The contents of the csv (str)
+    """
+    tags = [tag for tag in CONE_TAGS if tag in cones]
+    tags += [tag for tag in cones if tag not in CONE_TAGS]
+
+    lines = [",".join(CSV_COLUMNS)]
+    for tag in tags:
+        if cones[tag] is None:
+            continue
+        data = np.asarray(cones[tag], dtype=np.float64).reshape(-1, len(CONE_COLUMNS))
+        lines.extend(
+            f"{tag},{x!r},{y!r},0,{x_var!r},{y_var!r},{xy_cov!r}"
+            for x, y, x_var, y_var, xy_cov in data.tolist()
+        )
+
+    x, y, yaw = (float(value) for value in car_start)
+    lines.append(f"{CAR_START_TAG},{x!r},{y!r},{yaw!r},0.0,0.0,0.0")
+    return "\n".join(lines) + "\n"
+
+
+def load_csv(file_path):
+    """Reads a track csv with a single buffered read, see `decode_csv()`"""
+    with open(file_path, "rb") as f:
+        return decode_csv(f.read())
+
+
+def write_csv(file_path, cones, car_start=(0.0, 0.0, 0.0)):
+    """Writes a track to file_path as a csv, see `encode_csv()`"""
+    if not file_path.endswith(".csv"):
+        file_path = file_path + ".csv"
+    return atomic_write(file_path, encode_csv(cones, car_start))
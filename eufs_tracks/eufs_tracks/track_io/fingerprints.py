@@ -0,0 +1,168 @@
+import numpy as np
+
+from .spatial import ConeGrid
+
+
+# Points the midline of a track is resampled to, and number of coefficients kept
+SAMPLES = 128
+SIZE = 16
+
+# Fingerprints closer than this are considered the same layout
+DEFAULT_THRESHOLD = 0.03
+
+
+def midline(cones):
+    """
+    Midline of a track, as the midpoints of each blue cone and its nearest yellow cone, in the
+    order of the blue cones (generated tracks are ordered along the track). Falls back to the
+    cones of whichever of blue and yellow the track has. Returns an (n, 2) array.
+    """
+    blue, yellow = (cones.get(tag) for tag in ("blue", "yellow"))
+    if blue is None or len(blue) == 0:
+        blue, yellow = yellow, None
+    if blue is None or len(blue) == 0:
+        return np.empty((0, 2))
+    blue = np.asarray(blue, dtype=np.float64)[:, :2]
+    if yellow is None or len(yellow) == 0:
+        return blue
+
+    grid = ConeGrid({"yellow": yellow})
+    nearest, _ = grid.nearest(blue, 1)
+    return (blue + grid.xy[nearest[:, 0]]) / 2
+
+
+def fingerprint(cones, samples=SAMPLES, size=SIZE):
+    """
+    Curvature signature of a track's layout, for finding near-duplicate tracks.
+
+    The midline (see `midline()`) is resampled to points equally spaced along it, and the
+    signature is the magnitude of the low frequencies of the turning angle at each point,
+    divided by their frequency (the spectrum of the heading, which is less sensitive to cone
+    placement noise). Turning angles don't change when a track is moved, rotated or scaled,
+    and the magnitude of their spectrum doesn't change when the track starts elsewhere on the
+    loop, is driven the other way around or is mirrored, so all of those give the same
+    fingerprint.
+
+    Args:
+        cones (dict): maps each cone class to an (n, 5) array
+        samples (int): number of points the midline is resampled to
+        size (int): number of frequencies kept
+
+    Returns:
+        A float32 array of the given size, or None if the track has less than 3 cones to go by
+    """
+    points = midline(cones)
+    if len(points) < 3:
+        return None
+
+    # Resample the closed loop at equal arc lengths
+    loop = np.vstack((points, points[:1]))
+    arc = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(loop, axis=0).T))))
+    at = np.linspace(0.0, arc[-1], samples, endpoint=False)
+    x, y = np.interp(at, arc, loop[:, 0]), np.interp(at, arc, loop[:, 1])
+
+    heading = np.arctan2(np.roll(y, -1) - y, np.roll(x, -1) - x)
+    turning = np.angle(np.exp(1j * (heading - np.roll(heading, 1))))
+    spectrum = np.abs(np.fft.rfft(turning))[1:size + 1] / (2 * np.pi)
+    spectrum /= np.arange(1, len(spectrum) + 1)
+    return np.pad(spectrum, (0, size - len(spectrum))).astype(np.float32)
+
+
+class FingerprintIndex:
+    """
+    Locality sensitive hash index of track fingerprints, to find near-duplicates without
+    comparing a track with every other one.
+
+    Each fingerprint is hashed into a bucket of each of several tables by projecting it on
+    random directions and quantizing the projections (p-stable LSH). Fingerprints closer than
+    the threshold share a bucket in at least one table with high probability, so only the
+    fingerprints of the buckets of a query are compared with it.
+
+        index = FingerprintIndex()
+        for name, cones in tracks:
+            duplicate = index.add(fingerprint(cones), name)
+            if duplicate is not None:
+                print(f"{name} is a near-duplicate of {duplicate}")
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, tables=8, hashes=4, size=SIZE, seed=0):
+        """
+        threshold: Fingerprints closer than this are near-duplicates
+        tables:    Number of hash tables, more find more near-duplicates but cost more
+        hashes:    Number of projections per table, more make buckets smaller
+        size:      Size of the fingerprints
+        seed:      Seed of the random projections, indices with the same seed hash alike
+        """
+        rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        self.width = 4 * threshold
+        self.projections = rng.normal(size=(tables, hashes, size))
+        self.offsets = rng.uniform(0.0, self.width, size=(tables, hashes))
+        self.buckets = [{} for _ in range(tables)]
+        # Grown by doubling, only the first len(keys) rows are used
+        self.fingerprints = np.empty((16, size), dtype=np.float32)
+        self.keys = []
+
+    @classmethod
+    def from_catalog(cls, catalog, **kwargs):
+        """
+        Indexes the tracks of a `Catalog`, keyed by their name (or their index in the catalog
+        if they have none). Fingerprints are read from the metadata, and only computed for
+        tracks appended without one.
+        """
+        index = cls(**kwargs)
+        for i, metadata in enumerate(catalog.metadata):
+            signature = metadata.get("fingerprint")
+            if "fingerprint" not in metadata:
+                signature = fingerprint(catalog[i][0])
+            if signature is not None:
+                index.add(signature, metadata.get("name", i), dedupe=False)
+        return index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _hashes(self, fingerprint):
+        keys = np.floor((self.projections @ fingerprint + self.offsets) / self.width)
+        return [row.astype(np.int64).tobytes() for row in keys]
+
+    def query(self, fingerprint):
+        """
+        Finds the near-duplicates of a fingerprint.
+
+        Returns a list of (key, distance) of the fingerprints closer than the threshold,
+        nearest first.
+        """
+        fingerprint = np.asarray(fingerprint, dtype=np.float32)
+        candidates = set()
+        for table, bucket in zip(self.buckets, self._hashes(fingerprint)):
+            candidates.update(table.get(bucket, ()))
+        if not candidates:
+            return []
+
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        distances = np.linalg.norm(self.fingerprints[candidates] - fingerprint, axis=1)
+        found = np.argsort(distances)
+        found = found[distances[found] < self.threshold]
+        return [(self.keys[candidates[i]], float(distances[i])) for i in found]
+
+    def add(self, fingerprint, key, dedupe=True):
+        """
+        Adds a fingerprint to the index under key (e.g. the name of its track).
+
+        If dedupe is set and the index already has a near-duplicate of it, the fingerprint
+        isn't added and the key of its nearest duplicate is returned, otherwise returns None.
+        """
+        fingerprint = np.asarray(fingerprint, dtype=np.float32)
+        if dedupe:
+            duplicates = self.query(fingerprint)
+            if duplicates:
+                return duplicates[0][0]
+
+        for table, bucket in zip(self.buckets, self._hashes(fingerprint)):
+            table.setdefault(bucket, []).append(len(self.keys))
+        if len(self.keys) == len(self.fingerprints):
+            self.fingerprints = np.concatenate((self.fingerprints, self.fingerprints))
+        self.fingerprints[len(self.keys)] = fingerprint
+        self.keys.append(key)
+        return None
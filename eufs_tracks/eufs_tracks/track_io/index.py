@@ -0,0 +1,229 @@
+import os
+import json
+import hashlib
+
+from ament_index_python.packages import get_package_share_directory
+
+from .atomic import atomic_write
+from .schema import CONE_TAGS, BINARY_EXTENSION
+
+
+# Folder of the eufs_tracks share directory and extension of each track format
+FORMATS = {
+    "launch": ("launch", ".launch"),
+    "csv": ("csv", ".csv"),
+    "binary": ("binary", BINARY_EXTENSION),
+}
+
+# Bump this whenever the entries change so that old indices are rebuilt
+INDEX_VERSION = 2
+
+
+def default_cache_dir():
+    """Where eufs_tracks caches things: $XDG_CACHE_HOME/eufs_tracks (~/.cache by default)"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "eufs_tracks")
+
+
+def default_cache_path():
+    """Where the index is kept: index.json in `default_cache_dir()`"""
+    return os.path.join(default_cache_dir(), "index.json")
+
+
+def _stat(file_path):
+    """What an index entry is validated against, None if the file doesn't exist"""
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def describe_track(cones, car_start):
+    """
+    Summarises a track
+
+    Args:
+        cones (dict): maps each cone class to an (n, 5) array
+        car_start (tuple): x, y, yaw of the car's starting pose
+
+    Returns:
+        A dict of json types with the number of cones of each class, the estimated length of the
+        track, the car's start and the bounding box (x_min, y_min, x_max, y_max) of its cones
+    """
+    import numpy as np
+    from .catalog import track_length
+
+    points = [np.asarray(cones[tag])[:, :2] for tag in CONE_TAGS if cones.get(tag) is not None]
+    points = np.concatenate(points) if points else np.empty((0, 2))
+    bbox = None
+    if len(points):
+        bbox = [float(value) for value in (*points.min(axis=0), *points.max(axis=0))]
+    return {
+        "cones": {
+            tag: 0 if cones.get(tag) is None else int(len(cones[tag])) for tag in CONE_TAGS
+        },
+        "length": track_length(cones),
+        "car_start": [float(value) for value in car_start],
+        "bbox": bbox,
+    }
+
+
+class TrackIndex:
+    """
+    Index of the tracks of the eufs_tracks share directory, kept on disk between runs.
+
+    Each track is summarised (see `describe_track()`) and hashed once, and only summarised again
+    when the size or modification time of one of the files it was read from changes. Refreshing
+    an up to date index only lists the track folders and stats their files.
+
+        index = TrackIndex().refresh()
+        for track in index.tracks("launch"):
+            print(track["name"], track["length"])
+    """
+
+    def __init__(self, share_dir=None, cache_path=None):
+        """
+        share_dir:  The directory holding the track folders (default: eufs_tracks share directory)
+        cache_path: Where to keep the index (default: see `default_cache_path()`)
+        """
+        if share_dir is None:
+            share_dir = get_package_share_directory("eufs_tracks")
+        self.share_dir = os.path.abspath(share_dir)
+        self.cache_path = cache_path or default_cache_path()
+        self.entries = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cache.get("version") == INDEX_VERSION:
+            self.entries = cache.get("shares", {}).get(self.share_dir, {})
+
+    def _save(self):
+        # Other share directories may be indexed in the same file, keep them
+        cache = {}
+        try:
+            with open(self.cache_path, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            pass
+        if cache.get("version") != INDEX_VERSION:
+            cache = {"version": INDEX_VERSION, "shares": {}}
+        cache["shares"][self.share_dir] = self.entries
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        atomic_write(self.cache_path, json.dumps(cache, sort_keys=True))
+
+    def sources(self, fmt, file_path):
+        """The files a track of format fmt stored at file_path is read from"""
+        if fmt == "launch":
+            name = os.path.basename(file_path)[:-len(FORMATS[fmt][1])]
+            return [file_path, os.path.join(self.share_dir, "models", name, "model.sdf")]
+        return [file_path]
+
+    def content_hash(self, fmt, file_path):
+        """sha256 of the files a track is read from, missing ones included as such"""
+        sha = hashlib.sha256()
+        for source in self.sources(fmt, file_path):
+            try:
+                with open(source, "rb") as f:
+                    sha.update(f.read())
+            except FileNotFoundError:
+                sha.update(b"missing")
+            sha.update(b"\0")
+        return sha.hexdigest()
+
+    def list_files(self, fmt):
+        """Lists the track files of format fmt, without the blacklisted ones"""
+        folder, extension = FORMATS[fmt]
+        folder = os.path.join(self.share_dir, folder)
+        if not os.path.isdir(folder):
+            return []
+
+        blacklist = set()
+        blacklist_filepath = os.path.join(folder, "blacklist.txt")
+        if os.path.isfile(blacklist_filepath):
+            with open(blacklist_filepath, "r") as f:
+                blacklist = {line.strip() for line in f}
+
+        with os.scandir(folder) as files:
+            return sorted(
+                entry.path for entry in files
+                if entry.name.endswith(extension) and entry.name not in blacklist
+                and entry.is_file()
+            )
+
+    def read(self, fmt, file_path):
+        """Reads the cones and car start of a track"""
+        # The readers (and numpy) are only imported once a track is read, refreshing an up to
+        # date index doesn't need them
+        from .binary import load_binary
+        from .csv_io import load_csv
+        from .sdf import parse_model_sdf, parse_launch_car_start
+
+        if fmt == "launch":
+            model_path = self.sources(fmt, file_path)[1]
+            with open(model_path, "rb") as f:
+                cones = parse_model_sdf(f.read())
+            with open(file_path, "r") as f:
+                car_start = parse_launch_car_start(f.read())
+            return cones, car_start
+        if fmt == "binary":
+            return load_binary(file_path)
+        return load_csv(file_path)
+
+    def refresh(self):
+        """
+        Brings the index up to date with the share directory, summarising new or changed tracks
+        and forgetting deleted ones. The index is saved if anything changed.
+
+        Returns the index itself.
+        """
+        entries = {}
+        changed = False
+        for fmt in FORMATS:
+            for file_path in self.list_files(fmt):
+                sources = self.sources(fmt, file_path)
+                stats = [_stat(source) for source in sources]
+                entry = self.entries.get(file_path)
+                if entry is None or entry["stats"] != stats:
+                    entry = {
+                        "name": os.path.basename(file_path)[:-len(FORMATS[fmt][1])],
+                        "format": fmt,
+                        "path": file_path,
+                        "stats": stats,
+                        "hash": self.content_hash(fmt, file_path),
+                    }
+                    try:
+                        entry.update(describe_track(*self.read(fmt, file_path)))
+                    except Exception as exc:
+                        entry["error"] = f"{type(exc).__name__}: {exc}"
+                    changed = True
+                entries[file_path] = entry
+
+        if changed or entries.keys() != self.entries.keys():
+            self.entries = entries
+            try:
+                self._save()
+            except OSError as exc:
+                print(f"Could not save the track index to '{self.cache_path}': {exc}")
+        return self
+
+    def tracks(self, fmt=None):
+        """Returns the entries of the tracks of format fmt (default: all), sorted by name"""
+        return sorted(
+            (entry for entry in self.entries.values() if fmt is None or entry["format"] == fmt),
+            key=lambda entry: (entry["name"], entry["format"])
+        )
+
+    def names(self, fmt):
+        """Returns the names of the tracks of format fmt"""
+        return [entry["name"] for entry in self.tracks(fmt)]
+
+    def find(self, name, fmt=None):
+        """Returns the entries of the tracks called name, in any format unless fmt is given"""
+        return [entry for entry in self.tracks(fmt) if entry["name"] == name]
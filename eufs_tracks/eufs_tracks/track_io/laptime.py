@@ -0,0 +1,220 @@
+import os
+import numpy as np
+import yaml
+
+from ament_index_python.packages import get_package_share_directory
+
+from .fingerprints import midline
+
+
+# Points each track is resampled to, equally spaced along it
+SAMPLES = 512
+
+# Width of the smoothing of curvature recovered from cones, as a fraction of the median
+# spacing of the midline. Cones are paired up unevenly along corners, so the midline is
+# jagged; this much smoothing matches the lap times estimated from the generator's paths.
+SMOOTHING = 1 / 3
+
+DEFAULT_ROBOT = "eufs"
+DEFAULT_CONDITION = "Dry"
+
+
+def load_vehicle(robot=DEFAULT_ROBOT, condition=DEFAULT_CONDITION, path=None):
+    """
+    Reads the parameters the lap time estimator needs from a vehicle model config, as used by
+    eufs_models (eufs_racecar/robots/<robot>/config<condition>.yaml).
+
+    Args:
+        robot (str): name of the robot in eufs_racecar/robots
+        condition (str): "Dry" or "Wet"
+        path (str): path of the config, instead of looking it up in eufs_racecar
+
+    Returns:
+        A dict of the mass m, gravity g, peak tyre friction mu (the magic formula's D scaled by
+        the tire coefficient), downforce and drag coefficients c_down and c_drag,
+        acceleration and braking limits acc_max and brake_max, and the top speed v_max
+    """
+    if path is None:
+        path = os.path.join(get_package_share_directory("eufs_racecar"), "robots", robot,
+                            f"config{condition}.yaml")
+    with open(path, "r") as f:
+        config = yaml.safe_load(f)
+
+    inertia, tire, aero = config["inertia"], config["tire"], config["aero"]
+    ranges = config["input_ranges"]
+    return {
+        "m": float(inertia["m"]),
+        "g": float(inertia["g"]),
+        "mu": abs(float(tire["D"])) * float(tire.get("tire_coefficient", 1.0)),
+        "c_down": float(aero["C_Down"]),
+        "c_drag": float(aero["C_drag"]),
+        "acc_max": float(ranges["acceleration"]["max"]),
+        "brake_max": abs(float(ranges["acceleration"]["min"])),
+        "v_max": float(ranges["velocity"]["max"]),
+    }
+
+
+def _resample(points, samples):
+    """Resamples a closed loop of (n, 2) points to equally spaced ones, and its length"""
+    loop = np.vstack((points, points[:1]))
+    arc = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(loop, axis=0).T))))
+    at = np.linspace(0.0, arc[-1], samples, endpoint=False)
+    return np.column_stack((np.interp(at, arc, loop[:, 0]), np.interp(at, arc, loop[:, 1]))), \
+        arc[-1]
+
+
+class LapTimeEstimator:
+    """
+    Estimates the time of a flying lap of a track without simulating it, to rank tracks by
+    difficulty or search for tracks of a given pace.
+
+    The car is a point mass whose tyres grip up to mu times its weight plus downforce, shared
+    between cornering and accelerating (a friction circle), with the acceleration, braking and
+    speed limits and the drag of its vehicle model config. Each track is a curvature profile
+    sampled at equally spaced points along its centre line. The speed at each point is the
+    lowest of the cornering limit, a forward pass accelerating out of corners and a backward
+    pass braking into them, starting from the slowest corner where the speed is known. The
+    passes run over many tracks at once, vectorized across tracks.
+
+        estimator = LapTimeEstimator(load_vehicle("eufs", "Dry"))
+        times = estimator.estimate_many(cones for cones, _ in tracks)
+    """
+
+    def __init__(self, vehicle=None, samples=SAMPLES):
+        """
+        vehicle: Parameters as returned by `load_vehicle()` (default: the eufs car, dry)
+        samples: Number of points each track is resampled to
+        """
+        self.vehicle = vehicle or load_vehicle()
+        self.samples = samples
+
+    def profile_from_cones(self, cones):
+        """
+        Curvature profile of a track from the midline of its cones (see
+        `eufs_tracks.track_io.fingerprints.midline()`), smoothed by a Gaussian a `SMOOTHING`
+        fraction of the spacing of the midline wide.
+
+        Returns:
+            length, curvature: the length of the track and the curvature at each sample, or
+            None if the track has less than 3 cones to go by
+        """
+        points = midline(cones)
+        if len(points) < 3:
+            return None
+        width = SMOOTHING * np.median(np.hypot(*np.diff(points, axis=0).T))
+        points, length = _resample(points, self.samples)
+
+        step = length / self.samples
+        heading = np.arctan2(*(np.roll(points, -1, axis=0) - points).T[::-1])
+        curvature = np.angle(np.exp(1j * (heading - np.roll(heading, 1)))) / step
+
+        # Gaussian smoothing over the loop through the FFT
+        frequency = np.fft.rfftfreq(self.samples, d=step)
+        kernel = np.exp(-2 * (np.pi * frequency * width) ** 2)
+        curvature = np.fft.irfft(np.fft.rfft(curvature) * kernel, n=self.samples)
+        return length, curvature
+
+    def profile_from_path(self, positions, corner_radii):
+        """
+        Curvature profile of a `TrackGenerator` path, from its points (complex) and corner
+        radii, as returned by `TrackGenerator.generate_path()`.
+
+        Returns:
+            length, curvature: as for `profile_from_cones()`
+        """
+        positions = np.asarray(positions)
+        points = np.column_stack((positions.real, positions.imag))
+        loop = np.vstack((points, points[:1]))
+        arc = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(loop, axis=0).T))))
+        at = np.linspace(0.0, arc[-1], self.samples, endpoint=False)
+        curvature = 1 / np.asarray(corner_radii, dtype=np.float64)
+        return arc[-1], np.interp(at, arc, np.append(curvature, curvature[0]))
+
+    def lap_times(self, lengths, curvatures):
+        """
+        Runs the speed profile of many tracks at once.
+
+        Args:
+            lengths (np.array): (t,) length of each track
+            curvatures (np.array): (t, samples) curvature along each track
+
+        Returns:
+            times, speeds: the (t,) lap time of each track in seconds and the (t, samples)
+            speed along it in metres per second
+        """
+        lengths = np.asarray(lengths, dtype=np.float64)
+        curvatures = np.abs(np.asarray(curvatures, dtype=np.float64)).reshape(len(lengths), -1)
+        v = self.vehicle
+        m, g, mu = v["m"], v["g"], v["mu"]
+        step = lengths / curvatures.shape[1]
+
+        # Cornering limit: m v^2 k = mu (m g + c_down v^2)
+        denominator = m * curvatures - mu * v["c_down"]
+        limit = np.full(curvatures.shape, v["v_max"])
+        grip = denominator > 0
+        limit[grip] = np.minimum(limit[grip], np.sqrt(mu * m * g / denominator[grip]))
+
+        # Start both passes at the slowest point of each track, whose speed is its limit
+        start = np.argmin(limit, axis=1)
+        order = (start[:, None] + np.arange(curvatures.shape[1])[None, :]) % curvatures.shape[1]
+        limit = np.take_along_axis(limit, order, axis=1)
+        curvatures = np.take_along_axis(curvatures, order, axis=1)
+
+        def longitudinal(speed, curvature):
+            """Grip left for accelerating or braking after cornering, as an acceleration"""
+            total = mu * (g + v["c_down"] * speed ** 2 / m)
+            return np.sqrt(np.maximum(total ** 2 - (speed ** 2 * curvature) ** 2, 0.0))
+
+        forward = limit.copy()
+        for i in range(1, curvatures.shape[1]):
+            speed = forward[:, i - 1]
+            drag = v["c_drag"] * speed ** 2 / m
+            acceleration = np.minimum(v["acc_max"], longitudinal(speed, curvatures[:, i - 1]))
+            reachable = speed ** 2 + 2 * np.maximum(acceleration - drag, 0.0) * step
+            forward[:, i] = np.minimum(forward[:, i], np.sqrt(reachable))
+
+        speeds = forward
+        after = speeds[:, 0]
+        for i in range(curvatures.shape[1] - 1, -1, -1):
+            drag = v["c_drag"] * after ** 2 / m
+            braking = np.minimum(v["brake_max"], longitudinal(after, curvatures[:, i])) + drag
+            speeds[:, i] = np.minimum(speeds[:, i], np.sqrt(after ** 2 + 2 * braking * step))
+            after = speeds[:, i]
+
+        # Time of each step at its average speed, back into the order of the track
+        average = (speeds + np.roll(speeds, -1, axis=1)) / 2
+        times = (step[:, None] / np.maximum(average, 1e-6)).sum(axis=1)
+        unroll = np.argsort(order, axis=1)
+        return times, np.take_along_axis(speeds, unroll, axis=1)
+
+    def estimate_many(self, tracks):
+        """
+        Estimates the lap times of many tracks, given the cones of each (see
+        `profile_from_cones()`). Tracks with too few cones get nan.
+        """
+        profiles = [self.profile_from_cones(cones) for cones in tracks]
+        found = [i for i, profile in enumerate(profiles) if profile is not None]
+        times = np.full(len(profiles), np.nan)
+        if found:
+            lengths, curvatures = zip(*(profiles[i] for i in found))
+            times[found] = self.lap_times(np.array(lengths), np.stack(curvatures))[0]
+        return times
+
+    def estimate(self, cones):
+        """Estimated lap time of a track in seconds, nan if it has too few cones"""
+        return float(self.estimate_many([cones])[0])
+
+    def estimate_paths(self, paths):
+        """
+        Estimates the lap times of many `TrackGenerator` paths, given the (positions, normals,
+        corner_radii) of each, as returned by `TrackGenerator.generate_path()`
+        """
+        profiles = [self.profile_from_path(path[0], path[2]) for path in paths]
+        if not profiles:
+            return np.empty(0)
+        lengths, curvatures = zip(*profiles)
+        return self.lap_times(np.array(lengths), np.stack(curvatures))[0]
+
+    def estimate_path(self, positions, corner_radii):
+        """Estimated lap time of a `TrackGenerator` path in seconds"""
+        return float(self.estimate_paths([(positions, None, corner_radii)])[0])
@@ -0,0 +1,18 @@
+# Cone classes a track can contain, in the order they are written out
+CONE_TAGS = ("blue", "yellow", "orange", "big_orange")
+
+# Tag of the row holding the car's starting pose in track csv files
+CAR_START_TAG = "car_start"
+
+# Tag of cones whose class isn't known (e.g. maps with colour noise), as in eufs_msgs
+UNKNOWN_COLOR_TAG = "unknown_color"
+
+# Columns stored for each cone. Tracks are held as a dict mapping each cone class
+# to an (n, 5) array of these columns.
+CONE_COLUMNS = ("x", "y", "x_variance", "y_variance", "xy_covariance")
+
+# Columns of track csv files
+CSV_COLUMNS = ("tag", "x", "y", "direction", "x_variance", "y_variance", "xy_covariance")
+
+# Extension of tracks in the binary format of binary.py
+BINARY_EXTENSION = ".trk"
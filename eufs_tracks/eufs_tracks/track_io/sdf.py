@@ -0,0 +1,344 @@
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+
+from ament_index_python.packages import get_package_share_directory
+
+from .atomic import atomic_write
+from .schema import CONE_TAGS, CONE_COLUMNS
+
+
+# Templates loaded so far, keyed by the resource directory they were read from
+_TEMPLATES = {}
+
+# Name of the gazebo model of each cone class
+CONE_MODELS = {
+    "blue": "blue_cone",
+    "yellow": "yellow_cone",
+    "orange": "orange_cone",
+    "big_orange": "big_cone",
+}
+
+# Mesh of each cone class, used when cones are rendered as links of the track model
+CONE_MESHES = {
+    "blue": "file://cone_blue.dae",
+    "yellow": "file://cone_yellow.dae",
+    "orange": "file://cone.dae",
+    "big_orange": "file://cone_big.dae",
+}
+
+# Ways of rendering the cones of a model.sdf:
+#   include: one <include> of the cone's model per cone, Gazebo resolves each separately
+#   links:   a single flattened model with one <link> per cone
+SDF_MODES = ("include", "links")
+
+
+def load_templates(resource_dir=None):
+    """
+    Reads the launch, world and model templates used to render tracks. Templates are only read
+    once per process.
+
+    Args:
+        resource_dir (str): directory holding the templates
+                            (default: the resource directory of the eufs_tracks share directory)
+
+    Returns:
+        A dict with the "launch", "world", "config" and "sdf" templates. The "sdf" template is
+        split into its sections, see `render_model_sdf()`.
+    """
+    if resource_dir is None:
+        resource_dir = os.path.join(get_package_share_directory("eufs_tracks"), "resource")
+
+    if resource_dir not in _TEMPLATES:
+        def read(*path):
+            with open(os.path.join(resource_dir, *path), "r") as template:
+                return template.read()
+
+        _TEMPLATES[resource_dir] = {
+            "launch": read("randgen_launch_template"),
+            "world": read("randgen_world_template"),
+            "config": read("randgen_model_template", "model.config"),
+            "sdf": read("randgen_model_template", "model.sdf").split("$===$"),
+        }
+    return _TEMPLATES[resource_dir]
+
+
+def render_launch(name, car_start, templates=None):
+    """Renders the .launch of track name, with the car starting at car_start (x, y, yaw)"""
+    templates = templates or load_templates()
+
+    # .launches need to point to .worlds and model files of the same name,
+    # so here we are pasting in copies of the relevant filename.
+    launch_merged = templates["launch"].replace("%FILLNAME%", name)
+
+    # Fill in the car's position
+    launch_merged = launch_merged.replace('%PLACEX%', str(car_start[0]))
+    launch_merged = launch_merged.replace('%PLACEY%', str(car_start[1]))
+    return launch_merged.replace('%PLACEROTATION%', str(car_start[2]))
+
+
+def render_world(name, templates=None):
+    """Renders the .world of track name"""
+    templates = templates or load_templates()
+
+    # The world file needs to point to the correct model folder,
+    # which conveniently has the same name as the world file itself.
+    return templates["world"].replace("%FILLNAME%", name)
+
+
+def render_model_config(name, templates=None):
+    """Renders the model.config of track name"""
+    templates = templates or load_templates()
+
+    # Let the config file know the name of the track it represents
+    return templates["config"].replace("%FILLNAME%", name)
+
+
+def render_model_sdf(cones, name, templates=None, mode="include",
+                     collision_radius=None, collision_origin=(0.0, 0.0),
+                     collision_tags=CONE_TAGS, noise_objects=()):
+    """
+    Renders the model.sdf of track name
+
+    Args:
+        cones (dict): maps each cone class to an (n, 5) array (see `eufs_tracks.track_io.schema`)
+        name (str): the name of the track
+        templates (dict): templates as returned by `load_templates()` (default: installed ones)
+        mode (str): one of `SDF_MODES`. "include" places one <include> of the cone's model per
+                    cone, "links" renders a single model with one <link> per cone, which Gazebo
+                    loads much faster as no cone model has to be resolved.
+        collision_radius (float): "links" mode only, cones further than this from
+                                  collision_origin get no collision (default: keep all)
+        collision_origin (tuple): x, y the collision radius is measured from
+        collision_tags (tuple): "links" mode only, the cone classes which keep their collisions,
+                                others are decorative
+        noise_objects (list): (uri, x, y, yaw) of each noise object, e.g. from
+                              `eufs_tracks.track_io.variants.scatter_noise()`. They are links of a
+                              nested "noise" model, so that they aren't taken for cones.
+
+    Returns:
+        The rendered sdf (str)
+    """
+    templates = templates or load_templates()
+    if mode not in SDF_MODES:
+        raise ValueError(f"unknown sdf mode '{mode}', must be one of {SDF_MODES}")
+    strip_collisions = collision_radius is not None or set(collision_tags) != set(CONE_TAGS)
+    if mode == "include" and strip_collisions:
+        raise ValueError("collisions can only be stripped in 'links' sdf mode")
+
+    # The template sections are:
+    #        0: Main body of sdf file
+    #        1: Outline of noise mesh visual data
+    #        2: Outline of noise mesh collision data
+    #        3: Noisecube collision data, meant for noise as
+    #            a low-complexity collision to prevent falling out the world
+    #        4: Outline of noise mesh visual data for innactive noise
+    #        5: Covariance data of a cone
+    #        6: Include of a cone model
+    #        7: Inertial data of a cone
+    #        8: Replaces the collision of links without one, so that they don't fall
+    #            through the ground
+    #        9: Nested model holding the noise objects
+    sections = templates["sdf"]
+
+    # Let the sdf file know which launch file it represents.
+    sdf_main = sections[0].replace("%FILLNAME%", name)
+    if mode == "include":
+        sdf_model_with_collisions = sections[6].replace("%FILLCOLLISION%", sections[2])
+        sdf_model_without_collisions = sdf_model_with_collisions
+    else:
+        sdf_model_with_collisions = sections[1].replace("%FILLCOLLISION%",
+                                                        sections[7] + sections[2])
+        sdf_model_without_collisions = sections[1].replace("%FILLCOLLISION%",
+                                                           sections[7] + sections[8])
+
+    # Let's place all the models!
+    # We'll keep track of how many we've placed
+    # so that we can give each a unique name.
+    link_num = 0
+    models = []
+    for tag in CONE_TAGS:
+        data = cones.get(tag)
+        if data is None:
+            continue
+
+        cone_type = CONE_MODELS[tag]
+        if mode == "include":
+            uri = "model://" + cone_type
+        else:
+            uri = CONE_MESHES[tag]
+        with_collision = sdf_model_with_collisions.replace("%MODELNAME%", uri)
+        without_collision = sdf_model_without_collisions.replace("%MODELNAME%", uri)
+
+        # Work out which cones keep their collision all at once
+        data = np.asarray(data).reshape(-1, len(CONE_COLUMNS))
+        collides = np.full(len(data), tag in collision_tags)
+        if collision_radius is not None:
+            distance = np.hypot(data[:, 0] - collision_origin[0],
+                                data[:, 1] - collision_origin[1])
+            collides &= distance <= collision_radius
+
+        for (x, y, x_cov, y_cov, xy_cov), collision in zip(data, collides):
+            covariance = sections[5].replace("%XCOV%", str(x_cov))
+            covariance = covariance.replace("%YCOV%", str(y_cov))
+            covariance = covariance.replace("%XYCOV%", str(xy_cov))
+
+            model = with_collision if collision else without_collision
+            model = model.replace("%PLACEY%", str(y))
+            model = model.replace("%PLACEX%", str(x))
+            model = model.replace("%PLACEYAW%", "0")
+            model = model.replace("%LINKNUM%", str(link_num))
+            model = model.replace("%LINKTYPE%", cone_type)
+            models.append("\n" + model.replace("%FILLCOVARIANCE%", covariance))
+            link_num += 1
+
+    # Noise objects get the low-complexity NoiseCube collision whatever their mesh
+    if len(noise_objects):
+        noise_model = sections[1].replace("%FILLCOLLISION%", sections[7] + sections[3])
+        noise_model = noise_model.replace("%FILLCOVARIANCE%", "")
+        noise = []
+        for noise_num, (uri, x, y, yaw) in enumerate(noise_objects):
+            model = noise_model.replace("%MODELNAME%", uri)
+            model = model.replace("%PLACEY%", str(y))
+            model = model.replace("%PLACEX%", str(x))
+            model = model.replace("%PLACEYAW%", str(yaw))
+            model = model.replace("%LINKNUM%", str(noise_num))
+            noise.append("\n" + model.replace("%LINKTYPE%", "noise"))
+        models.append("\n" + sections[9].replace("%FILLNOISE%", "".join(noise)))
+
+    # Splice the sdf file back together.
+    return sdf_main.replace("%FILLDATA%", "".join(models))
+
+
+def render_track(cones, car_start, name, templates=None, mode="include", collision_radius=None,
+                 collision_tags=CONE_TAGS, noise_objects=()):
+    """
+    Renders all the files of a launchable track, without touching the disk.
+
+    Args:
+        cones (dict): maps each cone class to an (n, 5) array (see `eufs_tracks.track_io.schema`)
+        car_start (tuple): x, y, yaw of the car's starting pose
+        name (str): the name of the track
+        templates (dict): templates as returned by `load_templates()` (default: installed ones)
+        mode, collision_radius, collision_tags: how cones are rendered, see
+            `render_model_sdf()`. The collision radius is measured from the car's start.
+        noise_objects (list): (uri, x, y, yaw) of each noise object, see `render_model_sdf()`
+
+    Returns:
+        A dict mapping the path of each file, relative to the eufs_tracks share directory,
+        to its contents (bytes). Use `write_artifacts()` to save them.
+    """
+    templates = templates or load_templates()
+    return {
+        os.path.join("launch", name + ".launch"):
+            render_launch(name, car_start, templates).encode(),
+        os.path.join("worlds", name + ".world"):
+            render_world(name, templates).encode(),
+        os.path.join("models", name, "model.config"):
+            render_model_config(name, templates).encode(),
+        os.path.join("models", name, "model.sdf"):
+            render_model_sdf(cones, name, templates, mode, collision_radius, car_start[:2],
+                             collision_tags, noise_objects).encode(),
+    }
+
+
+def write_artifacts(artifacts, root=None):
+    """
+    Writes rendered files to disk
+
+    Args:
+        artifacts (dict): maps paths relative to root to their contents, as
+                          returned by `render_track()`
+        root (str): the directory to write to (default: the eufs_tracks share directory)
+
+    Returns:
+        The list of paths written
+    """
+    if root is None:
+        root = get_package_share_directory("eufs_tracks")
+
+    written = []
+    for path, data in artifacts.items():
+        path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        written.append(atomic_write(path, data))
+    return written
+
+
+def parse_model_sdf(data):
+    """
+    Identifies the cones of a track model.sdf based on their name. Both the <include>s and
+    the <link>s of `render_model_sdf()` modes are understood, other links are ignored.
+
+    Args:
+        data (str or bytes): the contents of the sdf
+
+    Returns:
+        A dict mapping each cone class to an (n, 5) array of its cones
+    """
+    root = ET.fromstring(data)
+    found = {tag: [] for tag in CONE_TAGS}
+    tag_of_model = {model: tag for tag, model in CONE_MODELS.items()}
+
+    # iterate over all cones of the model
+    for child in root[0]:
+        if child.tag == "include":
+            name = child.find("name").text
+        elif child.tag == "link":
+            name = child.attrib.get("name", "")
+        else:
+            continue
+
+        mesh_str = "_".join(name.split("_")[:-1])
+        if child.tag == "link" and mesh_str not in tag_of_model:
+            continue
+
+        pose = [float(value) for value in child.find("pose").text.split()[0:2]]
+        cov_node = child.find("covariance")
+        if cov_node is None:
+            cov_info = [0.01, 0.01, 0.0]
+        else:
+            covariance_x = float(cov_node.attrib["x"])
+            covariance_y = float(cov_node.attrib["y"])
+            covariance_xy = float(cov_node.attrib["xy"])
+            cov_info = [covariance_x, covariance_y, covariance_xy]
+        # indentify cones by the name of their mesh
+        if mesh_str in tag_of_model:
+            found[tag_of_model[mesh_str]].append(pose + cov_info)
+        else:
+            print("[track_gen.py] No such object: " + mesh_str)
+
+    # convert all lists to numpy as arrays for efficiency
+    return {
+        tag: np.array(cones, dtype="float64").reshape(-1, len(CONE_COLUMNS))
+        for tag, cones in found.items()
+    }
+
+
+def parse_launch_car_start(data):
+    """Returns the car's starting pose (x, y, yaw) from the contents of a track .launch"""
+    if isinstance(data, bytes):
+        data = data.decode()
+    car_x = data.split("<arg name=\"x\" default=\"")[1].split("\"")[0]
+    car_y = data.split("<arg name=\"y\" default=\"")[1].split("\"")[0]
+    car_yaw = data.split("<arg name=\"yaw\" default=\"")[1].split("\"")[0]
+    return float(car_x), float(car_y), float(car_yaw)
+
+
+def parse_track(artifacts, name):
+    """
+    The inverse of `render_track()`, reads a track back from its rendered files.
+
+    Args:
+        artifacts (dict): maps paths relative to the share directory to their contents
+        name (str): the name of the track
+
+    Returns:
+        A tuple (cones, car_start)
+    """
+    cones = parse_model_sdf(artifacts[os.path.join("models", name, "model.sdf")])
+    launch_path = os.path.join("launch", name + ".launch")
+    car_start = (0.0, 0.0, 0.0)
+    if launch_path in artifacts:
+        car_start = parse_launch_car_start(artifacts[launch_path])
+    return cones, car_start
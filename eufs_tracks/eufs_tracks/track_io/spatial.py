@@ -0,0 +1,302 @@
+import numpy as np
+
+from .schema import CONE_TAGS
+
+
+# How many cell widths around a query the grid searches for nearest neighbours before
+# falling back to comparing the query with every cone
+MAX_NEAREST_WIDTHS = 2
+
+
+class ConeGrid:
+    """
+    Uniform grid over the cones of a track, for batched spatial queries.
+
+    The cones of every class are stacked into `xy` (an (m, 2) array) and sorted by grid cell,
+    so the cones of a cell are a contiguous slice. Queries take arrays of points or poses and
+    return indices into `xy`. `tags` holds the class of each cone as an index into `CONE_TAGS`
+    and `rows` its row in the array of its class, so results can be traced back to a track.
+
+        grid = ConeGrid(cones)
+        query, cone, distance = grid.radius(points, 10.0)
+        tags = np.array(CONE_TAGS)[grid.tags[cone]]
+    """
+
+    def __init__(self, cones, cell_size=None):
+        """
+        cones:     Dict mapping each cone class to an (n, 5) (or (n, 2)) array
+        cell_size: Width of the grid cells in metres (default: twice the spacing the cones
+                   would have if spread evenly over their bounding box)
+        """
+        xy, tags, rows = [], [], []
+        for i, tag in enumerate(CONE_TAGS):
+            data = cones.get(tag)
+            if data is None or len(data) == 0:
+                continue
+            xy.append(np.asarray(data, dtype=np.float64)[:, :2])
+            tags.append(np.full(len(data), i, dtype=np.int8))
+            rows.append(np.arange(len(data)))
+        xy = np.concatenate(xy) if xy else np.empty((0, 2))
+        tags = np.concatenate(tags) if tags else np.empty(0, dtype=np.int8)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+        self.origin = xy.min(axis=0) if len(xy) else np.zeros(2)
+        extent = xy.max(axis=0) - self.origin if len(xy) else np.zeros(2)
+        if cell_size is None:
+            cell_size = 2 * np.sqrt(max(extent[0], 1.0) * max(extent[1], 1.0) / max(len(xy), 1))
+        self.cell_size = float(cell_size)
+        self.shape = (extent // self.cell_size).astype(np.int64) + 1
+
+        cells = self._cell_ids(self._cells(xy))
+        order = np.argsort(cells, kind="stable")
+        self.xy = np.ascontiguousarray(xy[order])
+        self.tags = tags[order]
+        self.rows = rows[order]
+        self._x, self._y = self.xy[:, 0].copy(), self.xy[:, 1].copy()
+        # Cones of cell c are xy[starts[c]:starts[c + 1]]
+        per_cell = np.bincount(cells, minlength=self.shape.prod())
+        self.starts = np.concatenate(([0], np.cumsum(per_cell)))
+
+    def __len__(self):
+        return len(self.xy)
+
+    def _cells(self, points):
+        """Grid coordinates of the cells of points, which can be outside the grid"""
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def _cell_ids(self, cells):
+        return cells[:, 0] * self.shape[1] + cells[:, 1]
+
+    def _squared_distances(self, points, query, cone):
+        dx = self._x[cone] - points[:, 0][query]
+        dy = self._y[cone] - points[:, 1][query]
+        return dx * dx + dy * dy
+
+    def _candidates(self, points, reach):
+        """
+        Pairs (query, cone) of every cone in the cells overlapping the square of half width
+        reach around each point, so every cone within reach of a point is among them.
+        """
+        span = int(np.ceil(2 * reach / self.cell_size)) + 1
+        if span >= self.shape.max():
+            # Each square covers (most of) the grid, the cells aren't worth looking at
+            query = np.repeat(np.arange(len(points)), len(self.xy))
+            return query, np.tile(np.arange(len(self.xy)), len(points))
+
+        low = np.maximum(self._cells(points - reach), 0)
+        high = np.minimum(self._cells(points + reach), self.shape - 1)
+        offsets = np.arange(span)
+        columns = low[:, 0, None] + offsets[None, :]
+        rows = low[:, 1, None] + offsets[None, :]
+        # (q, span, span) cell ids, of which only those up to high belong to each square
+        inside = ((columns <= high[:, 0, None])[:, :, None]
+                  & (rows <= high[:, 1, None])[:, None, :])
+        cells = columns[:, :, None] * self.shape[1] + rows[:, None, :]
+        query = np.broadcast_to(np.arange(len(points))[:, None, None], cells.shape)[inside]
+        cells = cells[inside]
+        starts = self.starts[cells]
+        counts = self.starts[cells + 1] - starts
+
+        # Expand each cell into the indices of its cones
+        query = np.repeat(query, counts)
+        firsts = np.repeat(np.cumsum(counts) - counts, counts)
+        cone = np.repeat(starts, counts) + np.arange(len(query)) - firsts
+        return query, cone
+
+    def radius(self, points, radius):
+        """
+        Finds the cones within radius of each point.
+
+        Args:
+            points (np.array): (q, 2) array of query points
+            radius (float): search radius in metres
+
+        Returns:
+            query, cone, distance: arrays holding one element per cone found, the index of the
+            query point, the index of the cone in `xy` and their distance, sorted by query
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        query, cone = self._candidates(points, radius)
+        squared = self._squared_distances(points, query, cone)
+        found = squared <= radius * radius
+        return query[found], cone[found], np.sqrt(squared[found])
+
+    def nearest(self, points, k=1):
+        """
+        Finds the k nearest cones of each point.
+
+        Args:
+            points (np.array): (q, 2) array of query points
+            k (int): number of cones to find per point
+
+        Returns:
+            cone, distance: (q, k) arrays of the indices in `xy` and distances of the cones,
+            nearest first. When there are fewer than k cones, the rest is -1 and inf.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cone = np.full((len(points), k), -1, dtype=np.int64)
+        distance = np.full((len(points), k), np.inf)
+        remaining = np.arange(len(points))
+        k_found = min(k, len(self.xy))
+
+        for widths in range(1, MAX_NEAREST_WIDTHS + 2):
+            if not len(remaining):
+                break
+            if widths > MAX_NEAREST_WIDTHS:
+                # Compare what is left with every cone
+                query = np.repeat(np.arange(len(remaining)), len(self.xy))
+                candidate = np.tile(np.arange(len(self.xy)), len(remaining))
+                d = self._squared_distances(points[remaining], query, candidate)
+                reach = d.max(initial=0.0)
+            else:
+                reach = widths * self.cell_size
+                query, candidate = self._candidates(points[remaining], reach)
+                d = self._squared_distances(points[remaining], query, candidate)
+                # Only cones within reach are known to be the nearest ones
+                reach = reach ** 2
+                within = d <= reach
+                query, candidate, d = query[within], candidate[within], d[within]
+
+            # Sort by query then distance in one go: the distances are less than 1 once scaled
+            order = np.argsort(query + d / (2 * reach + 1e-12))
+            query, candidate, d = query[order], candidate[order], d[order]
+            rank = np.arange(len(query)) - np.searchsorted(query, query)
+            counts = np.bincount(query, minlength=len(remaining))
+            done = counts >= k_found
+
+            keep = (rank < k) & done[query]
+            cone[remaining[query[keep]], rank[keep]] = candidate[keep]
+            distance[remaining[query[keep]], rank[keep]] = np.sqrt(d[keep])
+            remaining = remaining[~done]
+        return cone, distance
+
+    def window(self, poses, ahead, half_width, behind=0.0):
+        """
+        Finds the cones in a rectangle aligned with each pose, as seen by a car or a sensor.
+
+        Args:
+            poses (np.array): (q, 3) array of x, y, yaw
+            ahead (float): how far the window reaches in front of each pose, in metres
+            half_width (float): how far the window reaches on each side of each pose
+            behind (float): how far the window reaches behind each pose
+
+        Returns:
+            query, cone, local: arrays holding one element per cone found, the index of the
+            pose, the index of the cone in `xy` and the (n, 2) position of the cone in the
+            frame of the pose (x forward, y left), sorted by query
+        """
+        poses = np.asarray(poses, dtype=np.float64).reshape(-1, 3)
+        # Search the circle around the window, then keep what is inside it
+        forward = (ahead - behind) / 2
+        cos, sin = np.cos(poses[:, 2]), np.sin(poses[:, 2])
+        centres = poses[:, :2] + forward * np.stack((cos, sin), axis=1)
+        query, cone, _ = self.radius(centres, np.hypot((ahead + behind) / 2, half_width))
+
+        offset = self.xy[cone] - poses[query, :2]
+        local = np.stack((
+            cos[query] * offset[:, 0] + sin[query] * offset[:, 1],
+            cos[query] * offset[:, 1] - sin[query] * offset[:, 0],
+        ), axis=1)
+        inside = ((local[:, 0] >= -behind) & (local[:, 0] <= ahead)
+                  & (np.abs(local[:, 1]) <= half_width))
+        return query[inside], cone[inside], local[inside]
+
+
+def track_segments(cones, max_gap=4.0):
+    """
+    The edges of a track as line segments, joining consecutive blue cones and consecutive
+    yellow cones into closed loops, assuming they are ordered along the track as generated
+    tracks are. Segments longer than max_gap times the median cone spacing (the ends of open
+    tracks, cones out of order) are left out, as in `track_length()`.
+
+    Returns:
+        An (s, 4) array of x0, y0, x1, y1
+    """
+    segments = []
+    for tag in ("blue", "yellow"):
+        data = cones.get(tag)
+        if data is None or len(data) < 2:
+            continue
+        points = np.asarray(data, dtype=np.float64)[:, :2]
+        ends = np.roll(points, -1, axis=0)
+        length = np.hypot(*(ends - points).T)
+        keep = length <= max_gap * np.median(length)
+        segments.append(np.column_stack((points, ends))[keep])
+    return np.concatenate(segments) if segments else np.empty((0, 4))
+
+
+class SegmentIndex:
+    """
+    Uniform grid over line segments (e.g. the edges of a track from `track_segments()`) for
+    batched distance queries up to a fixed reach. Each segment is listed in every cell within
+    reach of its bounding box, so the segments near a point are those of its cell.
+
+        index = SegmentIndex(track_segments(cones), reach=3.0)
+        clear = index.distance(points) >= 3.0
+    """
+
+    def __init__(self, segments, reach, cell_size=None):
+        """
+        segments:  (s, 4) array of x0, y0, x1, y1
+        reach:     Distance up to which queries are answered, in metres
+        cell_size: Width of the grid cells in metres (default: reach, at least 1)
+        """
+        self.segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+        self.reach = float(reach)
+        self.cell_size = float(cell_size or max(reach, 1.0))
+
+        low = np.minimum(self.segments[:, :2], self.segments[:, 2:]) - self.reach
+        high = np.maximum(self.segments[:, :2], self.segments[:, 2:]) + self.reach
+        self.origin = low.min(axis=0) if len(low) else np.zeros(2)
+        extent = high.max(axis=0) - self.origin if len(high) else np.zeros(2)
+        self.shape = (extent // self.cell_size).astype(np.int64) + 1
+
+        # Cells overlapped by the bounding box of each segment, grown by reach
+        first = self._cells(low)
+        size = self._cells(high) - first + 1
+        counts = size[:, 0] * size[:, 1]
+        segment = np.repeat(np.arange(len(self.segments)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = size[segment, 1]
+        cells = ((first[segment, 0] + local // rows) * self.shape[1]
+                 + first[segment, 1] + local % rows)
+
+        order = np.argsort(cells, kind="stable")
+        self.cell_segments = segment[order]
+        # Segments of cell c are cell_segments[starts[c]:starts[c + 1]]
+        per_cell = np.bincount(cells, minlength=self.shape.prod())
+        self.starts = np.concatenate(([0], np.cumsum(per_cell)))
+
+    def _cells(self, points):
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def distance(self, points):
+        """
+        Distance from each point to the nearest segment, for points within reach of one,
+        inf for the others. points is a (q, 2) array.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        distance = np.full(len(points), np.inf)
+        cells = self._cells(points)
+        inside = ((cells >= 0) & (cells < self.shape)).all(axis=1)
+        query = np.nonzero(inside)[0]
+        cells = cells[inside, 0] * self.shape[1] + cells[inside, 1]
+        starts = self.starts[cells]
+        counts = self.starts[cells + 1] - starts
+
+        # Expand each point into the segments of its cell
+        query = np.repeat(query, counts)
+        firsts = np.repeat(np.cumsum(counts) - counts, counts)
+        segment = self.cell_segments[np.repeat(starts, counts) + np.arange(len(query)) - firsts]
+
+        # Distance to the closest point of each segment
+        x0, y0, x1, y1 = self.segments[segment].T
+        dx, dy = x1 - x0, y1 - y0
+        px, py = points[query, 0] - x0, points[query, 1] - y0
+        length = dx * dx + dy * dy
+        t = np.clip(np.divide(px * dx + py * dy, length, out=np.zeros_like(length),
+                              where=length > 0), 0.0, 1.0)
+        d = np.hypot(px - t * dx, py - t * dy)
+        np.minimum.at(distance, query, d)
+        distance[distance > self.reach] = np.inf
+        return distance
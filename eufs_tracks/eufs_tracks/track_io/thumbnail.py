@@ -0,0 +1,153 @@
+import os
+import zlib
+import struct
+import hashlib
+
+from .atomic import atomic_write
+from .index import TrackIndex, default_cache_dir
+from .schema import CONE_TAGS
+
+
+# Bump this whenever thumbnails are drawn differently so that cached ones are redrawn
+THUMBNAIL_VERSION = 1
+DEFAULT_SIZE = 64
+
+# RGBA colour and radius (in pixels, at the default size) of each cone class
+CONE_STYLES = {
+    "blue": ((30, 90, 255, 255), 1),
+    "yellow": ((235, 190, 0, 255), 1),
+    "orange": ((255, 140, 0, 255), 1),
+    "big_orange": ((255, 80, 0, 255), 2),
+}
+CAR_STYLE = ((0, 170, 0, 255), 2)
+
+
+def _disc(radius):
+    """Pixel offsets (dy, dx) of a disc of the given radius"""
+    import numpy as np
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    inside = dy ** 2 + dx ** 2 <= radius ** 2 + radius
+    return dy[inside], dx[inside]
+
+
+def render_thumbnail(cones, car_start, size=DEFAULT_SIZE):
+    """
+    Draws a top down view of a track, without Qt or any other graphics library.
+
+    Args:
+        cones (dict): maps each cone class to an (n, 5) array
+        car_start (tuple): x, y, yaw of the car's starting pose
+        size (int): width and height of the thumbnail in pixels
+
+    Returns:
+        A (size, size, 4) RGBA uint8 array, transparent where there is nothing
+    """
+    # numpy is imported when a thumbnail is drawn rather than with the module, cached
+    # thumbnails are only looked up
+    import numpy as np
+
+    image = np.zeros((size, size, 4), dtype=np.uint8)
+    layers = [
+        (np.asarray(cones[tag])[:, :2], *CONE_STYLES[tag])
+        for tag in CONE_TAGS if cones.get(tag) is not None and len(cones[tag])
+    ]
+    layers.append((np.array([car_start[:2]], dtype=np.float64), *CAR_STYLE))
+
+    # Fit every point in the image, keeping the aspect ratio, y pointing up
+    points = np.concatenate([layer[0] for layer in layers])
+    points = points[np.isfinite(points).all(axis=1)]
+    low, high = points.min(axis=0), points.max(axis=0)
+    scale_radius = max(1, round(size / DEFAULT_SIZE))
+    margin = 2 * scale_radius + 1
+    scale = (size - 1 - 2 * margin) / max(float((high - low).max()), 1e-6)
+    center = (low + high) / 2
+
+    for data, colour, radius in layers:
+        data = data[np.isfinite(data).all(axis=1)]
+        column = np.rint((data[:, 0] - center[0]) * scale + (size - 1) / 2).astype(int)
+        row = np.rint((center[1] - data[:, 1]) * scale + (size - 1) / 2).astype(int)
+        dy, dx = _disc(radius * scale_radius)
+        rows = np.clip(row[:, None] + dy[None, :], 0, size - 1)
+        columns = np.clip(column[:, None] + dx[None, :], 0, size - 1)
+        image[rows, columns] = colour
+    return image
+
+
+def encode_png(image):
+    """Encodes an (h, w, 4) RGBA uint8 array as a png (bytes)"""
+    import numpy as np
+
+    height, width, _ = image.shape
+
+    def chunk(kind, data):
+        return (struct.pack(">I", len(data)) + kind + data
+                + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff))
+
+    # Every row starts with its filter type, 0 (none)
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape(height, width * 4)
+    return b"".join([
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)),
+        chunk(b"IDAT", zlib.compress(rows.tobytes(), 9)),
+        chunk(b"IEND", b""),
+    ])
+
+
+class ThumbnailCache:
+    """
+    Thumbnails of the tracks of a `TrackIndex`, kept on disk as pngs named after the hash of
+    the contents of the files each track is read from. A thumbnail is only drawn once for as
+    long as its track doesn't change, however many copies or renames of it there are.
+    """
+
+    def __init__(self, index=None, cache_dir=None, size=DEFAULT_SIZE):
+        """
+        index:     The TrackIndex of the tracks (default: that of the eufs_tracks share directory)
+        cache_dir: Where to keep the thumbnails (default: thumbnails in the eufs_tracks cache)
+        size:      Width and height of the thumbnails in pixels
+        """
+        self.index = index if index is not None else TrackIndex()
+        self.cache_dir = cache_dir or os.path.join(default_cache_dir(), "thumbnails")
+        self.size = size
+
+    def path(self, entry):
+        """
+        Where the thumbnail of a track, given by its index entry, is cached. Thumbnails are
+        keyed on the hash of the track's files kept in the entry, so finding a cached one
+        doesn't read the track.
+        """
+        content_hash = entry.get("hash") or self.index.content_hash(entry["format"], entry["path"])
+        sha = hashlib.sha256(f"{THUMBNAIL_VERSION}:{self.size}:{content_hash}".encode())
+        return os.path.join(self.cache_dir, sha.hexdigest() + ".png")
+
+    def get(self, entry):
+        """
+        Returns the path of the thumbnail of a track given by its index entry, drawing it if it
+        isn't cached yet, or None if the track can't be read.
+        """
+        try:
+            thumbnail_path = self.path(entry)
+            if not os.path.isfile(thumbnail_path):
+                cones, car_start = self.index.read(entry["format"], entry["path"])
+                os.makedirs(self.cache_dir, exist_ok=True)
+                atomic_write(thumbnail_path,
+                             encode_png(render_thumbnail(cones, car_start, self.size)))
+        except Exception as exc:
+            print(f"Could not draw a thumbnail of '{entry['path']}': {exc}")
+            return None
+        return thumbnail_path
+
+    def render_all(self, fmt=None, jobs=None):
+        """
+        Draws the thumbnails of every track of the index (of format fmt if given) that isn't
+        cached yet, across a pool of processes.
+
+        Returns a dict mapping the path of each track to its thumbnail (None if it failed).
+        """
+        from concurrent.futures import ProcessPoolExecutor
+
+        entries = self.index.refresh().tracks(fmt)
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            thumbnails = pool.map(self.get, entries)
+            return {entry["path"]: thumbnail for entry, thumbnail in zip(entries, thumbnails)}
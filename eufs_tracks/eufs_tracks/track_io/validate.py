@@ -0,0 +1,322 @@
+from collections import namedtuple
+import math
+import numpy as np
+
+from .schema import CONE_TAGS, CONE_COLUMNS
+from .spatial import ConeGrid, SegmentIndex
+
+
+# A rule broken by a track: how many cones break it, the worst value found and the limit.
+# worst is None where it isn't measured (further than the limit can be measured), limit is
+# None for rules without one.
+Violation = namedtuple("Violation", ["rule", "count", "worst", "limit"])
+
+# Rules checked by `TrackValidator`, in the order they are reported
+RULES = ("edges", "car_start", "cone_overlap", "min_cone_spacing", "max_cone_spacing",
+         "min_track_width", "max_track_width")
+
+# Edges are joined in the order cones are stored, leaving out links longer than this many
+# times the median cone spacing of the edge, as in `track_segments()`
+MAX_GAP = 4.0
+
+# Cones of a class closer than this are the same cone listed twice, as where hand-made tracks
+# close their loops, and are only counted once
+DUPLICATE_DISTANCE = 0.05
+
+# A cone of an edge closes the gap on the far side of its nearest neighbour if it is at least
+# this angle (in radians) away from the neighbour, seen from the cone in between. Less than a
+# right angle, so that the cones at sharp corners and hairpins aren't taken for gap ends.
+CLOSING_ANGLE = math.radians(60)
+
+BLUE, YELLOW = CONE_TAGS.index("blue"), CONE_TAGS.index("yellow")
+ORANGE = [CONE_TAGS.index("orange"), CONE_TAGS.index("big_orange")]
+
+
+def describe(violation):
+    """Formats a `Violation` for printing"""
+    if violation.limit is None:
+        return f"{violation.rule} ({violation.count})"
+    if violation.worst is None:
+        return f"{violation.rule}: {violation.count} (limit {violation.limit:.2f}m)"
+    return (f"{violation.rule}: {violation.count} "
+            f"(worst {violation.worst:.2f}m, limit {violation.limit:.2f}m)")
+
+
+class TrackValidator:
+    """
+    Checks tracks against the regulations the track generator follows, without loading them in
+    Gazebo. The rules are:
+
+    - edges:            the track has no blue or no yellow cones
+    - car_start:        the car doesn't start between the edges of the track, or behind its
+                        start line near its orange cones as on acceleration and skidpad
+                        layouts (or has no start)
+    - cone_overlap:     cones closer to each other than min_cone_separation, except pairs with
+                        an orange cone, which are doubled up at the start line and next to the
+                        edges at gates
+    - min_cone_spacing: cones closer than min_cone_spacing to another cone of their colour
+    - max_cone_spacing: cones with no cone of their edge within max_cone_spacing on the side
+                        away from their nearest neighbour, the ends of a gap in the edge (orange
+                        cones count as part of both edges)
+    - min_track_width:  blue or yellow cones closer than min_track_width to a cone of the
+                        other edge
+    - max_track_width:  blue or yellow cones further than max_track_width from the other edge
+
+    Spacing and width limits are loosened by a tolerance, as cones are placed on a discretized
+    path. Edges are joined in the order cones are stored, as they are in generated tracks.
+    Cones listed twice (within DUPLICATE_DISTANCE of a cone of their class) count once.
+
+    Many tracks are validated at once by laying them out side by side, far enough apart not to
+    interact, so that each rule is a single vectorized query over all their cones.
+
+        validator = TrackValidator.from_generator(config)
+        for violations in validator.validate_many(tracks):
+            print("; ".join(describe(violation) for violation in violations))
+    """
+
+    def __init__(self, min_cone_spacing=None, max_cone_spacing=5.0, min_track_width=3.0,
+                 max_track_width=None, min_cone_separation=0.15, tolerance=0.1):
+        """
+        min_cone_spacing:    Minimum distance between adjacent cones of an edge, in metres
+                             (None to not check)
+        max_cone_spacing:    Maximum distance between adjacent cones of an edge, in metres
+        min_track_width:     Minimum distance between the edges, in metres
+        max_track_width:     Maximum distance between the edges, in metres (None to not check)
+        min_cone_separation: Cones closer than this stand on each other, in metres
+        tolerance:           Fraction the spacing and width limits are loosened by
+
+        The defaults are the regulations any track is held to, hand-made ones included, which
+        bunch cones up at corners. `from_generator()` adds the generator's minimum cone spacing
+        and maximum width.
+        """
+        self.min_cone_spacing = None if min_cone_spacing is None else \
+            min_cone_spacing * (1 - tolerance)
+        self.max_cone_spacing = max_cone_spacing * (1 + tolerance)
+        self.min_track_width = min_track_width * (1 - tolerance)
+        self.max_track_width = None if max_track_width is None else \
+            max_track_width * (1 + tolerance)
+        self.min_cone_separation = min_cone_separation
+
+    @classmethod
+    def from_generator(cls, config, **kwargs):
+        """
+        A validator for the tracks of a `TrackGenerator` configuration (a dict of its settings,
+        missing ones take the generator's defaults)
+        """
+        width = config.get('track_width') or 3.0
+        rules = {
+            'min_cone_spacing': config.get('min_cone_spacing') or 3 * math.pi / 16,
+            'max_cone_spacing': config.get('max_cone_spacing') or 5.0,
+            'min_track_width': width,
+            'max_track_width': 2 * width,
+        }
+        return cls(**{**rules, **kwargs})
+
+    def __call__(self, cones, car_start=(0.0, 0.0, 0.0)):
+        """
+        Validates a track.
+
+        Args:
+            cones (dict): maps each cone class to an (n, 5) array
+            car_start (tuple): x, y, yaw of the car's starting pose, or None if the track has none
+
+        Returns:
+            The list of `Violation`s found, empty if the track is valid
+        """
+        return self.validate_many([(cones, car_start)])[0]
+
+    def is_valid(self, cones, car_start=(0.0, 0.0, 0.0)):
+        """Returns true if the track breaks none of the rules"""
+        return not self(cones, car_start)
+
+    def validate_many(self, tracks):
+        """
+        Validates many tracks in one batch.
+
+        Args:
+            tracks (iterable): (cones, car_start) of each track, as taken by `__call__()`
+
+        Returns:
+            The list of `Violation`s of each track
+        """
+        tracks = list(tracks)
+        count = len(tracks)
+        # How far from both edges a car between them can be, the widest a track may be (twice
+        # its minimum width if no maximum is checked)
+        reach = self.max_track_width or 2 * self.min_track_width
+        search = max(self.max_cone_spacing, self.min_cone_spacing or 0.0, self.min_track_width)
+
+        # Stack the cones of each class, with the track each one belongs to
+        data, owner = {}, {}
+        for tag in CONE_TAGS:
+            arrays = [
+                np.asarray(cones[tag], dtype=np.float64).reshape(-1, len(CONE_COLUMNS))[:, :2]
+                if cones.get(tag) is not None and len(cones[tag]) else np.empty((0, 2))
+                for cones, _ in tracks
+            ]
+            sizes = np.array([len(array) for array in arrays], dtype=np.int64)
+            data[tag] = np.concatenate(arrays) if count else np.empty((0, 2))
+            owner[tag] = np.repeat(np.arange(count), sizes)
+        has_car = np.array([car_start is not None for _, car_start in tracks], dtype=bool)
+        cars = np.array([car_start[:2] if car_start is not None else (0.0, 0.0)
+                         for _, car_start in tracks], dtype=np.float64).reshape(-1, 2)
+
+        # Lay the tracks out on a square grid of tiles wide enough that no query reaches from
+        # one track to another
+        low = np.full((count, 2), np.inf)
+        high = np.full((count, 2), -np.inf)
+        for tag in CONE_TAGS:
+            np.minimum.at(low, owner[tag], data[tag])
+            np.maximum.at(high, owner[tag], data[tag])
+        low[has_car] = np.minimum(low[has_car], cars[has_car])
+        high[has_car] = np.maximum(high[has_car], cars[has_car])
+        empty = ~np.isfinite(low[:, 0])
+        low[empty], high[empty] = 0.0, 0.0
+        tile = (high - low).max(initial=0.0) + max(reach, search) + 1.0
+        columns = max(int(math.ceil(math.sqrt(count))), 1)
+        shift = np.stack((np.arange(count) % columns, np.arange(count) // columns), axis=1)
+        shift = shift * tile - low
+        for tag in CONE_TAGS:
+            data[tag] = data[tag] + shift[owner[tag]]
+        cars = cars + shift
+
+        found = {rule: (np.zeros(count, dtype=np.int64), np.full(count, np.nan))
+                 for rule in RULES}
+
+        def report(rule, tracks_of, values=None):
+            """Counts a violation of rule for each of tracks_of, keeping the smallest value"""
+            counts, worsts = found[rule]
+            np.add.at(counts, tracks_of, 1)
+            if values is not None:
+                np.fmin.at(worsts, tracks_of, values)
+
+        missing = np.zeros(count, dtype=bool)
+        for tag in ("blue", "yellow"):
+            missing |= np.bincount(owner[tag], minlength=count) == 0
+        report("edges", np.concatenate([
+            np.nonzero(np.bincount(owner[tag], minlength=count) == 0)[0]
+            for tag in ("blue", "yellow")
+        ]))
+        report("car_start", np.nonzero(~has_car)[0])
+
+        grid = ConeGrid(data, cell_size=search)
+        track = np.empty(len(grid), dtype=np.int64)
+        for i, tag in enumerate(CONE_TAGS):
+            of_tag = grid.tags == i
+            track[of_tag] = owner[tag][grid.rows[of_tag]]
+
+        # Every pair of cones within spacing limits of each other, but for cones listed twice
+        query, cone, distance = grid.radius(grid.xy, search)
+        other = (query != cone) & ~((grid.tags[query] == grid.tags[cone])
+                                    & (distance < DUPLICATE_DISTANCE))
+        query, cone, distance = query[other], cone[other], distance[other]
+
+        orange = np.isin(grid.tags, ORANGE)
+        overlap = (distance < self.min_cone_separation) & ~orange[query] & ~orange[cone]
+        closest = np.full(len(grid), np.inf)
+        np.minimum.at(closest, query[overlap], distance[overlap])
+        overlap = np.isfinite(closest)
+        report("cone_overlap", track[overlap], closest[overlap])
+
+        # Width at its narrowest, from each cone of an edge to the cones of the other edge
+        edge = np.isin(grid.tags, (BLUE, YELLOW))
+        across = edge[query] & edge[cone] & (grid.tags[query] != grid.tags[cone]) \
+            & (distance < self.min_track_width)
+        narrowest = np.full(len(grid), np.inf)
+        np.minimum.at(narrowest, query[across], distance[across])
+        narrow = np.isfinite(narrowest)
+        report("min_track_width", track[narrow], narrowest[narrow])
+
+        # Spacing along the edges
+        same_colour = edge[query] & (grid.tags[query] == grid.tags[cone])
+        if self.min_cone_spacing is not None:
+            close = same_colour & (distance < self.min_cone_spacing)
+            report("min_cone_spacing", track[query[close]], distance[close])
+
+        # A cone of an edge closes the gap on the far side of its nearest neighbour along the
+        # edge if it is within max_cone_spacing on that side
+        same_edge = edge[query] & ((grid.tags[query] == grid.tags[cone])
+                                   | orange[cone])
+        same_edge &= distance <= self.max_cone_spacing
+        query, cone, distance = query[same_edge], cone[same_edge], distance[same_edge]
+        closest = np.full(len(grid), np.inf)
+        np.minimum.at(closest, query, distance)
+        nearest = np.full(len(grid), -1)
+        is_nearest = distance == closest[query]
+        nearest[query[is_nearest]] = cone[is_nearest]
+        ahead = grid.xy[nearest[query]] - grid.xy[query]
+        cosine = ((grid.xy[cone] - grid.xy[query]) * ahead).sum(axis=1) \
+            / np.maximum(distance * closest[query], 1e-12)
+        behind = cosine <= math.cos(CLOSING_ANGLE)
+        closed = np.zeros(len(grid), dtype=bool)
+        closed[query[behind]] = True
+        gap = np.nonzero(edge & ~closed)[0]
+        report("max_cone_spacing", track[gap])
+
+        # Width at its widest (and the car's place), from each cone of an edge to the segments
+        # of the other edge. The segments bridge the gaps between cones, but cut inside the
+        # outer edge of corners so the narrowest point is measured between cones above.
+        index = {
+            tag: SegmentIndex(self._segments(data[tag], owner[tag], count), reach)
+            for tag in ("blue", "yellow")
+        }
+        if self.max_track_width is not None:
+            for tag, other_tag in (("blue", "yellow"), ("yellow", "blue")):
+                valid = ~missing[owner[tag]]
+                width = index[other_tag].distance(data[tag][valid])
+                report("max_track_width", owner[tag][valid][width > self.max_track_width])
+
+        # A car away from the edges may be waiting behind the start line, near the orange cones
+        on_track = has_car & ~missing
+        offset = np.maximum(index["blue"].distance(cars[on_track]),
+                            index["yellow"].distance(cars[on_track]))
+        off_track = np.nonzero(on_track)[0][offset > reach]
+        if len(off_track):
+            near, _, _ = ConeGrid({tag: data[tag] for tag in ("orange", "big_orange")},
+                                  cell_size=reach).radius(cars[off_track], reach)
+            off_track = np.delete(off_track, np.unique(near))
+        report("car_start", off_track)
+
+        limits = {
+            "car_start": reach,
+            "cone_overlap": self.min_cone_separation,
+            "min_cone_spacing": self.min_cone_spacing,
+            "max_cone_spacing": self.max_cone_spacing,
+            "min_track_width": self.min_track_width,
+            "max_track_width": self.max_track_width,
+        }
+        results = [[] for _ in range(count)]
+        for rule in RULES:
+            counts, worsts = found[rule]
+            for i in np.nonzero(counts)[0]:
+                worst = None if np.isnan(worsts[i]) else float(worsts[i])
+                limit = None if rule == "edges" or (rule == "car_start" and not has_car[i]) \
+                    else limits[rule]
+                results[i].append(Violation(rule, int(counts[i]), worst, limit))
+        return results
+
+    @staticmethod
+    def _segments(xy, owner, count):
+        """
+        The segments joining consecutive cones of an edge of each track into a loop, without
+        those longer than MAX_GAP times the median of the track's edge, and a point segment on
+        every cone left without a segment on either side, so that the ends of gaps are still
+        found.
+        """
+        sizes = np.bincount(owner, minlength=count)
+        starts = np.cumsum(sizes) - sizes
+        following = np.arange(len(xy)) + 1
+        ends = (starts + sizes - 1)[sizes > 0]
+        following[ends] = starts[sizes > 0]
+        length = np.hypot(*(xy[following] - xy).T)
+
+        # Median length of each track's edge, from the lengths sorted within each track
+        order = np.lexsort((length, owner))
+        median = np.zeros(count)
+        median[sizes > 0] = length[order[(starts + sizes // 2)[sizes > 0]]]
+        keep = (length <= MAX_GAP * median[owner]) & (sizes[owner] > 1)
+        segments = np.column_stack((xy, xy[following]))[keep]
+        kept_before = np.zeros(len(xy), dtype=bool)
+        kept_before[following] = keep
+        ends = xy[~(keep & kept_before)]
+        return np.vstack((segments, np.tile(ends, 2)))
@@ -0,0 +1,251 @@
+import os
+import numpy as np
+
+from ament_index_python.packages import get_package_share_directory
+
+from .schema import CONE_TAGS, CONE_COLUMNS, UNKNOWN_COLOR_TAG
+from .spatial import SegmentIndex, track_segments
+
+
+# Model used for noise objects when the weights of noiseFiles.txt don't reach 100
+DEFAULT_NOISE_MODEL = "file://NoiseCube.dae"
+
+
+def load_noise_models(resource_dir=None):
+    """
+    Reads the noise models and their weights from noiseFiles.txt. Everything before its "$===$"
+    line is comments, then each line is "weight|uri". A noise object takes the model of the
+    first line whose weight is greater than a random number from 0 to 99.
+
+    Args:
+        resource_dir (str): directory holding noiseFiles.txt
+                            (default: the resource directory of the eufs_tracks share directory)
+
+    Returns:
+        weights, uris: the weight (cumulative, increasing) and uri of each model
+    """
+    if resource_dir is None:
+        resource_dir = os.path.join(get_package_share_directory("eufs_tracks"), "resource")
+    with open(os.path.join(resource_dir, "noiseFiles.txt"), "r") as f:
+        models = f.read().split("$===$")[-1]
+
+    weights, uris = [], []
+    for line in models.splitlines():
+        if "|" in line:
+            weight, uri = line.split("|", 1)
+            weights.append(int(weight))
+            uris.append(uri.strip())
+    return np.array(weights, dtype=np.int64), uris
+
+
+def choose_noise_models(draws, weights):
+    """
+    Picks the model of noise objects given their random numbers from 0 to 99 (draws), as
+    described in noiseFiles.txt. Returns indices into the models, where len(weights) stands for
+    `DEFAULT_NOISE_MODEL`.
+    """
+    return np.searchsorted(weights, draws, side="right")
+
+
+def clearance_index(cones, clearance):
+    """
+    `SegmentIndex` over the edges of a track (see `track_segments()`) and each of its cones, so
+    that points which are at least clearance away from the track are those whose distance is.
+    """
+    points = np.concatenate([
+        np.asarray(cones[tag], dtype=np.float64).reshape(-1, len(CONE_COLUMNS))[:, :2]
+        for tag in CONE_TAGS if cones.get(tag) is not None
+    ] + [np.empty((0, 2))])
+    return SegmentIndex(np.vstack((track_segments(cones), np.tile(points, 2))), clearance)
+
+
+def scatter_noise(cones, count, clearance=3.0, margin=10.0, noise_models=None, seed=None,
+                  max_rounds=8):
+    """
+    Scatters noise objects around a track in one batch, for cluttered worlds. Positions are
+    drawn uniformly over the bounding box of the cones grown by margin, and those within
+    clearance of the track's edges or cones are dropped. Batches are sized by how many were
+    kept so far, until count are placed or max_rounds batches were drawn (only when the box
+    has little room outside the clearance), so fewer may be returned.
+
+    Args:
+        cones (dict): maps each cone class to an (n, 5) array
+        count (int): number of noise objects
+        clearance (float): minimum distance of noise objects from the track, in metres
+        margin (float): how far around the cones noise objects are placed, in metres
+        noise_models (tuple): (weights, uris) as returned by `load_noise_models()`
+                              (default: read from the installed noiseFiles.txt)
+        seed (int): seed of the random number generator (default: random)
+
+    Returns:
+        A list of (uri, x, y, yaw) of each noise object, as taken by `render_track()`
+    """
+    if count <= 0:
+        return []
+    rng = np.random.default_rng(seed)
+    index = clearance_index(cones, clearance)
+    points = index.segments[:, :2]
+    if not len(points):
+        return []
+    if noise_models is None:
+        noise_models = load_noise_models()
+    weights, uris = noise_models
+    low, high = points.min(axis=0) - margin, points.max(axis=0) + margin
+
+    placed, missing, kept = [], count, 1.0
+    for _ in range(max_rounds):
+        # Draw enough for the remaining objects at the rate kept so far, with some slack
+        batch = int(missing / kept * 1.2) + 16
+        positions = rng.uniform(low, high, (batch, 2))
+        positions = positions[index.distance(positions) >= clearance]
+        kept = max(len(positions), 1) / batch
+        placed.append(positions[:missing])
+        missing -= len(placed[-1])
+        if not missing:
+            break
+
+    positions = np.concatenate(placed)
+    yaw = rng.uniform(-np.pi, np.pi, len(positions))
+    models = choose_noise_models(rng.integers(0, 100, len(positions)), weights)
+    uris = list(uris) + [DEFAULT_NOISE_MODEL]
+    return [
+        (uris[model], float(x), float(y), float(angle))
+        for (x, y), angle, model in zip(positions, yaw, models)
+    ]
+
+
+class NoisyVariants:
+    """
+    Many randomly perturbed copies of a track, generated in one vectorized pass. Each variant:
+
+    - moves every cone by a Gaussian with the covariance of its row (scaled by
+      covariance_scale), plus a uniform offset of up to cone_noise metres
+    - gives a color_noise fraction of the cones an unknown colour (`UNKNOWN_COLOR_TAG`), as
+      a map built by a perception stack which couldn't tell their colour would
+    - places noise objects on an object_noise fraction of the tiles around the track which are
+      at least clearance away from the track, each with a model picked as per noiseFiles.txt
+
+    These are the noise values of the launcher (cone_noise_default, color_noise_default and
+    object_noise_default in eufs_launcher.yaml), with the percentages as fractions.
+
+        variants = NoisyVariants(cones, car_start, 1000, cone_noise=0.05, color_noise=0.1)
+        for cones, car_start, objects in variants:
+            ...
+    """
+
+    def __init__(self, cones, car_start, count, cone_noise=0.0, covariance_scale=1.0,
+                 color_noise=0.0, object_noise=0.0, tile_size=4.0, margin=10.0,
+                 clearance=3.0, noise_models=None, seed=None):
+        """
+        cones:            Dict mapping each cone class to an (n, 5) array
+        car_start:        x, y, yaw of the car's starting pose, kept as is
+        count:            Number of variants
+        cone_noise:       Radius in metres of the uniform offset of each cone
+        covariance_scale: Scale of the Gaussian offset of each cone (0 to disable it)
+        color_noise:      Fraction of cones whose colour is unknown, 0 to 1
+        object_noise:     Fraction of noise tiles that get a noise object, 0 to 1
+        tile_size:        Width of the tiles noise objects are placed on, in metres
+        margin:           How far around the cones noise objects are placed, in metres
+        clearance:        Minimum distance of noise objects from the track, in metres
+        noise_models:     (weights, uris) as returned by `load_noise_models()` (default: read
+                          from the installed noiseFiles.txt if object_noise is set)
+        seed:             Seed of the random number generator (default: random)
+        """
+        rng = np.random.default_rng(seed)
+        self.count = count
+        self.car_start = tuple(car_start)
+        self.base = {
+            tag: np.asarray(cones[tag], dtype=np.float64).reshape(-1, len(CONE_COLUMNS))
+            for tag in CONE_TAGS if cones.get(tag) is not None and len(cones[tag])
+        }
+
+        # Cone positions and colours of every variant, (count, n, 2) and (count, n)
+        self.positions, self.unknown = {}, {}
+        for tag, data in self.base.items():
+            offset = np.zeros((count, len(data), 2))
+            if covariance_scale:
+                # Sample from each cone's covariance through its Cholesky factor
+                x_var, y_var, xy_cov = (np.maximum(data[:, 2], 0.0), data[:, 3], data[:, 4])
+                l11 = np.sqrt(x_var)
+                l21 = np.divide(xy_cov, l11, out=np.zeros_like(xy_cov), where=l11 > 0)
+                l22 = np.sqrt(np.maximum(y_var - l21 ** 2, 0.0))
+                z = rng.standard_normal((2, count, len(data)))
+                offset[..., 0] += covariance_scale * l11 * z[0]
+                offset[..., 1] += covariance_scale * (l21 * z[0] + l22 * z[1])
+            if cone_noise:
+                radius = cone_noise * np.sqrt(rng.random((count, len(data))))
+                angle = rng.uniform(0.0, 2 * np.pi, (count, len(data)))
+                offset[..., 0] += radius * np.cos(angle)
+                offset[..., 1] += radius * np.sin(angle)
+            self.positions[tag] = data[:, :2] + offset
+            self.unknown[tag] = rng.random((count, len(data))) < color_noise
+
+        self.noise_models = []
+        self._place_objects(rng, object_noise, tile_size, margin, clearance, noise_models)
+
+    def _place_objects(self, rng, object_noise, tile_size, margin, clearance, noise_models):
+        """Picks the noise objects of every variant, stored flat with per-variant offsets"""
+        self.objects = np.empty((0, 3))
+        self.object_models = np.empty(0, dtype=np.int64)
+        self.object_offsets = np.zeros(self.count + 1, dtype=np.int64)
+        if not object_noise or not self.base:
+            return
+
+        if noise_models is None:
+            noise_models = load_noise_models()
+        weights, uris = noise_models
+        self.noise_models = list(uris) + [DEFAULT_NOISE_MODEL]
+
+        # Tiles covering the track and its margin, without those too close to the track. Tiles
+        # further than half a diagonal past the clearance stay clear wherever objects land on
+        # them, so only the others have to be checked again
+        tile_reach = clearance + tile_size / np.sqrt(2)
+        index = clearance_index(self.base, tile_reach)
+        points = index.segments[:, :2]
+        low, high = points.min(axis=0) - margin, points.max(axis=0) + margin
+        x, y = (np.arange(low[i] + tile_size / 2, high[i], tile_size) for i in range(2))
+        tiles = np.stack(np.meshgrid(x, y, indexing="ij"), axis=-1).reshape(-1, 2)
+        distance = index.distance(tiles)
+        keep = distance >= clearance
+        tiles, near = tiles[keep], distance[keep] < tile_reach
+
+        variant, tile = np.nonzero(rng.random((self.count, len(tiles))) < object_noise)
+        positions = tiles[tile] + rng.uniform(-tile_size / 2, tile_size / 2, (len(tile), 2))
+        yaw = rng.uniform(-np.pi, np.pi, len(tile))
+        models = choose_noise_models(rng.integers(0, 100, len(tile)), weights)
+
+        # Moving objects around their tile may have brought them too close to the track
+        keep = np.ones(len(tile), dtype=bool)
+        check = near[tile]
+        keep[check] = index.distance(positions[check]) >= clearance
+        self.objects = np.column_stack((positions, yaw))[keep]
+        self.object_models = models[keep]
+        self.object_offsets = np.searchsorted(variant[keep], np.arange(self.count + 1))
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        """
+        Returns the cones, car start and noise objects of the i-th variant. Cones with an
+        unknown colour are under `UNKNOWN_COLOR_TAG`. objects is a list of (uri, x, y, yaw).
+        """
+        i = range(self.count)[i]
+        cones, unknown = {}, []
+        for tag, data in self.base.items():
+            data = data.copy()
+            data[:, :2] = self.positions[tag][i]
+            cones[tag] = data[~self.unknown[tag][i]]
+            unknown.append(data[self.unknown[tag][i]])
+        if any(len(data) for data in unknown):
+            cones[UNKNOWN_COLOR_TAG] = np.concatenate(unknown)
+
+        start, end = self.object_offsets[i], self.object_offsets[i + 1]
+        objects = [
+            (self.noise_models[model], float(x), float(y), float(yaw))
+            for (x, y, yaw), model in zip(self.objects[start:end], self.object_models[start:end])
+        ]
+        return cones, self.car_start, objects
+
+    def __iter__(self):
+        return (self[i] for i in range(self.count))
@@ -82,7 +82,12 @@ setup(
         ],
         'eufs_tracks.verb': [
             'create = eufs_tracks.cli.create:EUFSTracksCreate',
-            'convert = eufs_tracks.cli.convert:EUFSTracksConvert'
+            'convert = eufs_tracks.cli.convert:EUFSTracksConvert',
+            'list = eufs_tracks.cli.list_tracks:EUFSTracksList',
+            'inspect = eufs_tracks.cli.inspect_track:EUFSTracksInspect',
+            'thumbnails = eufs_tracks.cli.thumbnails:EUFSTracksThumbnails',
+            'variants = eufs_tracks.cli.variants:EUFSTracksVariants',
+            'laptime = eufs_tracks.cli.laptime:EUFSTracksLapTime'
         ]
     }
 )
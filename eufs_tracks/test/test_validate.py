@@ -0,0 +1,40 @@
+import os
+from glob import glob
+
+import pytest
+
+from eufs_tracks.track_io import load_csv, TrackValidator
+
+
+CSV_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "csv")
+
+# Bundled tracks with real problems, and the rules they break: rand has cones stacked 10cm
+# apart and a 5.6m gap in its blue edge
+KNOWN_INVALID = {
+    "rand": {"cone_overlap", "max_cone_spacing"},
+}
+
+
+@pytest.mark.parametrize("file_path", sorted(glob(os.path.join(CSV_DIR, "*.csv"))),
+                         ids=os.path.basename)
+def test_bundled_tracks(file_path):
+    """convert --validate accepts the tracks which ship with eufs_tracks, bar broken ones"""
+    name = os.path.basename(file_path)[:-len(".csv")]
+    violations = TrackValidator()(*load_csv(file_path))
+    assert {violation.rule for violation in violations} == KNOWN_INVALID.get(name, set())
+
+
+def test_validate_many_matches_single():
+    tracks = [load_csv(file_path) for file_path in sorted(glob(os.path.join(CSV_DIR, "*.csv")))]
+    validator = TrackValidator()
+    batch = validator.validate_many(tracks)
+    for track, violations in zip(tracks, batch):
+        assert [violation[:2] for violation in violations] \
+            == [violation[:2] for violation in validator(*track)]
+
+
+def test_car_off_track():
+    cones, _ = load_csv(os.path.join(CSV_DIR, "small_track.csv"))
+    assert [violation.rule for violation in TrackValidator()(cones, (200.0, 0.0, 0.0))] \
+        == ["car_start"]
+    assert [violation.rule for violation in TrackValidator()(cones, None)] == ["car_start"]